@@ -0,0 +1,118 @@
+"""
+Author: Hector Lovo
+Created on: 5/3/2015
+
+This dungeon generator was created as a demo for WillowTreeApps.
+"""
+from entities import ENEMY_FOV_DIST
+from pygame import Rect
+from spatial import SpatialHash
+from timeit import default_timer
+
+AI_CELL_SHIFT = 8  # enemies are bucketed in 256px cells: 8 tiles
+AI_BUDGET_MS = 2.0  # time the enemies may take per frame; the rest wait for the next frames
+AI_BUDGET_MOVES = 64  # enemies that may move per tick where the budget must not depend on timing (replays)
+FAR_TICK = 2  # awake enemies out of reach of the player move every FAR_TICK frames
+IDLE_TICK = 8  # awake enemies that could not move last time try again every IDLE_TICK frames
+
+
+class EnemyScheduler(object):
+    """
+    Decides which enemies get to move each frame:
+        - enemies are bucketed by where they stand, so only those in the buckets around the player
+          are looked at; the others sleep
+        - an enemy wakes up when it and the player see each other (collide_circle); awake enemies
+          near the player move every frame, those farther away every FAR_TICK frames, and those that
+          were stuck every IDLE_TICK frames
+        - the enemies may take up to budget_ms per frame: the ones that waited the longest go first,
+          and those left over are the first to go next frame; enemies take turns, round-robin. Given max_moves, at most that many move
+          per frame instead, whatever the time taken: the same input then always moves the same
+          enemies, as deterministic replays need
+    Given a distance field, the enemies follow it around walls and objects; it is only brought up to
+    date on frames some enemy moves. Given an index of the enemies (e.g. the map's), it is used and
+    kept up to date instead of building one.
+    """
+
+    def __init__(self, enemies, paths=None, cell_shift=AI_CELL_SHIFT, budget_ms=AI_BUDGET_MS, index=None,
+                 max_moves=None):
+        self.budget = budget_ms / 1000.0
+        self.max_moves = max_moves
+        # distances to the player, shared by every enemy
+        self.paths = paths
+        self.index = index
+        if index is None:
+            self.index = SpatialHash(cell_shift)
+        for enemy in enemies:
+            enemy.last_tick = 0
+            enemy.last_turn = 0
+            enemy.prev_pos = enemy.rect.topleft
+            if index is None:
+                self.index.add(enemy)
+        self.frame = 0
+        # moves made so far: an enemy's last_turn tells who moved longest ago, even within a frame
+        self.turns = 0
+        # statistics of the last frame
+        self.due = 0
+        self.moved = 0
+        self.deferred = 0
+
+    def is_due(self, enemy, reach_sq, dist_sq):
+        """
+        :param enemy: (Enemy) awake enemy
+        :param reach_sq: (int) squared distance under which an enemy is within reach of the player
+        :param dist_sq: (int) squared distance between the enemy and the player
+        :return: (bool) True if the enemy should move this frame
+        """
+        if enemy.stuck:
+            rate = IDLE_TICK
+        elif dist_sq > reach_sq:
+            rate = FAR_TICK
+        else:
+            return True
+        return self.frame - enemy.last_tick >= rate
+
+    def over_budget(self, start):
+        """
+        :param start: (float) when the frame's update started, from default_timer
+        :return: (bool) True if no more enemies may move this frame
+        """
+        if self.max_moves is not None:
+            return self.moved >= self.max_moves
+        return default_timer() - start > self.budget
+
+    def update(self, the_map, player):
+        """
+        Moves the enemies that are due, within the frame's budget.
+        :param the_map: (TheMap) map the enemies are on
+        :param player: (Player) the player
+        """
+        self.frame += 1
+        start = default_timer()
+        px, py = player.rect.center
+        # the farthest an enemy and the player may see each other from
+        wake = player.radius + (ENEMY_FOV_DIST << 5)
+        wake_sq = wake * wake
+        reach_sq = (ENEMY_FOV_DIST << 5) ** 2
+        due = list()
+        for enemy in self.index.query(Rect(px - wake, py - wake, wake << 1, wake << 1)):
+            dist_sq = (enemy.rect.centerx - px) ** 2 + (enemy.rect.centery - py) ** 2
+            if dist_sq <= wake_sq and self.is_due(enemy, reach_sq, dist_sq):
+                due.append(enemy)
+        self.due = len(due)
+        if due and self.paths is not None:
+            self.paths.update(px >> 5, py >> 5, the_map.obstacles)
+        due.sort(key=lambda waiting: waiting.last_turn)
+        self.moved = 0
+        for enemy in due:
+            if self.moved and self.over_budget(start):
+                break
+            old_rect = enemy.rect.copy()
+            enemy.move_towards_player(the_map.landscape, player.rect, the_map.obstacles, self.paths)
+            enemy.stuck = enemy.rect.topleft == old_rect.topleft
+            enemy.last_tick = self.frame
+            self.turns += 1
+            enemy.last_turn = self.turns
+            enemy.prev_pos = old_rect.topleft
+            self.index.move(enemy, old_rect)
+            self.moved += 1
+        self.deferred = self.due - self.moved
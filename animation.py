@@ -0,0 +1,89 @@
+"""
+Author: Hector Lovo
+Created on: 5/3/2015
+
+This dungeon generator was created as a demo for WillowTreeApps.
+"""
+import pygame
+import assets
+
+
+class SpriteSheet(object):
+    """
+    This class enables the sprites to be animated.
+    """
+
+    def __init__(self, filename):
+        self.sheet = assets.images.get(filename)
+
+    def image_at(self, rectangle, colorkey=None):
+        """
+        Loads image from x,y,x+offset,y+offset
+        :param rectangle:
+        :param colorkey:
+        :return:
+        """
+        rect = pygame.Rect(rectangle)
+        # noinspection PyArgumentList
+        image = pygame.Surface(rect.size).convert()
+        image.blit(self.sheet, (0, 0), rect)
+        if colorkey is not None:
+            if colorkey is -1:
+                colorkey = image.get_at((0, 0))
+            image.set_colorkey(colorkey, pygame.RLEACCEL)
+        return image
+
+    def images_at(self, rects, colorkey=None):
+        """
+        Loads the images and returns them as a list.
+        :param rects: (Rect) holds the x-y coordinates, height, and width
+        :param colorkey: determines which color to make transparent
+        :return: (list) of images
+        """
+        return [self.image_at(rect, colorkey) for rect in rects]
+
+
+class AnimationAtlas(object):
+    """
+    The frames of a sprite sheet, sliced once and shared by every entity animated with it.
+    images[facing][frame] holds the image of some frame, for the character facing some direction.
+    """
+
+    def __init__(self, filename, frames_row=4, frames=9, colorkey=-1):
+        self.filename = filename
+        self.frames_row = frames_row
+        self.frames = frames
+        sheet = SpriteSheet(filename)
+        self.images = list()
+        for x in range(frames_row):
+            tuple_lst = list()
+            for frame in range(frames):
+                tuple_lst.append((frame << 5, x << 5, 32, 32))
+            self.images.append(sheet.images_at(tuple_lst, colorkey=colorkey))
+
+
+# atlases sliced so far: shared by the whole process
+atlases = dict()
+
+
+def get_atlas(filename, frames_row=4, frames=9):
+    """
+    Returns the atlas of some sprite sheet, slicing it the first time it is requested.
+    :param filename: (string) sprite sheet image file
+    :param frames_row: (int) rows in the sheet: one per facing direction
+    :param frames: (int) frames per row
+    :return: (AnimationAtlas) shared atlas
+    """
+    key = (filename, frames_row, frames)
+    atlas = atlases.get(key)
+    if atlas is None:
+        atlas = AnimationAtlas(filename, frames_row, frames)
+        atlases[key] = atlas
+    return atlas
+
+
+def invalidate():
+    """
+    Drops every atlas; e.g. after the display mode changes and the converted frames are stale.
+    """
+    atlases.clear()
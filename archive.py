@@ -0,0 +1,103 @@
+"""
+Author: Hector Lovo
+Created on: 5/3/2015
+
+This dungeon generator was created as a demo for WillowTreeApps.
+
+Level packs: many map layouts in one file, with an index up front, read through mmap. Opening a
+level looks up its offset in the index and decodes only that layout; the rest of the file is never
+read, so it takes the same time whether the pack holds ten levels or a million. The level itself is
+not zero-copy: its tile arrays are copied out of the mapped file, since the game edits them. As for a
+generated map, only the objects and enemies get sprites; the tiles share their type's images.
+Archive format: the magic 'DGA1', its version and the number of levels; then, for each level, its
+offset in the file and its length (uint64 and uint32, little-endian); then the layouts, in their
+binary format (see layout.py), uncompressed.
+Packs are built by batch.py:
+    python batch.py -n 1000 --size 50x50 --archive -o levels.dga
+"""
+from layout import Layout, LAYOUT_MAGIC
+import mmap
+import struct
+import zlib
+
+ARCHIVE_MAGIC = 'DGA1'
+ARCHIVE_VERSION = 1
+HEADER = struct.Struct('<4sBI')  # magic, version, number of levels
+ENTRY = struct.Struct('<QI')  # offset of a layout in the file, its length
+
+
+class ArchiveWriter(object):
+    """
+    Writes a level pack, one layout at a time; the index is filled in on close.
+    """
+
+    def __init__(self, path, count):
+        self.out = open(path, 'wb')
+        self.count = count
+        self.entries = list()
+        self.out.write(HEADER.pack(ARCHIVE_MAGIC, ARCHIVE_VERSION, count))
+        self.out.write('\x00' * (ENTRY.size * count))
+
+    def add(self, data):
+        """
+        Appends a layout to the pack.
+        :param data: (str) serialized layout; zlib-compressed layouts are stored decompressed
+        """
+        if len(self.entries) >= self.count:
+            raise ValueError("the pack is full: %s levels" % self.count)
+        if data[:len(LAYOUT_MAGIC)] != LAYOUT_MAGIC:
+            data = zlib.decompress(data)
+        self.entries.append((self.out.tell(), len(data)))
+        self.out.write(data)
+
+    def close(self):
+        """
+        Writes the index and closes the file.
+        """
+        if len(self.entries) != self.count:
+            raise ValueError("the pack holds %s levels, not %s" % (len(self.entries), self.count))
+        self.out.seek(HEADER.size)
+        for offset, size in self.entries:
+            self.out.write(ENTRY.pack(offset, size))
+        self.out.close()
+
+
+class MapArchive(object):
+    """
+    A level pack, mapped into memory. Layouts are decoded on request: the tile grid of a level is
+    copied out of the mapped file into bytearrays, a single copy per array.
+    """
+
+    def __init__(self, path):
+        self.path = path
+        with open(path, 'rb') as pack:
+            self.data = mmap.mmap(pack.fileno(), 0, access=mmap.ACCESS_READ)
+        magic, version, self.count = HEADER.unpack_from(self.data)
+        if magic != ARCHIVE_MAGIC or version != ARCHIVE_VERSION:
+            self.data.close()
+            raise ValueError("not a level pack: %s" % path)
+
+    def __len__(self):
+        return self.count
+
+    def entry(self, n):
+        """
+        :param n: (int) level number, from 0
+        :return: (tuple) offset of the level's layout in the file, its length
+        """
+        if not 0 <= n < self.count:
+            raise IndexError("level out of range: %s" % n)
+        return ENTRY.unpack_from(self.data, HEADER.size + n * ENTRY.size)
+
+    def layout(self, n):
+        """
+        :param n: (int) level number, from 0
+        :return: (Layout) the level's layout
+        """
+        return Layout.from_bytes(self.data, self.entry(n)[0])
+
+    def close(self):
+        """
+        Unmaps the pack.
+        """
+        self.data.close()
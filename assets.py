@@ -0,0 +1,218 @@
+"""
+Author: Hector Lovo
+Created on: 5/3/2015
+
+This dungeon generator was created as a demo for WillowTreeApps.
+"""
+import os
+import pygame
+import Queue
+import threading
+
+IMAGE_DIR = os.path.join('data', 'images')
+DECODE_WORKERS = 4  # threads decoding images in the background
+
+
+class ImageCache(object):
+    """
+    Process-wide registry of decoded images. Every (file, colorkey) pair is read from disk and
+    converted only once; afterwards, the same Surface is shared by every entity that asks for it.
+    """
+
+    def __init__(self, directory=IMAGE_DIR):
+        self.directory = directory
+        self.images = dict()
+        self.hits = 0
+        self.misses = 0
+
+    def get(self, name, colorkey=None):
+        """
+        Returns the converted image for the given file, decoding it on the first request.
+        :param name: (string) of image file
+        :param colorkey: (tuple) to make transparent; -1 uses the top-left pixel
+        :return: (Surface) shared pixel-bit image
+        """
+        key = (name, colorkey)
+        image = self.images.get(key)
+        if image is None:
+            self.misses += 1
+            image = self.decode(name, colorkey)
+            self.images[key] = image
+        else:
+            self.hits += 1
+        return image
+
+    def decode(self, name, colorkey=None):
+        """
+        Reads an image from disk and creates a pixel-bit-map image from it.
+        :param name: (string) of image file
+        :param colorkey: (tuple) to make transparent; -1 uses the top-left pixel
+        :return: (Surface) pixel-bit image
+        """
+        image = None
+        try:
+            image = self.read(name)
+        except pygame.error, message:
+            print 'Cannot load image:', os.path.join(self.directory, name)
+            exit(message)
+        return self.convert(image, colorkey)
+
+    def read(self, name):
+        """
+        Reads and decodes an image file, leaving it in the file's pixel format; may run in any thread.
+        :param name: (string) of image file
+        :return: (Surface) decoded image
+        """
+        return pygame.image.load(os.path.join(self.directory, name))
+
+    @staticmethod
+    def convert(image, colorkey=None):
+        """
+        Converts a decoded image to the display's pixel format; main thread only.
+        :param image: (Surface) decoded image
+        :param colorkey: (tuple) to make transparent; -1 uses the top-left pixel
+        :return: (Surface) pixel-bit image
+        """
+        image = image.convert()
+        if colorkey is not None:
+            if colorkey is -1:
+                colorkey = image.get_at((0, 0))
+            image.set_colorkey(colorkey, pygame.RLEACCEL)
+        return image
+
+    def preload(self, names, colorkey=None):
+        """
+        Decodes a batch of images up-front, so that map generation only ever hits the cache.
+        :param names: (list) of image files
+        :param colorkey: (tuple) to make transparent; -1 uses the top-left pixel
+        """
+        for name in names:
+            self.get(name, colorkey)
+
+    def add(self, images):
+        """
+        Caches images converted elsewhere; e.g. the regions of a texture atlas (see atlas.py).
+        :param images: (dict) (file, colorkey) -> (Surface) converted image
+        """
+        self.images.update(images)
+
+    def preload_async(self, requests, workers=DECODE_WORKERS):
+        """
+        Starts decoding a batch of images in worker threads; see Preload.
+        :param requests: (list) of (file, colorkey) pairs
+        :param workers: (int) threads to decode with
+        :return: (Preload) the batch, to poll from the main thread
+        """
+        return Preload(self, requests, workers)
+
+    def invalidate(self, name=None):
+        """
+        Drops cached images; e.g. after the display mode changes and the converted Surfaces are stale.
+        :param name: (string) of image file to drop; every image is dropped when None
+        """
+        if name is None:
+            self.images.clear()
+        else:
+            for key in [k for k in self.images if k[0] == name]:
+                del self.images[key]
+
+    def reset_stats(self):
+        """
+        Resets the hit/miss counters.
+        """
+        self.hits = 0
+        self.misses = 0
+
+
+class Preload(object):
+    """
+    A batch of images decoded in the background. The worker threads only read and decode the files;
+    the main thread takes the decoded images (poll), converts them to the display's format (which
+    needs the display, and is not thread-safe) and caches them. An image the main thread asks for in
+    the meantime is decoded right away, as usual; the background copy is then dropped.
+    """
+
+    def __init__(self, cache, requests, workers=DECODE_WORKERS):
+        self.cache = cache
+        pending = list()
+        for request in requests:
+            if request not in cache.images and request not in pending:
+                pending.append(request)
+        self.total = len(pending)
+        self.converted = 0
+        self.todo = Queue.Queue()
+        self.decoded = Queue.Queue()
+        for request in pending:
+            self.todo.put(request)
+        self.threads = list()
+        for _ in range(min(workers, self.total)):
+            thread = threading.Thread(target=self.work)
+            thread.daemon = True
+            thread.start()
+            self.threads.append(thread)
+
+    def work(self):
+        """
+        Runs in the worker threads: decodes images until there are none left.
+        """
+        while True:
+            try:
+                name, colorkey = self.todo.get_nowait()
+            except Queue.Empty:
+                return
+            try:
+                self.decoded.put(((name, colorkey), self.cache.read(name), None))
+            except pygame.error, message:
+                self.decoded.put(((name, colorkey), None, message))
+
+    def poll(self, block=False):
+        """
+        Converts and caches the images decoded so far; main thread only.
+        :param block: (bool) wait for at least one image, if some are still being decoded
+        :return: (float) fraction of the batch done, 0 to 1
+        """
+        while self.converted < self.total:
+            try:
+                key, image, message = self.decoded.get(block)
+            except Queue.Empty:
+                break
+            block = False
+            if image is None:
+                print 'Cannot load image:', os.path.join(self.cache.directory, key[0])
+                exit(message)
+            if key not in self.cache.images:
+                self.cache.images[key] = self.cache.convert(image, key[1])
+            self.converted += 1
+        return self.progress()
+
+    def progress(self):
+        """
+        :return: (float) fraction of the batch done, 0 to 1
+        """
+        if not self.total:
+            return 1.0
+        return float(self.converted) / self.total
+
+    def finished(self):
+        """
+        :return: (bool) True once every image of the batch is cached
+        """
+        return self.converted == self.total
+
+    def count_ready(self, requests):
+        """
+        :param requests: (list) of (file, colorkey) pairs
+        :return: (int) how many of those images are cached already
+        """
+        return sum(1 for request in requests if request in self.cache.images)
+
+    def wait(self):
+        """
+        Blocks until every image of the batch is cached.
+        """
+        while not self.finished():
+            self.poll(block=True)
+
+
+# shared by every entity in the process
+images = ImageCache()
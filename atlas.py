@@ -0,0 +1,188 @@
+"""
+Author: Hector Lovo
+Created on: 5/3/2015
+
+This dungeon generator was created as a demo for WillowTreeApps.
+
+Texture atlases: every image of a theme (floor, wall, stairs, key and objects, with their dark
+variants) packed into a single surface, with a table of where each image is. The images used by
+several themes (the stairs, the key, some objects) are packed once, into a common atlas: the image
+cache holds a single copy of every file. Once the atlases are installed in the image cache, the
+images are subsurfaces of them: the map is drawn from two source surfaces, its theme's atlas and the
+common one, and a theme takes a file to load instead of a couple dozen.
+The images share the atlas, so those with a colorkey are re-keyed to a common color (KEY_COLOR) when
+packed; KEY_COLOR must not be used by anything that should show.
+Atlases are built ahead of time, and again whenever an image changes:
+    python atlas.py
+which writes data/atlases/theme_<n>.png and its region table, theme_<n>.json, and common.png and
+common.json. The images without an atlas are loaded one file at a time.
+"""
+from entities import theme_images
+from themes import map_theme
+import argparse
+import assets
+import json
+import os
+import pygame
+import sys
+
+ATLAS_DIR = os.path.join('data', 'atlases')
+ATLAS_VERSION = 2  # 1 packed the shared images into every theme's atlas
+ATLAS_WIDTH = 256  # pixels; the images are packed in rows (shelves) this wide
+KEY_COLOR = (255, 0, 255)  # colorkey of every packed image that has one
+COMMON_ATLAS = 'common'  # name of the atlas of the images shared by several themes
+
+
+class TextureAtlas(object):
+    """
+    A loaded atlas: the packed surface, and a subsurface per image, keyed like the image cache is:
+    by (file, colorkey).
+    """
+
+    def __init__(self, surface, table):
+        self.surface = surface
+        self.images = dict()
+        for name, region in table["regions"].items():
+            image = surface.subsurface(pygame.Rect(region["rect"]))
+            colorkey = None
+            if region["colorkey"]:
+                image.set_colorkey(KEY_COLOR)
+                colorkey = -1
+            self.images[(str(name), colorkey)] = image
+
+
+def atlas_paths(theme_num, directory=ATLAS_DIR):
+    """
+    :param theme_num: (int) some theme; None for the common atlas
+    :param directory: (string) where the atlases are
+    :return: (tuple) paths of the theme's atlas image and region table
+    """
+    name = COMMON_ATLAS if theme_num is None else 'theme_%s' % theme_num
+    base = os.path.join(directory, name)
+    return base + '.png', base + '.json'
+
+
+def atlas_images(theme_num):
+    """
+    :param theme_num: (int) some theme; None for the common atlas
+    :return: (list) of (file, colorkey) pairs packed into the atlas: the images used by that theme
+    alone, or by more than one theme
+    """
+    users = dict()
+    for num in map_theme:
+        for request in theme_images(num):
+            users.setdefault(request, set()).add(num)
+    if theme_num is not None:
+        return [request for request in theme_images(theme_num) if len(users[request]) == 1]
+    requests = list()
+    for num in sorted(map_theme):
+        for request in theme_images(num):
+            if len(users[request]) > 1 and request not in requests:
+                requests.append(request)
+    return requests
+
+
+def pack_shelves(sizes, width=ATLAS_WIDTH):
+    """
+    Places rectangles in rows, the tallest first; a row is closed when the next one does not fit.
+    :param sizes: (list) of (width, height) tuples
+    :param width: (int) width of the rows
+    :return: (tuple) the (x, y) position of every rectangle, in the given order; the height used
+    """
+    positions = [None] * len(sizes)
+    x = 0
+    y = 0
+    shelf = 0
+    for n in sorted(range(len(sizes)), key=lambda i: -sizes[i][1]):
+        w, h = sizes[n]
+        if x + w > width:
+            x = 0
+            y += shelf
+            shelf = 0
+        positions[n] = (x, y)
+        x += w
+        shelf = max(shelf, h)
+    return positions, y + shelf
+
+
+def build_atlas(theme_num, directory=ATLAS_DIR):
+    """
+    Packs the images of some theme into an atlas, and writes it with its region table. The display
+    must be set: the images are converted as the game would.
+    :param theme_num: (int) theme to pack; None for the images shared by several themes
+    :param directory: (string) where to write the atlas
+    :return: (int) images packed
+    """
+    requests = atlas_images(theme_num)
+    images = [assets.images.decode(name, colorkey) for name, colorkey in requests]
+    positions, height = pack_shelves([image.get_size() for image in images])
+    # noinspection PyArgumentList
+    surface = pygame.Surface((ATLAS_WIDTH, height)).convert()
+    surface.fill(KEY_COLOR)
+    regions = dict()
+    for (name, colorkey), image, pos in zip(requests, images, positions):
+        # the transparent pixels come out as KEY_COLOR
+        surface.blit(image, pos)
+        regions[name] = {"rect": list(pos) + list(image.get_size()), "colorkey": colorkey is not None}
+    if not os.path.isdir(directory):
+        os.makedirs(directory)
+    image_path, table_path = atlas_paths(theme_num, directory)
+    pygame.image.save(surface, image_path)
+    with open(table_path, 'w') as out:
+        json.dump({"version": ATLAS_VERSION, "theme": theme_num, "key_color": list(KEY_COLOR),
+                   "regions": regions}, out, indent=2, sort_keys=True)
+    return len(regions)
+
+
+def load_atlas(theme_num, directory=ATLAS_DIR):
+    """
+    Loads the atlas of some theme; the display must be set.
+    :param theme_num: (int) some theme; None for the common atlas
+    :param directory: (string) where the atlases are
+    :return: (TextureAtlas) the atlas; None if it was not built, or by another version
+    """
+    image_path, table_path = atlas_paths(theme_num, directory)
+    if not (os.path.isfile(image_path) and os.path.isfile(table_path)):
+        return None
+    with open(table_path) as table_file:
+        table = json.load(table_file)
+    if table.get("version") != ATLAS_VERSION:
+        return None
+    return TextureAtlas(pygame.image.load(image_path).convert(), table)
+
+
+def install_atlases(cache=assets.images, directory=ATLAS_DIR):
+    """
+    Loads every atlas built, the common one and those of the themes, into an image cache; their
+    images are then never loaded one by one. No image is in two atlases.
+    :param cache: (ImageCache) cache to install into
+    :param directory: (string) where the atlases are
+    :return: (int) atlases installed
+    """
+    installed = 0
+    for theme_num in [None] + list(map_theme):
+        atlas = load_atlas(theme_num, directory)
+        if atlas is not None:
+            cache.add(atlas.images)
+            installed += 1
+    return installed
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Packs the images of every Dun-Gen theme into atlases.")
+    parser.add_argument('-o', '--output', default=ATLAS_DIR, help="directory to write the atlases to")
+    args = parser.parse_args(argv)
+
+    # no window: the display is only needed to convert the images
+    os.environ.setdefault('SDL_VIDEODRIVER', 'dummy')
+    pygame.init()
+    pygame.display.set_mode((1, 1), 0, 32)
+    for theme_num in [None] + list(map_theme):
+        count = build_atlas(theme_num, args.output)
+        print '%s: %s images -> %s' % (COMMON_ATLAS if theme_num is None else 'theme %s' % theme_num, count,
+                                       atlas_paths(theme_num, args.output)[0])
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,185 @@
+"""
+Author: Hector Lovo
+Created on: 5/3/2015
+
+This dungeon generator was created as a demo for WillowTreeApps.
+
+Batch mode: generates many map layouts without a display, across a pool of processes, and streams
+them to a single file. For instance, 1000 maps of 50x50 and 80x80 tiles, starting at seed 7:
+    python batch.py -n 1000 --size 50x50 --size 80x80 --seed 7 -o levels.dgb
+
+Stream format: the magic 'DGB1', then, for each map, its length (uint32, little-endian) followed by
+the map's layout in its binary format (see layout.py); zlib-compressed with --compress.
+With --archive, the maps are written to a level pack instead (see archive.py), uncompressed.
+"""
+from archive import ArchiveWriter
+from layout import generate_layout, Layout, LAYOUT_MAGIC, PLACEMENTS, PLACEMENT_GRID, SEED_LIMIT
+from multiprocessing import Pool, cpu_count
+import argparse
+import os
+import struct
+import sys
+import time
+import zlib
+
+STREAM_MAGIC = 'DGB1'
+RECORD = struct.Struct('<I')
+MIN_MAP_SIZE = 20  # tiles, each way; every placement fits its rooms, stairs and keys from here
+
+
+def build_layout(task):
+    """
+    Runs in a worker process: generates one layout.
+    :param task: (tuple) width, height, enemy-prob, seed, room placement, whether to validate, whether
+    to compress
+    :return: (tuple) serialized layout, list of problems found
+    """
+    width, height, enemy_prob, seed, placement, validate, compress = task
+    layout = generate_layout(width, height, enemy_prob, seed, placement)
+    problems = layout.validate() if validate else list()
+    data = layout.to_bytes()
+    if compress:
+        data = zlib.compress(data)
+    return data, problems
+
+
+def make_tasks(count, sizes, enemy_prob, seed, placement, validate, compress):
+    """
+    Spreads the maps to generate over the requested sizes, each one with its own seed.
+    :param count: (int) number of maps
+    :param sizes: (list) of (width, height) tuples
+    :param enemy_prob: (int) probability of an enemy appearing where a key is
+    :param seed: (int) seed of the first map; the following maps use the next seeds
+    :param placement: (string) room placement strategy
+    :param validate: (bool) whether to validate every map
+    :param compress: (bool) whether to compress every map
+    :return: generator of tasks for build_layout
+    """
+    for n in range(count):
+        width, height = sizes[n % len(sizes)]
+        yield width, height, enemy_prob, seed + n, placement, validate, compress
+
+
+class StreamWriter(object):
+    """
+    Writes a stream file, one map at a time.
+    """
+
+    def __init__(self, path):
+        self.out = open(path, 'wb')
+        self.out.write(STREAM_MAGIC)
+
+    def add(self, data):
+        """
+        Appends a map to the stream.
+        :param data: (str) serialized layout
+        """
+        self.out.write(RECORD.pack(len(data)))
+        self.out.write(data)
+
+    def close(self):
+        """
+        Closes the file.
+        """
+        self.out.close()
+
+
+def read_layouts(path):
+    """
+    Reads back the maps from a stream file.
+    :param path: (string) stream file
+    :return: generator of layouts
+    """
+    with open(path, 'rb') as stream:
+        magic = stream.read(len(STREAM_MAGIC))
+        if magic != STREAM_MAGIC:
+            raise ValueError("not a dungeon stream: %s" % path)
+        while True:
+            header = stream.read(RECORD.size)
+            if not header:
+                break
+            data = stream.read(RECORD.unpack(header)[0])
+            if data[:len(LAYOUT_MAGIC)] != LAYOUT_MAGIC:
+                data = zlib.decompress(data)
+            yield Layout.from_bytes(data)
+
+
+def parse_size(text):
+    """
+    :param text: (string) size as WIDTHxHEIGHT, in tiles
+    :return: (tuple) width, height
+    """
+    try:
+        width, height = [int(n) for n in text.lower().split('x')]
+    except ValueError:
+        raise argparse.ArgumentTypeError("size must look like 50x50: %s" % text)
+    if width < MIN_MAP_SIZE or height < MIN_MAP_SIZE:
+        raise argparse.ArgumentTypeError("maps must be at least %sx%s: %s" % (MIN_MAP_SIZE, MIN_MAP_SIZE, text))
+    return width, height
+
+
+def parse_seed(text):
+    """
+    :param text: (string) seed of the first map
+    :return: (int) the seed; layouts store it as 32 bits, so it must fit
+    """
+    try:
+        seed = int(text)
+    except ValueError:
+        raise argparse.ArgumentTypeError("not a seed: %s" % text)
+    if not 0 <= seed < SEED_LIMIT:
+        raise argparse.ArgumentTypeError("seeds go from 0 to %s: %s" % (SEED_LIMIT - 1, text))
+    return seed
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Generates dungeon layouts in batch, without a display.")
+    parser.add_argument('-n', '--count', type=int, default=100, help="number of maps to generate")
+    parser.add_argument('--size', type=parse_size, action='append', dest='sizes',
+                        help="map size, WIDTHxHEIGHT in tiles; may be repeated (default: 50x50)")
+    parser.add_argument('--seed', type=parse_seed, default=0, help="seed of the first map, 0 to 2^32-1")
+    parser.add_argument('--enemy-prob', type=int, default=0, choices=range(16),
+                        help="probability of an enemy appearing where a key is")
+    parser.add_argument('--placement', default=PLACEMENT_GRID, choices=PLACEMENTS, help="room placement strategy")
+    parser.add_argument('-j', '--workers', type=int, default=cpu_count(), help="worker processes")
+    parser.add_argument('-o', '--output', default='levels.dgb', help="stream file to write")
+    parser.add_argument('--compress', action='store_true', help="zlib-compress every map")
+    parser.add_argument('--validate', action='store_true', help="check that every map is playable")
+    parser.add_argument('--archive', action='store_true', help="write a level pack, indexed for mmap, instead")
+    args = parser.parse_args(argv)
+    # every map takes the next seed: the last one must fit too
+    if args.seed + args.count > SEED_LIMIT:
+        parser.error("%s maps from seed %s go past the last seed, %s" % (args.count, args.seed, SEED_LIMIT - 1))
+    sizes = args.sizes or [(50, 50)]
+
+    tasks = make_tasks(args.count, sizes, args.enemy_prob, args.seed, args.placement, args.validate, args.compress)
+    # big chunks keep the inter-process traffic low; small ones keep the workers evenly busy
+    chunk_size = max(1, min(64, args.count // (args.workers * 8)))
+    pool = Pool(args.workers)
+    invalid = 0
+    start = time.time()
+    if args.archive:
+        writer = ArchiveWriter(args.output, args.count)
+    else:
+        writer = StreamWriter(args.output)
+    for n, (data, problems) in enumerate(pool.imap(build_layout, tasks, chunk_size)):
+        writer.add(data)
+        if problems:
+            invalid += 1
+            print >> sys.stderr, 'map %s (seed %s): %s' % (n, args.seed + n, '; '.join(problems))
+    writer.close()
+    pool.close()
+    pool.join()
+    elapsed = time.time() - start
+    # what was written: level packs store the layouts decompressed, and both formats have an index or headers
+    total_bytes = os.path.getsize(args.output)
+    print '%s maps in %.2fs: %.1f maps/s, %s workers, %.1f KiB/map' % (
+        args.count, elapsed, args.count / max(elapsed, 1e-6), args.workers,
+        total_bytes / 1024.0 / max(args.count, 1))
+    if args.validate:
+        print '%s invalid maps' % invalid
+    return 1 if invalid else 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
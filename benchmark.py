@@ -0,0 +1,215 @@
+"""
+Author: Hector Lovo
+Created on: 5/3/2015
+
+This dungeon generator was created as a demo for WillowTreeApps.
+
+Headless benchmarks: runs on SDL's dummy video driver, with fixed seeds, and measures:
+    - TheMap construction (generation and binding) across map sizes
+    - Player.move and Enemy.move_towards_player throughput, and the enemy scheduler
+    - per-frame cost of draw_walls_floors_to_screen and draw_objects_to_screen
+    - load_new_map latency, without the loading wait
+The results are written to a JSON file. Compare them against a saved baseline with --compare:
+    python benchmark.py -o baseline.json
+    ... change something ...
+    python benchmark.py -o after.json --compare baseline.json
+"""
+import os
+
+# must be set before pygame initializes the display
+os.environ.setdefault('SDL_VIDEODRIVER', 'dummy')
+os.environ.setdefault('SDL_AUDIODRIVER', 'dummy')
+
+from pygame.constants import *
+from timeit import default_timer
+from ai import EnemyScheduler
+from entities import Enemy
+from pathfind import DistanceField
+from main import DunGen
+from map import TheMap, StreamingMap
+import argparse
+import json
+import platform
+import sys
+
+SEED = 2015
+MAP_SIZES = (50, 100, 200)
+REGRESSION_THRESHOLD = 0.10  # slower than the baseline by more than this is a regression
+
+
+def measure(func, repeat, setup=None):
+    """
+    Runs some function repeatedly and times every run.
+    :param func: (function) code to time
+    :param repeat: (int) runs
+    :param setup: (function) code to run, untimed, before every run
+    :return: (dict) median and best time per run in ms, and the number of runs
+    """
+    samples = list()
+    for _ in range(repeat):
+        if setup is not None:
+            setup()
+        start = default_timer()
+        func()
+        samples.append((default_timer() - start) * 1000.0)
+    samples.sort()
+    return {"median_ms": samples[len(samples) >> 1], "best_ms": samples[0], "runs": repeat}
+
+
+def bench_map_construction(results, quick):
+    """
+    TheMap construction: generating the layout, then binding it; and StreamingMap construction.
+    """
+    for size in MAP_SIZES:
+        repeat = 3 if quick else 10
+        results["map_generate_%s" % size] = measure(lambda: TheMap(size, size, seed=SEED, bind=False), repeat)
+        results["map_generate_bind_%s" % size] = measure(lambda: TheMap(size, size, seed=SEED), repeat)
+    # only the window of chunks around the player is built, whatever the size
+    results["map_stream_bind_1000"] = measure(lambda: StreamingMap(1000, 1000, seed=SEED), 3 if quick else 10)
+
+
+def bench_movement(results, dun_gen, quick):
+    """
+    Player.move and Enemy.move_towards_player; every run makes 1000 moves from the same spot. Also,
+    one frame of the enemy scheduler, with a crowd of enemies around the player, and computing the
+    distance field the enemies follow.
+    """
+    player = dun_gen.player
+    the_map = dun_gen.map
+    start = player.rect.topleft
+    keys = (K_RIGHT, K_DOWN, K_LEFT, K_UP)
+
+    def move_player():
+        for n in range(1000):
+            player.move(the_map.landscape, the_map.obstacles, keys[n & 3])
+
+    def reset_player():
+        player.rect.topleft = start
+
+    results["player_move_x1000"] = measure(move_player, 5 if quick else 20, reset_player)
+    reset_player()
+    enemy = Enemy(start[0] + 64, start[1] + 64)
+    enemy_start = enemy.rect.topleft
+
+    def move_enemy():
+        for _ in range(1000):
+            enemy.move_towards_player(the_map.landscape, player.rect, the_map.obstacles)
+
+    def reset_enemy():
+        enemy.rect.topleft = enemy_start
+
+    results["enemy_move_x1000"] = measure(move_enemy, 5 if quick else 20, reset_enemy)
+    reset_player()
+    # a crowd of 400 enemies around the player, one per tile: a frame of the enemy scheduler
+    enemies = [Enemy(start[0] + ((n % 20) - 10 << 5), start[1] + ((n // 20) - 10 << 5)) for n in range(400)]
+    scheduler = EnemyScheduler(enemies, DistanceField(the_map.landscape))
+    results["enemy_update_400"] = measure(lambda: scheduler.update(the_map, player), 30 if quick else 300)
+    paths = DistanceField(the_map.landscape)
+    results["distance_field"] = measure(lambda: paths.compute(player.rect.centerx >> 5, player.rect.centery >> 5,
+                                                              the_map.obstacles), 30 if quick else 300)
+
+
+def bench_drawing(results, dun_gen, quick):
+    """
+    Per-frame drawing: the walls and floors (with the lighting forced to be recomputed, and idle)
+    and the objects. Every run draws one frame.
+    """
+    repeat = 30 if quick else 300
+    dun_gen.camera.update(dun_gen.player)
+
+    def begin_frame():
+        dun_gen.renderer.begin_frame(dun_gen.camera.state.topleft)
+
+    def force_lighting():
+        begin_frame()
+        dun_gen.fov.origin = None
+        dun_gen.lighting_key = None
+
+    results["walls_floors_frame"] = measure(dun_gen.draw_walls_floors_to_screen, repeat, force_lighting)
+    results["walls_floors_idle_frame"] = measure(dun_gen.draw_walls_floors_to_screen, repeat, begin_frame)
+    results["objects_frame"] = measure(dun_gen.draw_objects_to_screen, repeat, begin_frame)
+    results["view_frame"] = measure(dun_gen.view, repeat)
+
+
+def bench_load_new_map(results, dun_gen, quick):
+    """
+    load_new_map without the loading wait: with the next map prefetched (the usual case) and with
+    the map generated on the spot.
+    """
+    repeat = 3 if quick else 10
+
+    def wait_for_prefetch():
+        dun_gen.loader.thread.join()
+
+    def skip_prefetch():
+        # a map of another size: nothing prefetched matches
+        dun_gen.map.width -= 2
+        dun_gen.map.height -= 2
+
+    def reset_size():
+        # keep the maps from growing from run to run
+        dun_gen.map.width -= 2
+        dun_gen.map.height -= 2
+        dun_gen.prefetch_next_map()
+        wait_for_prefetch()
+
+    results["load_new_map_prefetched"] = measure(dun_gen.load_new_map, repeat, reset_size)
+    results["load_new_map_cold"] = measure(dun_gen.load_new_map, repeat, skip_prefetch)
+
+
+def compare(results, baseline, threshold=REGRESSION_THRESHOLD):
+    """
+    Prints how every benchmark did against the baseline.
+    :param results: (dict) benchmark results
+    :param baseline: (dict) baseline benchmark results
+    :param threshold: (float) relative slow-down that counts as a regression
+    :return: (list) names of the benchmarks that regressed
+    """
+    regressions = list()
+    print '%-28s %12s %12s %9s' % ("benchmark", "baseline ms", "now ms", "change")
+    for name in sorted(results):
+        now = results[name]["median_ms"]
+        if name not in baseline:
+            print '%-28s %12s %12.3f %9s' % (name, "-", now, "new")
+            continue
+        before = baseline[name]["median_ms"]
+        change = (now - before) / before if before else 0.0
+        flag = ""
+        if change > threshold:
+            flag = "  REGRESSION"
+            regressions.append(name)
+        print '%-28s %12.3f %12.3f %+8.1f%%%s' % (name, before, now, change * 100.0, flag)
+    return regressions
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Headless Dun-Gen benchmarks.")
+    parser.add_argument('-o', '--output', default='benchmark.json', help="JSON file to write the results to")
+    parser.add_argument('--compare', metavar='BASELINE', help="JSON results to compare against")
+    parser.add_argument('--threshold', type=float, default=REGRESSION_THRESHOLD,
+                        help="relative slow-down that counts as a regression (default: 0.10)")
+    parser.add_argument('--quick', action='store_true', help="fewer runs; for a rough idea")
+    args = parser.parse_args(argv)
+
+    dun_gen = DunGen(loading_wait=0, seed=SEED)
+    results = dict()
+    bench_map_construction(results, args.quick)
+    bench_movement(results, dun_gen, args.quick)
+    bench_drawing(results, dun_gen, args.quick)
+    bench_load_new_map(results, dun_gen, args.quick)
+
+    with open(args.output, 'w') as out:
+        json.dump({"python": platform.python_version(), "seed": SEED, "results": results}, out,
+                  indent=2, sort_keys=True)
+    if args.compare:
+        with open(args.compare) as baseline_file:
+            baseline = json.load(baseline_file)["results"]
+        regressions = compare(results, baseline, args.threshold)
+        return 1 if regressions else 0
+    for name in sorted(results):
+        print '%-28s %10.3f ms' % (name, results[name]["median_ms"])
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
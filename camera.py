@@ -26,11 +26,36 @@ class Camera(object):
         """
         return target.rect.move(self.state.topleft)
 
+    def view_rect(self):
+        """
+        :return: (Rect) area of the map inside the window, in pixels
+        """
+        return Rect(-self.state.x, -self.state.y, self.win_width, self.win_height)
+
+    def tile_window(self, grid_width, grid_height):
+        """
+        :param grid_width: (int) map width, in tiles
+        :param grid_height: (int) map height, in tiles
+        :return: (tuple) x1, y1, x2, y2: the tiles inside the window, even partly, are the columns
+                 x1 to x2 and the rows y1 to y2, both ends excluded; never past the map's edges, even
+                 if the map is smaller than the window
+        """
+        view = self.view_rect()
+        return (max(0, view.left >> 5), max(0, view.top >> 5), min(grid_width, (view.right + 31) >> 5),
+                min(grid_height, (view.bottom + 31) >> 5))
+
     def update(self, target):
         """
         This invokes the complex_camera function and finalizes the camera motion.
         """
-        self.state = self.camera_func(self.state, target.rect, self.win_width, self.win_height)
+        self.follow(target.rect)
+
+    def follow(self, rect):
+        """
+        Moves the camera onto some rectangle; e.g. where the player is drawn, between two ticks.
+        :param rect: (Rect) target rectangle
+        """
+        self.state = self.camera_func(self.state, rect, self.win_width, self.win_height)
 
 
 def complex_camera(camera, target_rect, win_width, win_height):
@@ -7,44 +7,10 @@ This dungeon generator was created as a demo for WillowTreeApps.
 from pygame.constants import *
 from pygame import Rect
 import random
-import os
 import pygame
-
-map_theme = {
-    0: {
-        "lst_image": ['tomb.png', 'table.png'],
-        "floor": "floor.png",
-        "drk_floor": "drk_floor.png",
-        "wall": "brick_wall.png",
-        "drk_wall": "drk_brick_wall.png",
-        "stairs_down": "stairs_down.png",
-        "drk_stairs_down": "drk_stairs_down.png",
-        "stairs_up": "stairs_up.png",
-        "drk_stairs_up": "drk_stairs_up.png"
-    },
-    1: {
-        "lst_image": ['tomb.png', 'rock.png'],
-        "floor": "grass.png",
-        "drk_floor": "drk_grass.png",
-        "wall": "bush.png",
-        "drk_wall": "drk_bush.png",
-        "stairs_down": "stairs_down.png",
-        "drk_stairs_down": "drk_stairs_down.png",
-        "stairs_up": "stairs_up.png",
-        "drk_stairs_up": "drk_stairs_up.png"
-    },
-    2: {
-        "lst_image": ['tomb.png', 'rock.png'],
-        "floor": "sand.png",
-        "drk_floor": "drk_sand.png",
-        "wall": "cactus.png",
-        "drk_wall": "drk_cactus.png",
-        "stairs_down": "stairs_down.png",
-        "drk_stairs_down": "drk_stairs_down.png",
-        "stairs_up": "stairs_up.png",
-        "drk_stairs_up": "drk_stairs_up.png"
-    }
-}
+import assets
+from animation import get_atlas
+from themes import map_theme
 
 # constants
 CHARACTER_FACING_UP = 0
@@ -54,6 +20,9 @@ CHARACTER_FACING_RIGHT = 3
 
 PLAYER_FOV_DIST = 6
 ENEMY_FOV_DIST = 4
+# where an enemy's feet are, from its top-left: the cell under them is the cell it stands on
+ENEMY_FEET_X = 12
+ENEMY_FEET_Y = 20
 
 
 class Entity(pygame.sprite.Sprite):
@@ -66,6 +35,15 @@ class Entity(pygame.sprite.Sprite):
         self.image, self.rect = load_image(img_file_name, colorkey)
         self.rect.left = left
         self.rect.top = top
+        self.colorkey = colorkey
+        # dark variant of the image, if any: only decoded when drawn (never in fog mode)
+        self.img_file_dark = None
+
+    @property
+    def drk_image(self):
+        if self.img_file_dark is None:
+            return self.image
+        return load_image(self.img_file_dark, self.colorkey)[0]
 
 
 class Tile(Entity):
@@ -75,7 +53,7 @@ class Tile(Entity):
 
     def __init__(self, left, top, img_file_name, img_file_dark, blocked, block_sight=None, colorkey=None):
         super(Tile, self).__init__(left, top, img_file_name, colorkey)
-        self.drk_image, _ = load_image(img_file_dark, colorkey)
+        self.img_file_dark = img_file_dark
         self.blocked = blocked
         self.visited = False
         if block_sight is None:
@@ -89,9 +67,9 @@ class AestheticObject(Tile):
     This class represents the objects on the map: tombs/desks/rocks/etc; as tiles.
     """
 
-    def __init__(self, left, top, theme_num):
-        lst_image = map_theme[theme_num]["lst_image"]
-        image = random.choice(lst_image)
+    def __init__(self, left, top, theme_num, image=None):
+        if image is None:
+            image = random.choice(map_theme[theme_num]["lst_image"])
         super(AestheticObject, self).__init__(left, top, image, 'drk_' + image, blocked=True, block_sight=False,
                                               colorkey=-1)
 
@@ -129,7 +107,8 @@ class Stairs(Tile):
         # upstairs
         if is_up:
             self.image, _ = load_image(str(map_theme[theme_num]["stairs_up"]), -1)
-            self.drk_image, _ = load_image(str(map_theme[theme_num]["drk_stairs_up"]), -1)
+            self.img_file_dark = str(map_theme[theme_num]["drk_stairs_up"])
+            self.colorkey = -1
 
 
 class Key(Entity):
@@ -139,7 +118,7 @@ class Key(Entity):
 
     def __init__(self, left, top):
         super(Key, self).__init__(left, top, 'key.png', colorkey=-1)
-        self.drk_image, _ = load_image('drk_key.png', -1)
+        self.img_file_dark = 'drk_key.png'
         self.visited = False
         self.block_sight = False
 
@@ -163,41 +142,6 @@ class EmptySprite(pygame.sprite.Sprite):
         self.rect = rect
 
 
-class SpriteSheet(object):
-    """
-    This class enables the sprites to be animated.
-    """
-
-    def __init__(self, filename):
-        self.sheet, _ = load_image(filename)
-
-    def image_at(self, rectangle, colorkey=None):
-        """
-        Loads image from x,y,x+offset,y+offset
-        :param rectangle:
-        :param colorkey:
-        :return:
-        """
-        rect = pygame.Rect(rectangle)
-        # noinspection PyArgumentList
-        image = pygame.Surface(rect.size).convert()
-        image.blit(self.sheet, (0, 0), rect)
-        if colorkey is not None:
-            if colorkey is -1:
-                colorkey = image.get_at((0, 0))
-            image.set_colorkey(colorkey, pygame.RLEACCEL)
-        return image
-
-    def images_at(self, rects, colorkey=None):
-        """
-        Loads the images and returns them as a list.
-        :param rects: (Rect) holds the x-y coordinates, height, and width
-        :param colorkey: determines which color to make transparent
-        :return: (list) of images
-        """
-        return [self.image_at(rect, colorkey) for rect in rects]
-
-
 class Enemy(pygame.sprite.Sprite):
     """
     This class is not fully implemented. This will represent an enemy NPC and it should
@@ -214,14 +158,8 @@ class Enemy(pygame.sprite.Sprite):
         self.frames = 9
         self.frames_row = 4
         self.elapsed_frames = 0
-        player_sprites = SpriteSheet("enemy.png")
-        self.images_lst = list()
-        for x in range(self.frames_row):
-            tuple_lst = list()
-            for frame in range(self.frames):
-                tuple_lst.append((frame << 5, x << 5, 32, 32))
-            sprite_row = player_sprites.images_at(tuple_lst, colorkey=-1)
-            self.images_lst.append(sprite_row)
+        # the frames are shared by every enemy: indexed by facing, then frame
+        self.images_lst = get_atlas("enemy.png", self.frames_row, self.frames).images
         self.img_frame_num = 0
         # init image
         self.image = self.images_lst[CHARACTER_FACING_DOWN][0]
@@ -229,25 +167,44 @@ class Enemy(pygame.sprite.Sprite):
         self.rect = self.image.get_rect()
         # used for collision detection
         self.dummy_sprite = EmptySprite(Rect(0, 0, 4, 8))
+        # used by the enemy scheduler: last frame the enemy moved on, its last turn, and whether it was
+        # stuck then
+        self.last_tick = 0
+        self.last_turn = 0
+        self.stuck = False
         # set coords
         self.rect.left = left
         self.rect.top = top
+        # x-y coordinates before the enemy last moved: frames are interpolated from there
+        self.prev_pos = self.rect.topleft
 
-    def move_towards_player(self, my_map, player_rect, other_objs):
+    def move_towards_player(self, my_map, player_rect, other_objs, paths=None):
         """
         Moves the enemy towards the player. Determines if the enemy is colliding with a wall or an object.
+        Given the distance field around the player, the enemy heads for the next cell on its way to the
+        player; otherwise (or if the field does not reach the enemy), it heads straight for the player.
         :param my_map: (map) holds map data
         :param player_rect: (Rect) player coordinate, height, width info
-        :param other_objs: (list) objects that cannot be traversed through: tombstones/rocks/desks/etc.
+        :param other_objs: (SpatialHash) objects that cannot be traversed through: tombstones/rocks/desks/etc.
+        :param paths: (DistanceField) distances to the player's cell
         """
         # used for detecting collision
         x_move = 0
         y_move = 0
         offset_x = 8
         offset_y = 16
+        # where to head for: the player, or the center of the next cell on the way
+        target_x = player_rect.x
+        target_y = player_rect.y
+        if paths is not None:
+            # the enemy stands on the cell under its feet
+            step = paths.next_step((self.rect.x + ENEMY_FEET_X) >> 5, (self.rect.y + ENEMY_FEET_Y) >> 5)
+            if step is not None:
+                target_x = (step[0] << 5) + 16 - ENEMY_FEET_X
+                target_y = (step[1] << 5) + 16 - ENEMY_FEET_Y
         # slope vars
-        player_dist_x = player_rect.x - self.rect.x
-        player_dist_y = player_rect.y - self.rect.y
+        player_dist_x = target_x - self.rect.x
+        player_dist_y = target_y - self.rect.y
         # determine enemy direction to move
         if player_dist_x > 4:
             # moving right
@@ -266,14 +223,10 @@ class Enemy(pygame.sprite.Sprite):
         # used for collision detection
         x_val = self.rect.x + x_move + offset_x
         y_val = self.rect.y + y_move + offset_y
-        # enemy object collision detection
-        obj_collision = False
+        # enemy object collision detection: only the objects near the probe are checked
         self.dummy_sprite.rect.x = x_val
         self.dummy_sprite.rect.y = y_val
-        for obj in other_objs:
-            obj_collision = pygame.sprite.collide_rect(self.dummy_sprite, obj)
-            if obj_collision:
-                break
+        obj_collision = other_objs.collide(self.dummy_sprite.rect) is not None
         # determine if player can move in x-y direction
         is_passable = not my_map[y_val >> 5][x_val >> 5].blocked
         if is_passable and not obj_collision:
@@ -315,14 +268,8 @@ class Player(pygame.sprite.Sprite):
         self.frames = 9
         self.frames_row = 4
         self.elapsed_frames = 0
-        player_sprites = SpriteSheet("player_walk_sprite.png")
-        self.images_lst = list()
-        for x in range(self.frames_row):
-            tuple_lst = list()
-            for frame in range(self.frames):
-                tuple_lst.append((frame << 5, x << 5, 32, 32))
-            sprite_row = player_sprites.images_at(tuple_lst, colorkey=-1)
-            self.images_lst.append(sprite_row)
+        # the frames are shared by every player: indexed by facing, then frame
+        self.images_lst = get_atlas("player_walk_sprite.png", self.frames_row, self.frames).images
         self.img_frame_num = 0
         # init image
         self.image = self.images_lst[CHARACTER_FACING_DOWN][0]
@@ -330,13 +277,15 @@ class Player(pygame.sprite.Sprite):
         self.dummy_sprite = EmptySprite(Rect(0, 0, 4, 8))
         # init rect
         self.rect = self.image.get_rect()
+        # x-y coordinates on the previous tick: frames are interpolated from there
+        self.prev_pos = self.rect.topleft
 
     def move(self, my_map, other_objs, key):
         """
         Moves the player around the map. Determines if the player is colliding with a wall,
          is able to pick up a key, and if is able to go on to the next level.
         :param my_map: (map) holds map data
-        :param other_objs: (list) objects that cannot be traversed through: tombstones/rocks/desks/etc.
+        :param other_objs: (SpatialHash) objects that cannot be traversed through: tombstones/rocks/desks/etc.
         :param key: (list) keys to collect
         """
         # used for detecting collision
@@ -376,16 +325,12 @@ class Player(pygame.sprite.Sprite):
             self.img_frame_num = 0
         self.elapsed_frames += 1
         self.image = self.images_lst[facing][self.img_frame_num]
-        # player object collision detection
-        obj_collision = False
+        # player object collision detection: only the objects near the probe are checked
         x_val = self.rect.x + x_move + offset_x
         y_val = self.rect.y + y_move + offset_y
         self.dummy_sprite.rect.x = x_val
         self.dummy_sprite.rect.y = y_val
-        for obj in other_objs:
-            obj_collision = pygame.sprite.collide_rect(self.dummy_sprite, obj)
-            if obj_collision:
-                break
+        obj_collision = other_objs.collide(self.dummy_sprite.rect) is not None
         # determine if player can move in x-y direction
         if not my_map[y_val >> 5][x_val >> 5].blocked and \
                 not obj_collision:
@@ -394,22 +339,51 @@ class Player(pygame.sprite.Sprite):
 
 def load_image(name, colorkey=None):
     """
-    This method loads an image from the data.images dir and creates a
-    pixel-bit-map image from it.
+    This method fetches an image from the data.images dir through the shared image cache; the
+    file is only decoded the first time it is requested.
     :param name: (string) of image file
     :param colorkey: (tuple) to make transparent
     :return: pixel-bit image, rectangle
     """
-    fullname = os.path.join('data', 'images')
-    fullname = os.path.join(fullname, name)
-    image = None
-    try:
-        image = pygame.image.load(fullname).convert()
-    except pygame.error, message:
-        print 'Cannot load image:', fullname
-        exit(message)
-    if colorkey is not None:
-        if colorkey is -1:
-            colorkey = image.get_at((0, 0))
-        image.set_colorkey(colorkey, pygame.RLEACCEL)
+    image = assets.images.get(name, colorkey)
     return image, image.get_rect()
+
+
+def theme_images(theme_num, dark=True):
+    """
+    :param theme_num: (int) some theme
+    :param dark: (bool) also list the dark variants; not needed in fog mode
+    :return: (list) of (file, colorkey) pairs: every image the theme uses
+    """
+    theme = map_theme[theme_num]
+    images = [(name, None) for name in [theme["floor"], theme["wall"], theme["stairs_down"]]]
+    images += [(name, -1) for name in [theme["stairs_up"], 'key.png'] + theme["lst_image"]]
+    if dark:
+        images += [(name, None) for name in [theme["drk_floor"], theme["drk_wall"], theme["drk_stairs_down"]]]
+        images += [(name, -1) for name in [theme["drk_stairs_up"], 'drk_key.png'] +
+                   ['drk_' + image for image in theme["lst_image"]]]
+    return images
+
+
+def preload_theme_images(theme_num, dark=True):
+    """
+    Decodes every image used by some theme, so that building the map only hits the image cache.
+    :param theme_num: (int) theme to preload
+    :param dark: (bool) also decode the dark variants; not needed in fog mode
+    """
+    for name, colorkey in theme_images(theme_num, dark):
+        assets.images.get(name, colorkey)
+
+
+def preload_themes_async(theme_nums, dark=True):
+    """
+    Starts decoding every image used by some themes in worker threads; the images are cached as the
+    main thread polls the returned batch.
+    :param theme_nums: (list) themes to preload, the most urgent first
+    :param dark: (bool) also decode the dark variants; not needed in fog mode
+    :return: (Preload) the batch
+    """
+    requests = list()
+    for theme_num in theme_nums:
+        requests += theme_images(theme_num, dark)
+    return assets.images.preload_async(requests)
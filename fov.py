@@ -0,0 +1,139 @@
+"""
+Author: Hector Lovo
+Created on: 5/3/2015
+
+This dungeon generator was created as a demo for WillowTreeApps.
+"""
+from entities import PLAYER_FOV_DIST
+from landscape import BLOCKED, BLOCK_SIGHT, VISITED
+
+# transforms from the first octant to each of the eight octants: xx, xy, yx, yy
+OCTANTS = [
+    (1, 0, 0, 1), (0, 1, 1, 0), (0, -1, 1, 0), (-1, 0, 0, 1),
+    (-1, 0, 0, -1), (0, -1, -1, 0), (0, 1, -1, 0), (1, 0, 0, -1)
+]
+
+
+class FieldOfView(object):
+    """
+    Recursive shadowcasting over the tile grid. Walls (blocked tiles) stop the light, but are lit
+    themselves. One pass produces:
+        - the visibility bitmap (visible): cells the player can currently see
+        - the explored bitmap: the VISITED flag of every cell that has ever been seen; cells that are
+          never drawn (block_sight) are left out.
+    The field is only recomputed when the player moves into another tile.
+    """
+
+    def __init__(self, grid, radius=PLAYER_FOV_DIST):
+        self.grid = grid
+        self.radius = radius
+        self.radius_sq = radius * radius + radius
+        self.visible = bytearray(grid.width * grid.height)
+        self.visible_cells = list()
+        self.origin = None
+
+    def update(self, x, y):
+        """
+        Recomputes the field of view if the origin moved to another tile.
+        :param x: (int) origin cell column
+        :param y: (int) origin cell row
+        :return: (bool) True if the field of view was recomputed
+        """
+        if (x, y) == self.origin:
+            return False
+        self.compute(x, y)
+        return True
+
+    def compute(self, x, y):
+        """
+        Computes the field of view from some cell.
+        :param x: (int) origin cell column
+        :param y: (int) origin cell row
+        """
+        for i in self.visible_cells:
+            self.visible[i] = 0
+        self.visible_cells = list()
+        self.origin = (x, y)
+        self.light(x, y)
+        for xx, xy, yx, yy in OCTANTS:
+            self.cast_light(x, y, 1, 1.0, 0.0, xx, xy, yx, yy)
+
+    def is_visible(self, x, y):
+        """
+        :param x: (int) cell column
+        :param y: (int) cell row
+        :return: (bool) True if the cell is currently in view
+        """
+        if 0 <= x < self.grid.width and 0 <= y < self.grid.height:
+            return self.visible[y * self.grid.width + x] != 0
+        return False
+
+    def light(self, x, y):
+        """
+        Marks a cell as visible and explored.
+        :param x: (int) cell column
+        :param y: (int) cell row
+        """
+        i = y * self.grid.width + x
+        if not self.visible[i]:
+            self.visible[i] = 1
+            self.visible_cells.append(i)
+            flags = self.grid.flags[i]
+            if not flags & BLOCK_SIGHT:
+                self.grid.flags[i] = flags | VISITED
+
+    def is_opaque(self, x, y):
+        """
+        :param x: (int) cell column
+        :param y: (int) cell row
+        :return: (bool) True if the cell stops the light; cells off the map do too
+        """
+        if 0 <= x < self.grid.width and 0 <= y < self.grid.height:
+            return self.grid.flags[y * self.grid.width + x] & BLOCKED != 0
+        return True
+
+    def cast_light(self, cx, cy, row, start, end, xx, xy, yx, yy):
+        """
+        Scans one octant, row by row, and recurses around every wall that casts a shadow.
+        :param cx: (int) origin cell column
+        :param cy: (int) origin cell row
+        :param row: (int) distance of the first row to scan
+        :param start: (float) slope where the lit area of the octant starts
+        :param end: (float) slope where the lit area of the octant ends
+        :param xx: (int) octant transform
+        :param xy: (int) octant transform
+        :param yx: (int) octant transform
+        :param yy: (int) octant transform
+        """
+        if start < end:
+            return
+        new_start = start
+        for j in range(row, self.radius + 1):
+            dx = -j - 1
+            dy = -j
+            blocked = False
+            while dx <= 0:
+                dx += 1
+                x = cx + dx * xx + dy * xy
+                y = cy + dx * yx + dy * yy
+                l_slope = (dx - 0.5) / (dy + 0.5)
+                r_slope = (dx + 0.5) / (dy - 0.5)
+                if start < r_slope:
+                    continue
+                elif end > l_slope:
+                    break
+                if dx * dx + dy * dy <= self.radius_sq and 0 <= x < self.grid.width and 0 <= y < self.grid.height:
+                    self.light(x, y)
+                if blocked:
+                    if self.is_opaque(x, y):
+                        new_start = r_slope
+                    else:
+                        blocked = False
+                        start = new_start
+                elif self.is_opaque(x, y) and j < self.radius:
+                    # this wall casts a shadow: scan the lit part before it, then skip past it
+                    blocked = True
+                    self.cast_light(cx, cy, j + 1, start, l_slope, xx, xy, yx, yy)
+                    new_start = r_slope
+            if blocked:
+                break
@@ -0,0 +1,298 @@
+"""
+Author: Hector Lovo
+Created on: 5/3/2015
+
+This dungeon generator was created as a demo for WillowTreeApps.
+"""
+# tile-type codes
+WALL = 0
+FLOOR = 1
+
+# per-cell bit flags
+BLOCKED = 1
+BLOCK_SIGHT = 2
+VISITED = 4
+
+
+def clear_table(flag):
+    """
+    Builds a translation table that clears some bit flag from every byte it is applied to.
+    :param flag: (int) bit flag to clear
+    :return: (str) 256-byte translation table
+    """
+    return ''.join(chr(value & ~flag) for value in range(256))
+
+
+# per-flag tables used to clear that flag over whole slices at once
+CLEAR_TABLES = dict((flag, clear_table(flag)) for flag in (BLOCKED, BLOCK_SIGHT, VISITED))
+
+
+def bit_table(flag):
+    """
+    Builds a translation table that turns every byte into 1 if it has some bit flag set, 0 otherwise.
+    :param flag: (int) bit flag to test
+    :return: (str) 256-byte translation table
+    """
+    return ''.join(chr(1 if value & flag else 0) for value in range(256))
+
+
+# per-flag tables used to pull that flag out of whole slices at once
+BIT_TABLES = dict((flag, bit_table(flag)) for flag in (BLOCKED, BLOCK_SIGHT, VISITED))
+
+
+def pack_flag(flags, flag):
+    """
+    Bit-packs one flag of a run of cells: one bit per cell, eight cells per byte.
+    :param flags: (bytearray) per-cell bit flags
+    :param flag: (int) BLOCKED, BLOCK_SIGHT, VISITED, or any other bit
+    :return: (str) packed bits; None if no cell has the flag set
+    """
+    bits = flags.translate(BIT_TABLES.get(flag) or bit_table(flag))
+    i = bits.find('\x01')
+    if i == -1:
+        return None
+    packed = bytearray((len(bits) + 7) >> 3)
+    while i != -1:
+        packed[i >> 3] |= 1 << (i & 7)
+        i = bits.find('\x01', i + 1)
+    return str(packed)
+
+
+def unpack_flag(packed, flags, flag):
+    """
+    Sets one flag on the cells whose bit is set in some packed bits; the reverse of pack_flag.
+    :param packed: (str) packed bits
+    :param flags: (bytearray) per-cell bit flags to update
+    :param flag: (int) BLOCKED, BLOCK_SIGHT, VISITED, or any other bit
+    """
+    for n, byte in enumerate(bytearray(packed)):
+        if byte:
+            for bit in range(8):
+                if byte >> bit & 1:
+                    flags[(n << 3) + bit] |= flag
+
+
+class TileDef(object):
+    """
+    Shared definition of a tile type: which theme images it uses and its default flags. Every cell
+    of that type refers to the same definition, instead of carrying its own copy.
+    """
+
+    def __init__(self, code, image_key, drk_image_key, blocked, block_sight=None):
+        self.code = code
+        self.image_key = image_key
+        self.drk_image_key = drk_image_key
+        if block_sight is None:
+            block_sight = blocked
+        self.flags = (BLOCKED if blocked else 0) | (BLOCK_SIGHT if block_sight else 0)
+
+
+# indexed by tile-type code
+TILE_DEFS = [
+    TileDef(WALL, "wall", "drk_wall", blocked=True),
+    TileDef(FLOOR, "floor", "drk_floor", blocked=False)
+]
+
+
+class TileGrid(object):
+    """
+    Compact landscape: one tile-type code and one byte of bit flags per cell, stored row-major in
+    byte arrays. Indexing with grid[y][x] returns a lightweight view of the cell, so code written
+    against the old 2d-list of sprites (e.g. grid[y][x].blocked) keeps working.
+    Rows and columns are carved with slice assignments; a rectangle takes one per row.
+    """
+
+    def __init__(self, width, height, theme_num):
+        self.width = width
+        self.height = height
+        self.theme_num = theme_num
+        self.types = bytearray(chr(WALL) * (width * height))
+        self.flags = bytearray(chr(TILE_DEFS[WALL].flags) * (width * height))
+        # per-type images: filled by bind()
+        self.images = None
+        self.drk_images = None
+
+    def bind(self, images, drk_images=None):
+        """
+        Sets the images of every tile type; they are shared by all the cells of that type.
+        :param images: (list) lit image of each tile type, indexed by tile-type code
+        :param drk_images: (list) dark image of each tile type, indexed by tile-type code; only
+                           needed when the map is not drawn in fog mode
+        """
+        self.images = images
+        if drk_images is not None:
+            self.drk_images = drk_images
+
+    def __len__(self):
+        return self.height
+
+    def __getitem__(self, y):
+        if y < 0:
+            y += self.height
+        if not 0 <= y < self.height:
+            raise IndexError("row out of range: %s" % y)
+        return TileRow(self, y)
+
+    def set_type(self, x, y, code):
+        """
+        Changes the type of some cell; its flags are reset to the defaults of the new type.
+        :param x: (int) cell column
+        :param y: (int) cell row
+        :param code: (int) tile-type code
+        """
+        i = y * self.width + x
+        self.types[i] = code
+        self.flags[i] = TILE_DEFS[code].flags
+
+    def fill_rect(self, x1, y1, x2, y2, code):
+        """
+        Changes the type of every cell in a rectangle; their flags are reset to the defaults of the
+        new type.
+        :param x1: (int) left column
+        :param y1: (int) top row
+        :param x2: (int) right column, excluded
+        :param y2: (int) bottom row, excluded
+        :param code: (int) tile-type code
+        """
+        count = x2 - x1
+        types = chr(code) * count
+        flags = chr(TILE_DEFS[code].flags) * count
+        for y in range(y1, y2):
+            i = y * self.width + x1
+            self.types[i:i + count] = types
+            self.flags[i:i + count] = flags
+
+    def fill_column(self, x, y1, y2, code):
+        """
+        Changes the type of a run of cells in some column, with a single strided slice assignment;
+        their flags are reset to the defaults of the new type.
+        :param x: (int) column
+        :param y1: (int) top row
+        :param y2: (int) bottom row, excluded
+        :param code: (int) tile-type code
+        """
+        start = y1 * self.width + x
+        stop = y2 * self.width + x
+        self.types[start:stop:self.width] = chr(code) * (y2 - y1)
+        self.flags[start:stop:self.width] = chr(TILE_DEFS[code].flags) * (y2 - y1)
+
+    def clear_flag_row(self, x1, x2, y, flag):
+        """
+        Clears a bit flag over a run of cells in some row.
+        :param x1: (int) left column
+        :param x2: (int) right column, excluded
+        :param y: (int) row
+        :param flag: (int) BLOCKED, BLOCK_SIGHT or VISITED
+        """
+        start = y * self.width + x1
+        stop = y * self.width + x2
+        self.flags[start:stop] = self.flags[start:stop].translate(CLEAR_TABLES[flag])
+
+    def clear_flag_column(self, x, y1, y2, flag):
+        """
+        Clears a bit flag over a run of cells in some column.
+        :param x: (int) column
+        :param y1: (int) top row
+        :param y2: (int) bottom row, excluded
+        :param flag: (int) BLOCKED, BLOCK_SIGHT or VISITED
+        """
+        start = y1 * self.width + x
+        stop = y2 * self.width + x
+        self.flags[start:stop:self.width] = self.flags[start:stop:self.width].translate(CLEAR_TABLES[flag])
+
+    def is_blocked(self, x, y):
+        """
+        :param x: (int) cell column
+        :param y: (int) cell row
+        :return: (bool) True if the cell cannot be walked through
+        """
+        return self.flags[y * self.width + x] & BLOCKED != 0
+
+    def set_flag(self, x, y, flag, value):
+        """
+        Sets or clears a bit flag of some cell.
+        :param x: (int) cell column
+        :param y: (int) cell row
+        :param flag: (int) BLOCKED, BLOCK_SIGHT or VISITED
+        :param value: (bool) whether to set or clear the flag
+        """
+        i = y * self.width + x
+        if value:
+            self.flags[i] |= flag
+        else:
+            self.flags[i] &= ~flag
+
+
+class TileRow(object):
+    """
+    A row of the grid; indexing it returns a view of a single cell.
+    """
+    __slots__ = ('grid', 'y')
+
+    def __init__(self, grid, y):
+        self.grid = grid
+        self.y = y
+
+    def __len__(self):
+        return self.grid.width
+
+    def __getitem__(self, x):
+        if x < 0:
+            x += self.grid.width
+        if not 0 <= x < self.grid.width:
+            raise IndexError("column out of range: %s" % x)
+        return TileView(self.grid, x, self.y)
+
+
+class TileView(object):
+    """
+    Lightweight, sprite-like view of one cell. Reads and writes go straight through to the grid.
+    """
+    __slots__ = ('grid', 'x', 'y')
+
+    def __init__(self, grid, x, y):
+        self.grid = grid
+        self.x = x
+        self.y = y
+
+    def _get_flag(self, flag):
+        return self.grid.flags[self.y * self.grid.width + self.x] & flag != 0
+
+    def _set_flag(self, flag, value):
+        self.grid.set_flag(self.x, self.y, flag, value)
+
+    @property
+    def code(self):
+        return self.grid.types[self.y * self.grid.width + self.x]
+
+    @property
+    def blocked(self):
+        return self._get_flag(BLOCKED)
+
+    @blocked.setter
+    def blocked(self, value):
+        self._set_flag(BLOCKED, value)
+
+    @property
+    def block_sight(self):
+        return self._get_flag(BLOCK_SIGHT)
+
+    @block_sight.setter
+    def block_sight(self, value):
+        self._set_flag(BLOCK_SIGHT, value)
+
+    @property
+    def visited(self):
+        return self._get_flag(VISITED)
+
+    @visited.setter
+    def visited(self, value):
+        self._set_flag(VISITED, value)
+
+    @property
+    def image(self):
+        return self.grid.images[self.code]
+
+    @property
+    def drk_image(self):
+        return self.grid.drk_images[self.code]
@@ -0,0 +1,484 @@
+"""
+Author: Hector Lovo
+Created on: 5/3/2015
+
+This dungeon generator was created as a demo for WillowTreeApps.
+
+Headless map generation: lays out the rooms, halls, keys, stairs, objects and enemies as plain data.
+Nothing in here needs pygame or a display, so dungeons may be generated and validated in batch.
+"""
+from collections import deque
+from landscape import TileGrid, FLOOR, BLOCKED, BLOCK_SIGHT
+from themes import map_theme
+import random
+import struct
+
+# binary layout format
+LAYOUT_MAGIC = 'DGL1'
+LAYOUT_VERSION = 1
+# magic, version, width, height, theme, enemy-prob, seed, player-start x-y, number of:
+# rooms, stairs, keys, objects, enemies
+HEADER = struct.Struct('<4sBHHBBIiiHHHHH')
+ROOM = struct.Struct('<HHHH')  # x, y, width, height: in tiles
+STAIRS = struct.Struct('<HHB')  # x, y: in tiles; is-up
+SPOT = struct.Struct('<HH')  # x, y: in tiles; keys and enemies
+OBJECT = struct.Struct('<HHB')  # x, y: in tiles; index of the image in the theme's lst_image
+
+# room placement strategies
+PLACEMENT_SCAN = 'scan'  # rejection sampling; every candidate is checked against every room placed
+PLACEMENT_GRID = 'grid'  # rejection sampling; candidates are checked against an occupancy grid
+PLACEMENT_BSP = 'bsp'  # binary space partitioning; one room per leaf, nothing is ever rejected
+PLACEMENTS = (PLACEMENT_SCAN, PLACEMENT_GRID, PLACEMENT_BSP)
+SEED_LIMIT = 1 << 32  # seeds are stored as uint32: 0 <= seed < SEED_LIMIT
+BSP_MIN_LEAF = 5  # smallest room (4) plus the one-tile margin
+
+
+class RoomArea(object):
+    """
+    A room, in tiles. Behaves like the room's pixel rectangle when it comes to its center and to
+    collisions, so layouts match those built from pygame Rects.
+    """
+
+    def __init__(self, x, y, width, height):
+        self.x = x
+        self.y = y
+        self.width = width
+        self.height = height
+
+    @property
+    def center(self):
+        """
+        :return: (tuple) pixel x-y coordinates of the room's center
+        """
+        return (self.x << 5) + (self.width << 4), (self.y << 5) + (self.height << 4)
+
+    def collides(self, other):
+        """
+        :param other: (RoomArea) some other room
+        :return: (bool) True if both rooms overlap
+        """
+        return self.x < other.x + other.width and other.x < self.x + self.width and \
+            self.y < other.y + other.height and other.y < self.y + self.height
+
+
+class Layout(object):
+    """
+    The generated map, as plain data: the tile grid, the rooms (in the order they were placed), and
+    the pixel coordinates of the player's start and of every object and enemy.
+    """
+
+    def __init__(self, width, height, theme_num, seed=0, enemy_prob=0):
+        self.width = width
+        self.height = height
+        self.theme_num = theme_num
+        self.seed = seed
+        self.enemy_prob = enemy_prob
+        self.grid = TileGrid(width + 1, height + 1, theme_num)
+        self.rooms = list()
+        self.player_start = None
+        self.stairs = list()  # (x, y, is_up)
+        self.keys = list()  # (x, y)
+        self.objects = list()  # (x, y, image)
+        self.enemies = list()  # (x, y)
+
+    def to_bytes(self):
+        """
+        Serializes the layout into its compact binary format.
+        :return: (str) serialized layout
+        """
+        lst_image = map_theme[self.theme_num]["lst_image"]
+        parts = [HEADER.pack(LAYOUT_MAGIC, LAYOUT_VERSION, self.width, self.height, self.theme_num,
+                             self.enemy_prob, self.seed, self.player_start[0], self.player_start[1],
+                             len(self.rooms), len(self.stairs), len(self.keys), len(self.objects),
+                             len(self.enemies)),
+                 str(self.grid.types),
+                 str(self.grid.flags)]
+        parts.extend(ROOM.pack(room.x, room.y, room.width, room.height) for room in self.rooms)
+        parts.extend(STAIRS.pack(x >> 5, y >> 5, is_up) for (x, y, is_up) in self.stairs)
+        parts.extend(SPOT.pack(x >> 5, y >> 5) for (x, y) in self.keys)
+        parts.extend(OBJECT.pack(x >> 5, y >> 5, lst_image.index(image)) for (x, y, image) in self.objects)
+        parts.extend(SPOT.pack(x >> 5, y >> 5) for (x, y) in self.enemies)
+        return ''.join(parts)
+
+    @staticmethod
+    def from_bytes(data, offset=0):
+        """
+        Rebuilds a layout from its binary format.
+        :param data: (str) or (buffer) serialized layout
+        :param offset: (int) where the layout starts in data
+        :return: (Layout) the layout
+        """
+        (magic, version, width, height, theme_num, enemy_prob, seed, start_x, start_y,
+         n_rooms, n_stairs, n_keys, n_objects, n_enemies) = HEADER.unpack_from(data, offset)
+        if magic != LAYOUT_MAGIC or version != LAYOUT_VERSION:
+            raise ValueError("not a dungeon layout: magic %r, version %s" % (magic, version))
+        layout = Layout(width, height, theme_num, seed, enemy_prob)
+        layout.player_start = (start_x, start_y)
+        offset += HEADER.size
+        cells = layout.grid.width * layout.grid.height
+        # copied out of data, whether a string or a memory-mapped file: the map edits its grid
+        layout.grid.types = bytearray(buffer(data, offset, cells))
+        offset += cells
+        layout.grid.flags = bytearray(buffer(data, offset, cells))
+        offset += cells
+        for _ in range(n_rooms):
+            layout.rooms.append(RoomArea(*ROOM.unpack_from(data, offset)))
+            offset += ROOM.size
+        for _ in range(n_stairs):
+            x, y, is_up = STAIRS.unpack_from(data, offset)
+            layout.stairs.append((x << 5, y << 5, is_up))
+            offset += STAIRS.size
+        for _ in range(n_keys):
+            x, y = SPOT.unpack_from(data, offset)
+            layout.keys.append((x << 5, y << 5))
+            offset += SPOT.size
+        lst_image = map_theme[theme_num]["lst_image"]
+        for _ in range(n_objects):
+            x, y, image = OBJECT.unpack_from(data, offset)
+            layout.objects.append((x << 5, y << 5, lst_image[image]))
+            offset += OBJECT.size
+        for _ in range(n_enemies):
+            x, y = SPOT.unpack_from(data, offset)
+            layout.enemies.append((x << 5, y << 5))
+            offset += SPOT.size
+        return layout
+
+    def validate(self):
+        """
+        Checks that the layout is playable: the player starts on the floor, every key, stairway,
+        object and enemy sits on the floor, and every floor tile can be reached from the start.
+        :return: (list) of problems found; empty if the layout is valid
+        """
+        problems = list()
+        grid = self.grid
+        start = (self.player_start[0] >> 5, self.player_start[1] >> 5)
+        if grid.is_blocked(*start):
+            problems.append("player starts inside a wall at %s" % (start,))
+            return problems
+        for kind, spots in (("stairs", self.stairs), ("key", self.keys), ("object", self.objects),
+                            ("enemy", self.enemies)):
+            for spot in spots:
+                if grid.is_blocked(spot[0] >> 5, spot[1] >> 5):
+                    problems.append("%s inside a wall at %s" % (kind, (spot[0] >> 5, spot[1] >> 5)))
+        # flood the floor from the player's start
+        reached = bytearray(grid.width * grid.height)
+        reached[start[1] * grid.width + start[0]] = 1
+        queue = deque([start[1] * grid.width + start[0]])
+        while queue:
+            i = queue.popleft()
+            for j in (i - 1, i + 1, i - grid.width, i + grid.width):
+                if 0 <= j < len(reached) and not reached[j] and not grid.flags[j] & BLOCKED:
+                    reached[j] = 1
+                    queue.append(j)
+        unreached = sum(1 for i in range(len(reached)) if grid.types[i] == FLOOR and not reached[i])
+        if unreached:
+            problems.append("%s floor tiles cannot be reached" % unreached)
+        return problems
+
+
+class DungeonGenerator(object):
+    """
+    Generates a layout:
+        - places a random configuration of rooms on the map, connected by halls.
+        - places a spot for the player to start from
+        - places the stairs and the keys on the map
+        - probably places a guard near the key; depends on probability
+    The same seed always generates the same layout. The rooms may be placed by:
+        - PLACEMENT_GRID: random rooms, rejected if they overlap one already placed (or its margin).
+          The rooms placed are marked on an occupancy grid, so rejecting a candidate costs a few row
+          scans, no matter how many rooms exist.
+        - PLACEMENT_SCAN: same rooms as PLACEMENT_GRID, but each candidate is checked against every
+          room placed so far.
+        - PLACEMENT_BSP: the map is split into leaves and each leaf gets a room; bounded, since no
+          candidate is ever rejected.
+    """
+
+    def __init__(self, width=40, height=40, enemy_prob=0, seed=None, placement=PLACEMENT_GRID):
+        if seed is None:
+            seed = random.getrandbits(32)
+        if placement not in PLACEMENTS:
+            raise ValueError("unknown room placement: %s" % placement)
+        self.rng = random.Random(seed)
+        self.layout = Layout(width, height, self.rng.randint(0, len(map_theme) - 1), seed, enemy_prob)
+        self.grid = self.layout.grid
+        self.placement = placement
+
+    def generate(self):
+        """
+        Generates the layout.
+        :return: (Layout) the generated layout
+        """
+        rng = self.rng
+        rooms = list()
+        if self.placement == PLACEMENT_BSP:
+            self.generate_rooms_bsp(rooms)
+        else:
+            self.generate_rooms_around_map(rooms)
+        # place the exit randomly; with a single room, it goes where the player begins
+        indx = rng.randrange(len(rooms))
+        some_room = rooms.pop(indx)
+        self.add_stairs(some_room)
+        # put nothing where player begins
+        if rooms:
+            rooms.pop(0)
+        # how many keys to place: try 4 to 8, but never more than there are rooms left
+        if len(rooms) > 3:
+            placeable_keys = min(rng.randint(4, 8), len(rooms))
+        else:
+            placeable_keys = len(rooms)
+        # place keys in rooms, around map
+        for x in range(0, placeable_keys):
+            indx = rng.randrange(len(rooms))
+            some_room = rooms.pop(indx)
+            self.add_keys(some_room)
+            # add a guard
+            if rng.randint(0, 20 - self.layout.enemy_prob) < 5:  # init: 20% probability
+                self.add_enemies(some_room)
+        return self.layout
+
+    def max_room_dimension(self):
+        """
+        :return: (int) the largest a room may be on this map: max(5, area / 256), bound to 14
+        """
+        room_tries = self.grid.width * self.grid.height >> 6
+        return min(14, max(5, room_tries >> 2))
+
+    def generate_rooms_around_map(self, rooms):
+        """
+        Generates a bunch of rooms and places them on the map if they do not
+        collide with each other.
+        :param rooms: (list) will hold the rooms generated
+        """
+        rng = self.rng
+        width = self.layout.width
+        height = self.layout.height
+        room_tries = self.grid.width * self.grid.height >> 6  # times to try to create room: area / 64
+        max_room_dimension = self.max_room_dimension()
+        # cells taken by the rooms placed so far; one byte per cell, row-major
+        occupied = bytearray(self.grid.width * self.grid.height)
+        for n in range(room_tries):
+            w = rng.randint(4, max_room_dimension)
+            h = rng.randint(4, max_room_dimension)
+            x = rng.randint(1, width - w - 1)
+            y = rng.randint(1, height - h - 1)
+            current_room = RoomArea(x, y, w, h)
+            # the room, grown by one tile to the top and left, must not overlap any other room
+            if self.placement == PLACEMENT_SCAN:
+                failed = self.collides_with_rooms(RoomArea(x - 1, y - 1, w + 1, h + 1), rooms)
+            else:
+                failed = self.collides_with_grid(RoomArea(x - 1, y - 1, w + 1, h + 1), occupied)
+            if not failed:
+                self.place_room(current_room, rooms)
+                for row in range(y, y + h):
+                    start = row * self.grid.width + x
+                    occupied[start:start + w] = '\x01' * w
+
+    @staticmethod
+    def collides_with_rooms(candidate, rooms):
+        """
+        :param candidate: (RoomArea) area to check
+        :param rooms: (list) rooms placed so far
+        :return: (bool) True if the area overlaps any of the rooms
+        """
+        for other_room in rooms:
+            if candidate.collides(other_room):
+                return True
+        return False
+
+    def collides_with_grid(self, candidate, occupied):
+        """
+        :param candidate: (RoomArea) area to check
+        :param occupied: (bytearray) cells taken by the rooms placed so far
+        :return: (bool) True if the area overlaps any cell taken
+        """
+        for row in range(candidate.y, candidate.y + candidate.height):
+            start = row * self.grid.width + candidate.x
+            if '\x01' in occupied[start:start + candidate.width]:
+                return True
+        return False
+
+    def generate_rooms_bsp(self, rooms):
+        """
+        Splits the map into leaves and places one room in each of them, in leaf order; so rooms
+        that follow each other (and get connected by halls) are close to each other.
+        :param rooms: (list) will hold the rooms generated
+        """
+        max_room_dimension = self.max_room_dimension()
+        leaves = list()
+        # the border of the map stays solid
+        self.split_region(1, 1, self.layout.width - 2, self.layout.height - 2, max_room_dimension, leaves)
+        for (x, y, w, h) in leaves:
+            # the last row and column of a leaf are left as the margin to the next leaf's room
+            room_w = self.rng.randint(4, min(max_room_dimension, w - 1))
+            room_h = self.rng.randint(4, min(max_room_dimension, h - 1))
+            room_x = self.rng.randint(x, x + w - 1 - room_w)
+            room_y = self.rng.randint(y, y + h - 1 - room_h)
+            self.place_room(RoomArea(room_x, room_y, room_w, room_h), rooms)
+
+    def split_region(self, x, y, w, h, max_room_dimension, leaves):
+        """
+        Recursively splits a region of the map in two, near the middle of its longer side, until its
+        leaves are small enough to hold a single room.
+        :param x: (int) region's left column
+        :param y: (int) region's top row
+        :param w: (int) region's width, in tiles
+        :param h: (int) region's height, in tiles
+        :param max_room_dimension: (int) the largest a room may be
+        :param leaves: (list) will hold the leaves: (x, y, w, h) tuples
+        """
+        can_split_w = w >= BSP_MIN_LEAF << 1
+        can_split_h = h >= BSP_MIN_LEAF << 1
+        too_big = w > max_room_dimension + 1 or h > max_room_dimension + 1
+        if not (can_split_w or can_split_h) or not too_big:
+            leaves.append((x, y, w, h))
+        elif can_split_w and (w >= h or not can_split_h):
+            cut = self.rng.randint(max(BSP_MIN_LEAF, w * 2 // 5), min(w - BSP_MIN_LEAF, w * 3 // 5))
+            self.split_region(x, y, cut, h, max_room_dimension, leaves)
+            self.split_region(x + cut, y, w - cut, h, max_room_dimension, leaves)
+        else:
+            cut = self.rng.randint(max(BSP_MIN_LEAF, h * 2 // 5), min(h - BSP_MIN_LEAF, h * 3 // 5))
+            self.split_region(x, y, w, cut, max_room_dimension, leaves)
+            self.split_region(x, y + cut, w, h - cut, max_room_dimension, leaves)
+
+    def place_room(self, current_room, rooms):
+        """
+        Carves an accepted room, connects it to the previous one, and maybe furnishes it.
+        :param current_room: (RoomArea) room to place
+        :param rooms: (list) rooms placed so far
+        """
+        self.create_room(current_room)
+        (curr_cent_x, curr_cent_y) = current_room.center
+        room_count = len(rooms)
+        if room_count == 0:
+            # set the player's start location
+            self.layout.player_start = (curr_cent_x, curr_cent_y)
+        elif room_count > 0:
+            # create halls between rooms
+            (prev_cent_x, prev_cent_y) = rooms[room_count - 1].center
+            prev_cent_x >>= 5  # divide by 32 -> cell-representation
+            prev_cent_y >>= 5
+            curr_cent_y >>= 5
+            curr_cent_x >>= 5
+            # randomly decide whether to draw halls vert-first or horz-first
+            if self.rng.randint(0, 1) == 0:
+                self.create_h_hall(prev_cent_x, curr_cent_x, prev_cent_y)
+                self.create_v_hall(prev_cent_y, curr_cent_y, curr_cent_x)
+            else:
+                self.create_v_hall(prev_cent_y, curr_cent_y, prev_cent_x)
+                self.create_h_hall(prev_cent_x, curr_cent_x, curr_cent_y)
+        rooms.append(current_room)
+        self.layout.rooms.append(current_room)
+        # place some aesthetic in the room
+        if self.rng.randint(0, 2) == 1:
+            self.add_aesthetic_obj(current_room)
+
+    def create_room(self, room):
+        """
+        Creates a room, given some coordinates and dimensions.
+        :param room: (RoomArea) holds x-y coordinates, height, and width of the room
+        """
+        # make the tiles in the rectangle passable
+        x1 = room.x
+        x2 = room.x + room.width
+        y1 = room.y
+        y2 = room.y + room.height
+        self.grid.fill_rect(x1, y1, x2, y2, FLOOR)
+        # light up the walls containing this room
+        self.grid.clear_flag_row(x1, x2, y1 - 1, BLOCK_SIGHT)
+        self.grid.clear_flag_row(x1, x2, y2, BLOCK_SIGHT)
+        self.grid.clear_flag_column(x1 - 1, y1, y2, BLOCK_SIGHT)
+        self.grid.clear_flag_column(x2, y1, y2, BLOCK_SIGHT)
+
+    def create_h_hall(self, pcx, ncx, pcy):
+        """
+        Creates the horizontal hallway from room-A to room-B. Also, makes the
+        hall's walls illuminable.
+        :param pcx: (int) previous room's x-center coordinate
+        :param ncx: (int) new room's x-center coordinate
+        :param pcy: (int) previous room's y-center coordinate
+        """
+        x1 = min(pcx, ncx)
+        x2 = max(pcx, ncx) + 1
+        self.grid.fill_rect(x1, pcy, x2, pcy + 1, FLOOR)
+        # allow walls to be illuminated
+        self.grid.clear_flag_row(x1, x2, pcy - 1, BLOCK_SIGHT)
+        self.grid.clear_flag_row(x1, x2, pcy + 1, BLOCK_SIGHT)
+
+    def create_v_hall(self, pcy, ncy, pcx):
+        """
+        Creates the vertical hallway from room-A to room-B.  Also, makes the
+        hall's walls illuminable.
+        :param pcy: (int) previous room's y-center coordinate
+        :param ncy: (int) new room's x-center coordinate
+        :param pcx: (int) previous room's x-center coordinate
+        """
+        y1 = min(pcy, ncy)
+        y2 = max(pcy, ncy) + 1
+        self.grid.fill_column(pcx, y1, y2, FLOOR)
+        # allow walls to be illuminated
+        self.grid.clear_flag_column(pcx + 1, y1, y2, BLOCK_SIGHT)
+        self.grid.clear_flag_column(pcx - 1, y1, y2, BLOCK_SIGHT)
+
+    def add_stairs(self, room):
+        """
+        Places staircase in some room on the map.
+        :param room: (RoomArea) holds x-y coordinates, height, and width of the room
+        """
+        (x, y) = self.get_valid_room_coords(room)
+        self.layout.stairs.append((x, y, self.rng.randint(0, 1)))
+
+    def add_keys(self, room):
+        """
+        Places keys in some room on the map.
+        :param room: (RoomArea) holds x-y coordinates, height, and width of the room
+        """
+        self.layout.keys.append(self.get_valid_room_coords(room))
+
+    def add_aesthetic_obj(self, room):
+        """
+        Places objects in some room on the map.
+        :param room: (RoomArea) holds x-y coordinates, height, and width of the room
+        """
+        (x, y) = self.get_valid_room_coords(room)
+        self.layout.objects.append((x, y, self.rng.choice(map_theme[self.layout.theme_num]["lst_image"])))
+
+    def add_enemies(self, room):
+        """
+        Places enemy in some room on the map that contains a key.
+        :param room: (RoomArea) holds x-y coordinates, height, and width of the room
+        """
+        self.layout.enemies.append(self.get_valid_room_coords(room))
+
+    def get_valid_room_coords(self, room):
+        """
+        Creates valid coordinates within the dimensions of some room
+        :param room: (RoomArea) holds x-y coordinates, height, and width of the room
+        :return: (tuple) x-y coordinates from a random spot in the room
+        """
+        x = self.rng.randint(room.x + 1, room.x + room.width - 1)
+        y = self.rng.randint(room.y + 1, room.y + room.height - 1)
+        return x << 5, y << 5
+
+
+def level_seed(seed, level):
+    """
+    Derives the seed of some level from the seed of a whole game; so a level is the same whether it
+    was generated ahead of time or on the spot.
+    :param seed: (int) game seed
+    :param level: (int) level number
+    :return: (int) 32-bit seed of the level
+    """
+    return random.Random((seed << 20) ^ level).getrandbits(32)
+
+
+def generate_layout(width=40, height=40, enemy_prob=0, seed=None, placement=PLACEMENT_GRID):
+    """
+    Generates the layout of a map.
+    :param width: (int) map width, in tiles
+    :param height: (int) map height, in tiles
+    :param enemy_prob: (int) probability of an enemy appearing where a key is
+    :param seed: (int) random seed; a random one is picked (and recorded in the layout) if None
+    :param placement: (string) room placement strategy: PLACEMENT_GRID, PLACEMENT_SCAN or PLACEMENT_BSP
+    :return: (Layout) the generated layout
+    """
+    return DungeonGenerator(width, height, enemy_prob, seed, placement).generate()
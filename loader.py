@@ -0,0 +1,89 @@
+"""
+Author: Hector Lovo
+Created on: 5/3/2015
+
+This dungeon generator was created as a demo for WillowTreeApps.
+"""
+from map import make_map
+import threading
+
+
+class MapLoader(object):
+    """
+    Generates the layout of the next map in a worker thread while the current one is being played.
+    Only the generation runs in the background; binding the sprites and images is left to the main
+    thread, once the map is handed over.
+    """
+
+    def __init__(self):
+        self.thread = None
+        self.params = None
+        # filled by the worker thread: each prefetch gets its own, so a discarded one can't leak
+        self.result = None
+
+    def prefetch(self, width, height, enemy_prob, seed=None):
+        """
+        Starts generating a map in the background; a pending prefetch is discarded.
+        :param width: (int) map width, in tiles
+        :param height: (int) map height, in tiles
+        :param enemy_prob: (int) probability of an enemy appearing where a key is
+        :param seed: (int) random seed of the map
+        """
+        self.params = (width, height, enemy_prob, seed)
+        self.result = list()
+        self.thread = threading.Thread(target=generate, args=self.params + (self.result,))
+        self.thread.daemon = True
+        self.thread.start()
+
+    def generating(self):
+        """
+        :return: (bool) True while a map is being generated in the background
+        """
+        return self.thread is not None and self.thread.is_alive()
+
+    def pending(self, width, height, enemy_prob, seed=None):
+        """
+        :param width: (int) map width, in tiles
+        :param height: (int) map height, in tiles
+        :param enemy_prob: (int) probability of an enemy appearing where a key is
+        :param seed: (int) random seed of the map
+        :return: (bool) True while that very map is being generated in the background; a prefetch of
+        another map does not count, take() discards it
+        """
+        return self.generating() and self.params == (width, height, enemy_prob, seed)
+
+    def take(self, width, height, enemy_prob, seed=None):
+        """
+        Hands over a bound map. If the prefetched map was built for the same parameters, it waits for
+        it (if still generating) and binds it; otherwise, the prefetch is discarded and the map is
+        generated right away.
+        :param width: (int) map width, in tiles
+        :param height: (int) map height, in tiles
+        :param enemy_prob: (int) probability of an enemy appearing where a key is
+        :param seed: (int) random seed of the map
+        :return: (TheMap) map ready to be played
+        """
+        the_map = None
+        if self.thread is not None and self.params == (width, height, enemy_prob, seed):
+            self.thread.join()
+            if self.result:
+                the_map = self.result[0]
+        self.thread = None
+        self.params = None
+        self.result = None
+        if the_map is None:
+            the_map = make_map(width, height, enemy_prob, bind=False, seed=seed)
+        the_map.bind()
+        return the_map
+
+
+def generate(width, height, enemy_prob, seed, result):
+    """
+    Runs in the worker thread: generates a map, without binding it.
+    :param width: (int) map width, in tiles
+    :param height: (int) map height, in tiles
+    :param enemy_prob: (int) probability of an enemy appearing where a key is
+    :param seed: (int) random seed of the map
+    :param result: (list) the map is appended to it
+    """
+    result.append(make_map(width, height, enemy_prob, bind=False, seed=seed))
@@ -27,12 +27,49 @@ Abstract:
     To generate a new map, go into debug mode by pressing "d" and then simply press "s" key to skip to the
     next stage. Otherwise, you may also simply collect all the keys and find the stairs.
     NOTE: If you press "s" to skip the map, the map will not increase in size by 2 units.
+    Once the map reaches 160 tiles on a side (map.py: STREAMING_SIZE), it is streamed instead of built up
+    front: only the chunks around the player are generated and kept in memory (see world.py).
+
+    In debug mode, press "p" to show how long each phase of a frame takes (rolling p50/p95/p99). To
+    analyze the frame times offline, run: python main.py --profile-dump frames.csv (or frames.json).
+
+    Every map is derived from the game's seed (--seed), so a game can be recorded and replayed exactly:
+    python main.py --record game.json, then python main.py --replay game.json [--headless] [--no-render].
+    The replay runs uncapped and prints how many frames it took and how long. Only new games can be
+    recorded: not with --load or --pack.
+
+    Between levels, the loading screen stays up for at least 6 seconds (LOADING_WAIT); change it with
+    --loading-wait MS, e.g. --loading-wait 0 to go straight to the next map.
+
+    To keep a game, run: python main.py --save game.sav; it is saved on quit and with F5. Pick it up with
+    --load game.sav.
+
+    By default, the game moves a step per frame, at up to 60 frames per second. With --tick-rate 60, the
+    simulation (input, enemies, collisions) runs on a fixed timestep instead, and the frames are drawn
+    independently: interpolated between ticks, and dropped when drawing falls behind. For soak tests,
+    python main.py --soak 100000 runs that many ticks without a window, uncapped, on random input.
 """
 
 from pygame.constants import *
-from entities import Player
+from entities import Player, map_theme, theme_images, preload_themes_async
 from camera import Camera, complex_camera
-from map import TheMap
+from map import TheMap, bind_dark_tile_images
+from loader import MapLoader
+from landscape import BLOCK_SIGHT, VISITED
+from renderer import MapRenderer, DARK, LIT
+from fov import FieldOfView
+from text import TextCache
+from profiler import FrameProfiler
+from ai import EnemyScheduler, AI_BUDGET_MOVES
+from pathfind import DistanceField
+from snapshot import Snapshot, save_snapshot, load_snapshot
+from archive import MapArchive
+from atlas import install_atlases
+from replay import InputRecorder, InputPlayer, RandomInput
+from layout import level_seed, SEED_LIMIT
+from timeit import default_timer
+import argparse
+import os
 import pygame
 import random
 
@@ -44,7 +81,18 @@ if not pygame.mixer:
 # constants
 LAND_WIDTH = 50
 LAND_HEIGHT = 50
+MAX_ENEMY_PROB = 15  # afterwards, the probability of enemy appearing where key is, is 100%
+LOADING_WAIT = 6000  # ms to show the loading msg for; 0 goes straight to the next map
+KEY_REPEAT_DELAY = 10  # ms before a held key starts repeating
+KEY_REPEAT_INTERVAL = 30  # ms between the repeats of a held key
+SIM_TICK_RATE = 60  # fixed timestep: simulation ticks per second, unless told otherwise
+MAX_TICKS_PER_FRAME = 5  # fixed timestep: ticks run to catch up before drawing; past that, the game slows down
+RENDER_FPS = 120  # fixed timestep: frames drawn per second, at most
+PROFILE_REFRESH = 30  # frames between refreshes of the profiler overlay
 
+LOADING_POLL_MS = 15  # how often the loading screen checks on the images and the map being loaded
+LOADING_BAR_WIDTH = 300
+LOADING_BAR_HEIGHT = 12
 LOADING_MSG_FONT_SIZE = 36
 RANDOM_LOADING_MSG_FONT_SIZE = 20
 RANDOM_LOADING_MSGS = ["They are looking for you. Don't stop. Keep moving.",
@@ -54,12 +102,42 @@ RANDOM_LOADING_MSGS = ["They are looking for you. Don't stop. Keep moving.",
                        "Don't let them get you. One touch will put you to sleep."]
 
 
+def parse_seed(text):
+    """
+    :param text: (string) game seed
+    :return: (int) the seed; it is saved and recorded as 32 bits, so it must fit
+    """
+    try:
+        seed = int(text)
+    except ValueError:
+        raise argparse.ArgumentTypeError("not a seed: %s" % text)
+    if not 0 <= seed < SEED_LIMIT:
+        raise argparse.ArgumentTypeError("seeds go from 0 to %s: %s" % (SEED_LIMIT - 1, text))
+    return seed
+
+
+def parse_wait(text):
+    """
+    :param text: (string) time to show the loading screen for, in ms
+    :return: (int) the time; 0 or more
+    """
+    try:
+        wait = int(text)
+    except ValueError:
+        raise argparse.ArgumentTypeError("not a time in ms: %s" % text)
+    if wait < 0:
+        raise argparse.ArgumentTypeError("the loading wait can't be negative: %s" % text)
+    return wait
+
+
 class DunGen:
     """
     This is the main class that initializes everything.
     """
 
-    def __init__(self, width=1000, height=600):
+    def __init__(self, width=1000, height=600, loading_wait=LOADING_WAIT, profile_dump=None, seed=None,
+                 record=None, save_path=None, load_path=None, pack_path=None, fog=False, tick_rate=None,
+                 deterministic=False):
         pygame.init()
         # set the window dimensions
         self.window_width = width
@@ -69,24 +147,86 @@ class DunGen:
         pygame.display.set_caption("Dun-Gen")
         # noinspection PyArgumentList
         self.background = pygame.Surface((self.window_width, self.window_height))
-        # generate the map
-        self.map = TheMap(LAND_WIDTH, LAND_HEIGHT)
-        # probability of enemy appearing
-        self.enemy_prob = 0
+        # in fog mode, explored areas are shadowed by a fog mask over the lit map: no dark images
+        self.fog = fog
+        # fonts and rendered text are reused from frame to frame
+        self.text_cache = TextCache()
+        # the game is saved to save_path on quit (and with F5); load_path holds a game to pick up
+        self.save_path = save_path
+        saved = None
+        if load_path:
+            saved = load_snapshot(load_path)
+            seed = saved.seed
+        # every level's map is derived from the game's seed: the same seed plays the same maps
+        if seed is None:
+            seed = random.getrandbits(32)
+        # saved games and recordings hold the seed as 32 bits; --seed is checked, but not every caller
+        seed &= SEED_LIMIT - 1
+        self.seed = seed
+        self.rng = random.Random(seed)
+        # levels may come from a level pack; those past its end are generated
+        self.pack = MapArchive(pack_path) if pack_path else None
+        if saved is None:
+            self.level = 0
+            # generate the map
+            self.map = self.pack_map(self.level, bind=False) or TheMap(LAND_WIDTH, LAND_HEIGHT, bind=False,
+                                                                       seed=level_seed(self.seed, self.level))
+            # probability of enemy appearing
+            self.enemy_prob = 0
+        else:
+            self.level = saved.level
+            self.map = saved.map
+            self.enemy_prob = saved.enemy_prob
+        # the next map is generated in the background while this one is played
+        self.loading_wait = loading_wait
+        self.loader = MapLoader()
+        # the themes packed into atlases (see atlas.py) take a file each; the images of the others are
+        # decoded in worker threads, the map's theme first. The loading screen is up until that theme
+        # is done, and the others are finished in the background while playing
+        install_atlases()
+        themes = [self.map.theme_num] + [theme_num for theme_num in map_theme if theme_num != self.map.theme_num]
+        self.preload = preload_themes_async(themes, dark=not fog)
+        self.wait_until_loaded(theme_images(self.map.theme_num, dark=not fog))
+        self.map.bind()
+        self.prefetch_next_map()
         # creates the clock
         self.clock = pygame.time.Clock()
         self.time = pygame.time.get_ticks()
+        # simulation ticks per second on a fixed timestep; None moves the game a tick per frame
+        self.tick_rate = tick_rate
+        self.tick_count = 0
+        # nothing in the simulation may depend on how long things take when ticks are fixed, or when the
+        # game is recorded or replayed: the same input must play out the same
+        self.deterministic = deterministic or bool(tick_rate) or bool(record)
+        self.sim_start = self.time
+        # fixed timestep: arrow keys held down -> tick they were pressed on; they repeat on ticks
+        self.held_keys = dict()
+        self.repeat_ticks = max(1, int(round(KEY_REPEAT_INTERVAL * (tick_rate or SIM_TICK_RATE) / 1000.0)))
         # init player
         self.player = Player()
         self.player.rect.left = self.map.player_start_loc[0]
         self.player.rect.top = self.map.player_start_loc[1]
+        if saved is not None:
+            self.player.rect.topleft = saved.player_pos
         self.player_sprites = pygame.sprite.RenderPlain(self.player)
-        # create the camera
-        self.camera = Camera(complex_camera, self.map.width << 5, self.map.height << 5, self.window_width,
-                             self.window_height)
+        # create the camera, the renderer and the field of view
+        self.reset_view()
         # debugging
         self.debug_mode = False
         self.god_mode = False
+        # frame-time instrumentation: the overlay is toggled from debug mode; the frames are dumped
+        # to profile_dump (.csv or .json) on quit
+        self.profiler = FrameProfiler(record=profile_dump is not None)
+        self.profile_dump = profile_dump
+        self.show_profile = False
+        self.profile_lines = list()
+        self.frame_count = 0
+        # records the input to replay the game later
+        self.recorder = None
+        if record:
+            self.recorder = InputRecorder(record, seed, self.window_width, self.window_height, tick_rate)
+        # while a recording is replayed, quitting (ESC, closing the window) ends the replay, not the process
+        self.replaying = False
         # used for demo
         self.seen_first_key = False
         self.seen_first_stairs = False
@@ -95,33 +235,138 @@ class DunGen:
         """
         This initializes everything and starts the main-loop.
         """
+        if self.tick_rate:
+            self.fixed_step_loop()
         # allows key-strokes to repeat if they're held down
-        pygame.key.set_repeat(10, 30)
+        pygame.key.set_repeat(KEY_REPEAT_DELAY, KEY_REPEAT_INTERVAL)
         # clear the background: black
         self.background = self.background.convert()
         self.background.fill((0, 0, 0))
         while 1:
             self.clock.tick(60)  # displays 60 max-fps
+            self.profiler.begin_frame()
             self.controller()
             self.view()
+            self.profiler.end_frame()
+            self.frame_count += 1
+
+    def fixed_step_loop(self):
+        """
+        Runs the game on a fixed timestep: the simulation advances in ticks of 1/tick_rate s, whatever
+        the frame rate, and held keys repeat on ticks instead of key-repeat events. Frames are drawn
+        in between, up to RENDER_FPS, with the moving sprites interpolated between the last two ticks.
+        When drawing falls behind, several ticks run before the next frame (frames are dropped); past
+        MAX_TICKS_PER_FRAME, the lag is forgotten and the game slows down instead.
+        """
+        self.background = self.background.convert()
+        self.background.fill((0, 0, 0))
+        tick_ms = 1000.0 / self.tick_rate
+        lag = 0.0
+        events = list()
+        previous = default_timer()
+        while 1:
+            self.clock.tick(RENDER_FPS)
+            self.profiler.begin_frame()
+            now = default_timer()
+            lag += (now - previous) * 1000.0
+            previous = now
+            # events wait for the next tick
+            events += pygame.event.get()
+            ticks = 0
+            while lag >= tick_ms:
+                if ticks == MAX_TICKS_PER_FRAME:
+                    lag = 0.0
+                    break
+                self.controller(events, self.tick_time())
+                events = list()
+                lag -= tick_ms
+                ticks += 1
+            self.view(lag / tick_ms)
+            self.profiler.end_frame()
+            self.frame_count += 1
+
+    def soak_loop(self, ticks, input_source, render=False):
+        """
+        Runs the simulation for some ticks as fast as possible, driven by generated input; for soak
+        tests.
+        :param ticks: (int) simulation ticks to run
+        :param input_source: (RandomInput) hands out the events of every tick
+        :param render: (bool) whether to draw a frame per tick too
+        :return: (tuple) ticks run, seconds taken
+        """
+        self.background = self.background.convert()
+        self.background.fill((0, 0, 0))
+        start = default_timer()
+        while self.tick_count < ticks:
+            self.profiler.begin_frame()
+            self.controller(input_source.events_at(self.tick_count), self.tick_time())
+            if render:
+                self.view()
+            self.profiler.end_frame()
+            self.frame_count += 1
+        return self.tick_count, default_timer() - start
+
+    def tick_time(self):
+        """
+        :return: (int) game ticks, in ms, of the current simulation tick: simulated, not measured
+        """
+        return self.sim_start + int(self.tick_count * 1000.0 / (self.tick_rate or SIM_TICK_RATE))
 
-    def controller(self):
+    def replay_loop(self, input_player, render=True):
         """
-        Handles all of the events-functionality: keys-pressed, etc.
+        Replays a recording as fast as possible: no frame cap and no key-repeat; the recorded events
+        are handed to the controller on the frame they were recorded in, at the same time since the
+        start of the simulation. A recording ends with the game quitting: the replay stops there.
+        :param input_player: (InputPlayer) recording to replay
+        :param render: (bool) whether to draw the frames too
+        :return: (tuple) frames replayed, seconds taken
         """
-        now = pygame.time.get_ticks()
-        for e in pygame.event.get():
+        self.background = self.background.convert()
+        self.background.fill((0, 0, 0))
+        start = default_timer()
+        self.replaying = True
+        while self.replaying and not input_player.finished(self.tick_count):
+            self.profiler.begin_frame()
+            events = input_player.events_at(self.tick_count)
+            self.controller(events, self.sim_start + input_player.ticks)
+            if render and self.replaying:
+                self.view()
+            self.profiler.end_frame()
+            self.frame_count += 1
+        self.replaying = False
+        return self.frame_count, default_timer() - start
+
+    def controller(self, events=None, now=None):
+        """
+        Handles all of the events-functionality: keys-pressed, etc. Each call is a tick of the game:
+        input, then the enemies.
+        :param events: (list) events to handle; the pending pygame events if None
+        :param now: (int) game ticks, in ms; pygame's ticks if None
+        """
+        self.profiler.start("controller")
+        if events is None:
+            events = pygame.event.get()
+        if now is None:
+            now = pygame.time.get_ticks()
+        if self.recorder is not None:
+            # relative to the start of the simulation: the replaying game adds its own start time
+            self.recorder.record(self.tick_count, now - self.sim_start, events)
+        # where the player stood on the previous tick: frames are interpolated from there
+        self.player.prev_pos = self.player.rect.topleft
+        for e in events:
             if e.type == KEYDOWN:
                 if (e.key == K_RIGHT) or (e.key == K_LEFT) or (e.key == K_UP) or (e.key == K_DOWN):
-                    self.player.move(self.map.landscape, self.map.map_objects["other"], e.key)
+                    self.player.move(self.map.landscape, self.map.obstacles, e.key)
+                    if self.tick_rate:
+                        self.held_keys[e.key] = self.tick_count
                 elif e.key == K_SPACE:
                     # determine if keys are around; remove the key if found
                     if pygame.sprite.spritecollide(self.player, self.map.map_objects["keys"], True):
                         self.seen_first_key = True
                     # determine if all keys have been collected and player's at a stairwell
-                    if len(self.map.map_objects["keys"]) == 0 and pygame.sprite.spritecollide(self.player,
-                                                                                              self.map.map_objects[
-                                                                                                  "stairs"], False):
+                    if self.map.keys_remaining() == 0 and pygame.sprite.spritecollide(self.player,
+                                                                                       self.map.map_objects[
+                                                                                           "stairs"], False):
                         self.seen_first_stairs = True
                         self.load_new_map()
                 elif e.key == K_d and now - self.time > 250:
@@ -134,8 +379,15 @@ class DunGen:
                     # enter god-mode
                     self.god_mode = not self.god_mode
                     self.time = now
+                elif self.debug_mode and e.key == K_p and now - self.time > 250:
+                    # show frame-time profile
+                    self.show_profile = not self.show_profile
+                    self.profile_lines = list()
+                    self.time = now
+                elif e.key == K_F5 and self.save_path:
+                    self.save_game()
                 elif e.key == K_ESCAPE:
-                    quit()
+                    self.quit()
                 # debug mode doesn't allow the map to grow
                 # probability of enemies appearing still increases
                 if self.debug_mode:
@@ -143,60 +395,234 @@ class DunGen:
                         self.map.width -= 2
                         self.map.height -= 2
                         self.load_new_map()
+            elif e.type == KEYUP:
+                self.held_keys.pop(e.key, None)
             elif e.type == QUIT:
-                quit()
+                self.quit()
+        # fixed timestep: the arrow keys held down move the player every repeat_ticks
+        for key, pressed in self.held_keys.items():
+            held = self.tick_count - pressed
+            if held > 0 and held % self.repeat_ticks == 0:
+                self.player.move(self.map.landscape, self.map.obstacles, key)
+        # big maps are streamed: the part of the map in memory follows the player
+        if self.map.stream(self.player):
+            self.reset_view()
+        self.profiler.stop("controller")
+        self.update_enemies()
+        self.tick_count += 1
 
-        # move the enemies towards the player, if player is near enough
-        for enemy_sprite in self.map.enemies_lst:
-            if pygame.sprite.collide_circle(enemy_sprite, self.player):  # player-radius: 6, enemy-radius: 4
-                enemy_sprite.move_towards_player(self.map.landscape, self.player.rect, self.map.map_objects["other"])
+    def update_enemies(self):
+        """
+        Moves the enemies towards the player, if player is near enough; the scheduler decides which
+        enemies move this frame, within the frame's AI budget.
+        """
+        self.profiler.start("enemies")
+        self.enemy_scheduler.update(self.map, self.player)  # player-radius: 6, enemy-radius: 4
+        self.profiler.stop("enemies")
+
+    def save_game(self):
+        """
+        Saves the game to save_path: the map as it is now, the level, and where the player stands.
+        """
+        save_snapshot(self.save_path, Snapshot(self.map, self.seed, self.level, self.enemy_prob,
+                                               self.player.rect.topleft))
+
+    def end_state(self):
+        """
+        :return: (string) where the game stands: the level, where the player stands and the keys left;
+                 a replay ends the same as the game it was recorded from
+        """
+        return 'level %s, player at %s, %s keys left' % (self.level, self.player.rect.topleft,
+                                                          self.map.keys_remaining())
+
+    def quit(self):
+        """
+        Saves the game, the input recording and dumps the frame-time profile, if requested, closes the
+        level pack and quits.
+        While a recording is replayed, only ends the replay.
+        """
+        if self.replaying:
+            self.replaying = False
+            return
+        if self.save_path:
+            self.save_game()
+        if self.recorder is not None:
+            self.recorder.save(self.tick_count + 1)
+        if self.profile_dump:
+            self.profiler.dump(self.profile_dump)
+        if self.pack is not None:
+            self.pack.close()
+        quit()
 
-    def view(self):
+    def view(self, alpha=1.0):
         """
         Handles all of the display functionality.
+        :param alpha: (float) fraction of a tick elapsed since the last one; the player and the
+                      enemies that moved on it are drawn that far from where they stood before it
         """
+        # caches the images decoded in the background since the last frame
+        self.preload.poll()
+        player_rect = self.interpolate(self.player, alpha)
+        self.camera.follow(player_rect)
+        self.renderer.begin_frame(self.camera.state.topleft)
         # draw scene and objects
+        self.profiler.start("walls_floors")
         self.draw_walls_floors_to_screen()
+        self.profiler.stop("walls_floors")
+        self.profiler.start("objects")
         self.draw_objects_to_screen()
-        # draw enemies, if near player or in god-mode
-        for sprite in self.map.enemies_lst:
-            if pygame.sprite.collide_circle(sprite, self.player) or self.god_mode:
-                self.screen.blit(sprite.image, self.camera.apply(sprite))
+        # draw enemies, if near player or in god-mode; only those on screen are looked at
+        for sprite in self.map.enemies_in(self.camera.view_rect()):
+            if self.is_in_view(sprite):
+                if sprite.last_tick == self.enemy_scheduler.frame:
+                    rect = self.interpolate(sprite, alpha)
+                else:
+                    rect = sprite.rect
+                self.renderer.draw(sprite.image, rect.move(self.camera.state.topleft))
         # draw player
         for sprite in self.player_sprites:
-            self.screen.blit(sprite.image, self.camera.apply(sprite))
+            self.renderer.draw(sprite.image, player_rect.move(self.camera.state.topleft))
+        self.profiler.stop("objects")
         # finally, draw text
+        self.profiler.start("text")
         self.keys_remaining_msg()
         self.draw_demo_msg()
         self.draw_debug_msg()
-        # present changes to window
-        pygame.display.flip()
+        self.draw_profile_overlay()
+        self.profiler.stop("text")
+        # present changes to window: only the dirty parts of the screen
+        self.profiler.start("present")
+        self.renderer.present(self.screen)
+        self.profiler.stop("present")
+
+    @staticmethod
+    def interpolate(sprite, alpha):
+        """
+        :param sprite: (Sprite) sprite with a prev_pos: its x-y coordinates on the previous tick
+        :param alpha: (float) fraction of a tick elapsed since the last one
+        :return: (Rect) the sprite's rect, between where it stood on the previous tick and now
+        """
+        if alpha >= 1:
+            return sprite.rect
+        x, y = sprite.prev_pos
+        return sprite.rect.move(int((x - sprite.rect.left) * (1 - alpha)), int((y - sprite.rect.top) * (1 - alpha)))
 
     def load_new_map(self):
         """
-        Loads a new map. Displays a loading message for 6 seconds and generates a new map.
+        Loads a new map. Displays a loading message and swaps in the map that was generated in the
+        background (or generates it now, if it was built for another size). The message stays up for
+        at least loading_wait ms.
         """
         self.clock.tick()  # initialize a counter
-        self.screen.blit(self.background, (0, 0))
-        self.display_text_to_screen(LOADING_MSG_FONT_SIZE, "Loading...")
-        self.display_text_to_screen(RANDOM_LOADING_MSG_FONT_SIZE, random.choice(RANDOM_LOADING_MSGS),
-                                    pos_y=(self.background.get_height() >> 1) + 35,
-                                    rgb_color=(255, 25, 25))
-        pygame.display.update()  # display loading page
-        # generate a new game
-        self.map = TheMap(self.map.width + 2, self.map.height + 2)
-        self.player.rect.left, self.player.rect.top = self.map.player_start_loc
+        tip = self.rng.choice(RANDOM_LOADING_MSGS)
+        self.draw_loading_screen(0.0, tip)  # display loading page
         # 15 is the boundary; afterwards, the probability of enemy appearing where key is, is 100%
-        if self.enemy_prob < 15:
+        if self.enemy_prob < MAX_ENEMY_PROB:
             self.enemy_prob += 1
-        self.map.probability_enemy_appears = self.enemy_prob
+        # start a new game, once the images and the map still being loaded in the background are ready
+        self.level += 1
+        params = (self.map.width + 2, self.map.height + 2, self.enemy_prob, level_seed(self.seed, self.level))
+        in_pack = self.pack is not None and self.level < len(self.pack)
+        self.wait_until_loaded(tip=tip, next_map=None if in_pack else params)
+        self.map = self.pack_map(self.level) or self.loader.take(*params)
+        self.player.rect.left, self.player.rect.top = self.map.player_start_loc
         # readjust the camera
-        self.camera = Camera(complex_camera, self.map.width << 5, self.map.height << 5,
-                             self.window_width,
-                             self.window_height)
+        self.reset_view()
+        self.prefetch_next_map()
         t1 = self.clock.tick()
-        time_to_wait = 6000 - t1  # provide 6 seconds (or more) to read loading msg
-        pygame.time.wait(time_to_wait)
+        time_to_wait = self.loading_wait - t1  # provide some time (or more) to read loading msg
+        if time_to_wait > 0:
+            pygame.time.wait(time_to_wait)
+
+    def wait_until_loaded(self, requests=None, tip=None, next_map=None):
+        """
+        Shows the loading screen until some images (every image being decoded, if None) are cached
+        and the next map is no longer being generated in the background; the progress bar shows how
+        far along they are. The window's events are pumped meanwhile, so it stays responsive.
+        :param requests: (list) of (file, colorkey) pairs to wait for
+        :param tip: (string) loading message to show
+        :param next_map: (tuple) width, height, enemy probability and seed of the map about to be
+        taken from the loader; a prefetch of any other map is about to be discarded, and is not waited
+        for. None if no map is taken
+        """
+        while True:
+            self.preload.poll()
+            if requests is None:
+                done, total = self.preload.converted, self.preload.total
+            else:
+                done, total = self.preload.count_ready(requests), len(requests)
+            # the map being generated counts as one more step
+            if next_map is None or not self.loader.pending(*next_map):
+                done += 1
+            if done == total + 1:
+                return
+            self.draw_loading_screen(float(done) / (total + 1), tip)
+            pygame.event.pump()
+            pygame.time.wait(LOADING_POLL_MS)
+
+    def draw_loading_screen(self, progress, tip=None):
+        """
+        Draws the loading screen: the loading message, a progress bar, and maybe a tip.
+        :param progress: (float) fraction loaded, 0 to 1
+        :param tip: (string) loading message to show under the bar
+        """
+        self.screen.blit(self.background, (0, 0))
+        half_height = self.background.get_height() >> 1
+        if pygame.font:
+            self.screen.blit(*self.render_text(LOADING_MSG_FONT_SIZE, "Loading..."))
+            if tip is not None:
+                self.screen.blit(*self.render_text(RANDOM_LOADING_MSG_FONT_SIZE, tip, pos_y=half_height + 35,
+                                                   rgb_color=(255, 25, 25)))
+        bar = pygame.Rect(0, 0, LOADING_BAR_WIDTH, LOADING_BAR_HEIGHT)
+        bar.center = (self.background.get_width() >> 1, half_height + 70)
+        pygame.draw.rect(self.screen, (255, 255, 255), bar, 1)
+        filled = bar.inflate(-4, -4)
+        filled.width = int(filled.width * progress)
+        self.screen.fill((255, 25, 25), filled)
+        pygame.display.update()
+
+    def reset_view(self):
+        """
+        Creates the camera, the renderer, the field of view, and the enemy scheduler and its distance
+        field, for the current map; needed whenever the map's grid is swapped or moves.
+        """
+        # the grid's last row and column are always walls; the camera stops short of them
+        grid = self.map.landscape
+        self.camera = Camera(complex_camera, (grid.width - 1) << 5, (grid.height - 1) << 5, self.window_width,
+                             self.window_height)
+        # draws the map from pre-rendered chunks; lighting is only recomputed when the player changes tile
+        if not self.fog:
+            bind_dark_tile_images(grid)
+        self.renderer = MapRenderer(grid, self.window_width, self.window_height, self.fog)
+        self.fov = FieldOfView(grid)
+        self.lighting_key = None
+        self.lit_cells = list()
+        # enemies find their way to the player through a distance field, shared by all of them
+        # on a budget of moves, not of time, where the game must be deterministic
+        self.enemy_scheduler = EnemyScheduler(self.map.enemies_lst, DistanceField(grid), index=self.map.enemy_index,
+                                              max_moves=AI_BUDGET_MOVES if self.deterministic else None)
+        # the player may have been moved: do not interpolate from where it stood
+        self.player.prev_pos = self.player.rect.topleft
+
+    def pack_map(self, level, bind=True):
+        """
+        Opens some level of the level pack; it only reads and decodes that level out of the mapped file.
+        :param level: (int) level number, from 0
+        :param bind: (bool) whether to bind the map right away
+        :return: (TheMap) the level's map; None if there is no pack or it has no such level
+        """
+        if self.pack is None or level >= len(self.pack):
+            return None
+        return TheMap(layout=self.pack.layout(level), bind=bind)
+
+    def prefetch_next_map(self):
+        """
+        Starts generating the next (bigger) map in the background; unless it comes from the level pack.
+        """
+        if self.pack is not None and self.level + 1 < len(self.pack):
+            return
+        self.loader.prefetch(self.map.width + 2, self.map.height + 2, min(self.enemy_prob + 1, MAX_ENEMY_PROB),
+                             level_seed(self.seed, self.level + 1))
 
     def display_text_to_screen(self, font_size, msg, pos_x=None, pos_y=None, rgb_color=(255, 255, 255)):
         """
@@ -208,66 +634,93 @@ class DunGen:
         :param rgb_color: (tuple) (r,g,b)
         """
         if pygame.font:
-            if not pos_x:
-                pos_x = self.window_width >> 1
-            if not pos_y:
-                pos_y = self.window_height >> 1
-            font = pygame.font.Font(None, font_size)
-            text = font.render(msg, 1, rgb_color)
-            text_pos = text.get_rect(centerx=pos_x, centery=pos_y)
-            self.screen.blit(text, text_pos)
+            self.renderer.draw(*self.render_text(font_size, msg, pos_x, pos_y, rgb_color))
+
+    def render_text(self, font_size, msg, pos_x=None, pos_y=None, rgb_color=(255, 255, 255)):
+        """
+        Renders some text, centered at the given position. The text is only rendered the first
+        time; afterwards, it comes from the text cache.
+        :param font_size: (int) font size
+        :param msg: (str) message to render
+        :param pos_x: (int) x-coordinate to center at
+        :param pos_y: (int) y-coordinate to center at
+        :param rgb_color: (tuple) (r,g,b)
+        :return: (tuple) rendered text, position on screen
+        """
+        if not pos_x:
+            pos_x = self.window_width >> 1
+        if not pos_y:
+            pos_y = self.window_height >> 1
+        text = self.text_cache.render(font_size, msg, rgb_color)
+        text_pos = text.get_rect(centerx=pos_x, centery=pos_y)
+        return text, text_pos
 
     def draw_walls_floors_to_screen(self):
         """
-        Draws the walls and the floor if it is some X distance from the player.
-        Uses PyGame's circle collision to detect what wall/floor to light up.
+        Lights the walls and the floor that the player can see, and shadows the visited ones. What
+        the player can see comes from the field of view, which is only recomputed when the player
+        moves into another tile; in god-mode, everything inside the camera window is lit.
+        The cells are handed to the renderer, which only re-composites those whose state changed.
         """
-        self.camera.update(self.player)
-        # clear the background
-        self.screen.blit(self.background, (0, 0))
-        # shifts all objects and creates camera motion-effect (also, performance booster)
-        cam_x1 = -1 * self.camera.state.x >> 5
-        cam_y1 = -1 * self.camera.state.y >> 5
-        cam_x2 = (-1 * self.camera.state.x + self.window_width + 32) >> 5
-        cam_y2 = (-1 * self.camera.state.y + self.window_height + 32) >> 5
-        for x in range(cam_x1, cam_x2):
-            for y in range(cam_y1, cam_y2):
-                sprite = self.map.landscape[y][x]
-                if pygame.sprite.collide_circle(sprite, self.player) or self.god_mode:
-                    near_viewable = True and not sprite.block_sight
-                else:
-                    near_viewable = False
-                if near_viewable or sprite.visited:  # light sprites nearby and shadow visited sprites
-                    if not sprite.block_sight:
-                        sprite.visited = True
-                        if near_viewable:
-                            self.screen.blit(sprite.image, self.camera.apply(sprite))
-                        else:
-                            self.screen.blit(sprite.drk_image, self.camera.apply(sprite))
+        self.fov.update(self.player.rect.centerx >> 5, self.player.rect.centery >> 5)
+        grid = self.map.landscape
+        if self.god_mode:
+            # shifts all objects and creates camera motion-effect (also, performance booster)
+            cam_x1, cam_y1, cam_x2, cam_y2 = self.camera.tile_window(grid.width, grid.height)
+            lighting_key = ('god', cam_x1, cam_y1)
+            if lighting_key == self.lighting_key:
+                return
+            lit_cells = [y * grid.width + x for y in range(cam_y1, cam_y2) for x in range(cam_x1, cam_x2)]
+        else:
+            lighting_key = ('fov',) + self.fov.origin
+            if lighting_key == self.lighting_key:
+                return
+            lit_cells = self.fov.visible_cells
+        self.lighting_key = lighting_key
+        lit_cells = [i for i in lit_cells if not grid.flags[i] & BLOCK_SIGHT]
+        # shadow the cells that are no longer lit, then light the new ones
+        still_lit = set(lit_cells)
+        for i in self.lit_cells:
+            if i not in still_lit:
+                self.renderer.set_cell(i % grid.width, i // grid.width, DARK)
+        for i in lit_cells:
+            grid.flags[i] |= VISITED
+            self.renderer.set_cell(i % grid.width, i // grid.width, LIT)
+        self.lit_cells = lit_cells
+
+    def is_in_view(self, sprite):
+        """
+        Determines if some sprite stands in a cell that the player can see.
+        :param sprite: (Sprite) sprite to check
+        :return: (bool) True if the sprite is visible
+        """
+        return self.god_mode or self.fov.is_visible(sprite.rect.centerx >> 5, sprite.rect.centery >> 5)
 
     def draw_objects_to_screen(self):
         """
-        Draws all map-objects: keys, stairs, and other (objects).
+        Draws the map-objects on screen: keys, stairs, and other (objects).
         """
-        for object_groups in self.map.map_objects:  # unpacks the lists
-            for sprite in self.map.map_objects[object_groups]:  # unpacks the sprites
-                if pygame.sprite.collide_circle(sprite, self.player) or self.god_mode:
-                    near_viewable = True and not sprite.block_sight
-                else:
-                    near_viewable = False
-                if near_viewable or sprite.visited:  # light sprites nearby and shadows visited but not nearby sprites
-                    if not sprite.block_sight:
-                        sprite.visited = True
-                        if near_viewable:
-                            self.screen.blit(sprite.image, self.camera.apply(sprite))
-                        else:
-                            self.screen.blit(sprite.drk_image, self.camera.apply(sprite))
+        for sprite in self.map.objects_in(self.camera.view_rect()):  # only those inside the camera window
+            if self.is_in_view(sprite):
+                near_viewable = True and not sprite.block_sight
+            else:
+                near_viewable = False
+            if near_viewable or sprite.visited:  # light sprites nearby and shadows visited but not nearby sprites
+                if not sprite.block_sight:
+                    sprite.visited = True
+                    if near_viewable:
+                        self.renderer.draw(sprite.image, self.camera.apply(sprite))
+                    elif self.fog:
+                        # shadowed by the fog over the cell it stands on
+                        self.renderer.draw(sprite.image, self.camera.apply(sprite), fogged=True)
+                    else:
+                        self.renderer.draw(sprite.drk_image, self.camera.apply(sprite))
 
     def keys_remaining_msg(self):
         """
         Displays a message, indicating how many keys remain to be collected
         """
-        remaining_keys = len(self.map.map_objects["keys"])
+        remaining_keys = self.map.keys_remaining()
         pos_y = self.background.get_height() - 30
         if remaining_keys > 0:
             if remaining_keys == 1:
@@ -294,6 +747,12 @@ class DunGen:
 
             self.display_text_to_screen(16, "Skip level key: s", pos_x=text_pos_x,
                                         pos_y=text_pos_y + (text_offset_y << 1))
+            if self.show_profile:
+                self.display_text_to_screen(16, "Profiler(p): on", pos_x=text_pos_x,
+                                            pos_y=text_pos_y + text_offset_y * 3)
+            else:
+                self.display_text_to_screen(16, "Profiler(p): off", pos_x=text_pos_x,
+                                            pos_y=text_pos_y + text_offset_y * 3)
         else:
             self.display_text_to_screen(16, "Debug mode(d): off", pos_x=text_pos_x, pos_y=text_pos_y)
         # display msg if enemy is trying to attack
@@ -302,6 +761,22 @@ class DunGen:
             self.display_text_to_screen(16, "This is when he realizes he hasn't been programmed any weapons",
                                         pos_y=(self.window_height >> 1) + 40)
 
+    def draw_profile_overlay(self):
+        """
+        Displays the rolling frame-time percentiles of every phase at the top left of the screen, if
+        the profiler is on (debug mode only). The numbers are refreshed every few frames, so the
+        overlay itself stays cheap.
+        """
+        if not (self.debug_mode and self.show_profile):
+            return
+        if not self.profile_lines or self.frame_count % PROFILE_REFRESH == 0:
+            self.profile_lines = self.profiler.overlay_lines()
+        text_pos_x = 130  # x-coord to place msg
+        text_pos_y = 30  # y-coord to place msg
+        text_offset_y = 14  # offset y-coord for next lines
+        for n, line in enumerate(self.profile_lines):
+            self.display_text_to_screen(16, line, pos_x=text_pos_x, pos_y=text_pos_y + n * text_offset_y)
+
     def draw_demo_msg(self):
         """
         Displays a message the first time the player is on a key or stairway.
@@ -317,12 +792,66 @@ class DunGen:
             color = (255, 255, 0)  # yellow
             stair_lst = pygame.sprite.spritecollide(self.player, self.map.map_objects["stairs"], False)
             if stair_lst:
-                if len(self.map.map_objects["keys"]) == 0:
+                if self.map.keys_remaining() == 0:
                     self.display_text_to_screen(32, "Press the SPACE BAR to climb the stairs", rgb_color=color)
                 else:
                     self.display_text_to_screen(32, "Collect all of the keys and then come back", rgb_color=color)
 
 
 if __name__ == "__main__":
-    dun_gen = DunGen()
-    dun_gen.main_loop()
\ No newline at end of file
+    parser = argparse.ArgumentParser(description="Dun-Gen")
+    parser.add_argument('--profile-dump', metavar='PATH',
+                        help="on quit, write the frame-time profile of every frame to PATH (.csv or .json)")
+    parser.add_argument('--seed', type=parse_seed, help="game seed, 0 to 2^32-1: the same seed plays the same maps")
+    parser.add_argument('--save', metavar='PATH', help="save the game to PATH on quit, or when F5 is pressed")
+    parser.add_argument('--load', metavar='PATH', help="pick up the game saved in PATH")
+    parser.add_argument('--pack', metavar='PATH', help="play the levels of the level pack in PATH (see batch.py)")
+    parser.add_argument('--loading-wait', type=parse_wait, metavar='MS',
+                        help="show the loading screen for at least MS ms between levels (default: %s; 0 when "
+                             "soaking or replaying)" % LOADING_WAIT)
+    parser.add_argument('--fog', action='store_true',
+                        help="shadow the explored map with a fog layer instead of the dark tile images")
+    parser.add_argument('--tick-rate', type=int, metavar='HZ',
+                        help="run the simulation on a fixed timestep, HZ ticks per second, apart from the frame rate")
+    parser.add_argument('--soak', type=int, metavar='TICKS',
+                        help="run TICKS simulation ticks without a window, uncapped, on random input")
+    parser.add_argument('--record', metavar='PATH', help="record the input to PATH, to replay it later")
+    parser.add_argument('--replay', metavar='PATH', help="replay the input recorded in PATH, as fast as possible")
+    parser.add_argument('--headless', action='store_true', help="replay without a window")
+    parser.add_argument('--no-render', action='store_true', help="replay (or soak) without drawing the frames")
+    args = parser.parse_args()
+    if args.record and (args.load or args.pack):
+        # a recording replays on the maps generated from its seed, from the first level
+        parser.error("--record can't be combined with --load or --pack")
+    if args.soak:
+        os.environ['SDL_VIDEODRIVER'] = 'dummy'
+        os.environ['SDL_AUDIODRIVER'] = 'dummy'
+        dun_gen = DunGen(loading_wait=args.loading_wait or 0, profile_dump=args.profile_dump, seed=args.seed,
+                         record=args.record, fog=args.fog, tick_rate=args.tick_rate or SIM_TICK_RATE)
+        ticks, elapsed = dun_gen.soak_loop(args.soak, RandomInput(dun_gen.seed), render=not args.no_render)
+        print 'Soaked %s ticks over %s levels in %.2fs (%.1f ticks/s)' % (ticks, dun_gen.level + 1, elapsed,
+                                                                          ticks / max(elapsed, 1e-6))
+        print 'Ended on %s' % dun_gen.end_state()
+        if args.record:
+            dun_gen.recorder.save(ticks)
+        if args.profile_dump:
+            dun_gen.profiler.dump(args.profile_dump)
+    elif args.replay:
+        input_player = InputPlayer(args.replay)
+        if args.headless:
+            os.environ['SDL_VIDEODRIVER'] = 'dummy'
+            os.environ['SDL_AUDIODRIVER'] = 'dummy'
+        dun_gen = DunGen(input_player.win_width, input_player.win_height, loading_wait=args.loading_wait or 0,
+                         profile_dump=args.profile_dump, seed=input_player.seed, fog=args.fog,
+                         tick_rate=input_player.tick_rate, deterministic=True)
+        frames, elapsed = dun_gen.replay_loop(input_player, render=not args.no_render)
+        print 'Replayed %s frames in %.2fs (%.1f fps)' % (frames, elapsed, frames / max(elapsed, 1e-6))
+        print 'Ended on %s' % dun_gen.end_state()
+        if args.profile_dump:
+            dun_gen.profiler.dump(args.profile_dump)
+    else:
+        loading_wait = LOADING_WAIT if args.loading_wait is None else args.loading_wait
+        dun_gen = DunGen(loading_wait=loading_wait, profile_dump=args.profile_dump, seed=args.seed, record=args.record,
+                         save_path=args.save, load_path=args.load, pack_path=args.pack, fog=args.fog,
+                         tick_rate=args.tick_rate)
+        dun_gen.main_loop()
\ No newline at end of file
@@ -4,201 +4,313 @@ Created on: 5/3/2015
 
 This dungeon generator was created as a demo for WillowTreeApps.
 """
-from entities import Wall, Floor, Room, Stairs, Key, AestheticObject, Enemy, map_theme
-import random
+from entities import Stairs, Key, AestheticObject, Enemy, map_theme, load_image
+from landscape import TILE_DEFS, VISITED
+from layout import generate_layout
 from pygame.sprite import Group
+from spatial import SpatialHash
+from world import ChunkedWorld
 
+STREAMING_SIZE = 160  # levels this wide or high (in tiles), or more, are streamed instead of built up front
+VIEW_CELL_SHIFT = 8  # objects and enemies are bucketed in 256px cells (8 tiles), to find those on screen
 
-class TheMap(object):
+
+def make_map(width=40, height=40, enemy_prob=0, bind=True, seed=None):
     """
-    This class holds the landscape of the map and other relevant information.
+    Builds a map of some size: up front if it is small enough, streamed otherwise.
+    :param width: (int) map width, in tiles
+    :param height: (int) map height, in tiles
+    :param enemy_prob: (int) probability of an enemy appearing where a key is
+    :param bind: (bool) whether to bind the map right away
+    :param seed: (int) random seed of the map
+    :return: (TheMap) or (StreamingMap) the map
+    """
+    if max(width, height) >= STREAMING_SIZE:
+        return StreamingMap(width, height, enemy_prob, bind, seed)
+    return TheMap(width, height, enemy_prob, bind, seed)
+
+
+def mark_visited(sprites, grid):
+    """
+    Marks the sprites standing on explored cells as visited, so they start out shadowed.
+    :param sprites: (iterable) sprites to mark
+    :param grid: (TileGrid) grid the sprites stand on
+    """
+    for sprite in sprites:
+        sprite.visited = grid.flags[(sprite.rect.top >> 5) * grid.width + (sprite.rect.left >> 5)] & VISITED != 0
+
+
+def query_alive(index, rect):
+    """
+    Finds the sprites of some index that overlap a rectangle; those killed since they were indexed
+    (e.g. keys picked up) are dropped from the index instead.
+    :param index: (SpatialHash) index to look in
+    :param rect: (Rect) area in pixels
+    :return: (list) of sprites
     """
+    found = list()
+    dead = list()
+    for sprite in index.query(rect):
+        if not sprite.alive():
+            dead.append(sprite)
+        elif sprite.rect.colliderect(rect):
+            found.append(sprite)
+    for sprite in dead:
+        index.remove(sprite)
+    return found
 
-    def __init__(self, width=40, height=40):
-        self.theme_num = random.randint(0, len(map_theme) - 1)
-        self.landscape = [[Wall(x * 32, y * 32, self.theme_num) for x in range(width + 1)] for y in range(height + 1)]
-        self.width = len(self.landscape[0]) - 1
-        self.height = len(self.landscape) - 1
-        self.player_start_loc = None
+
+def bind_tile_images(grid, theme_num):
+    """
+    Resolves the images of every tile type of some theme and binds them to a tile grid.
+    :param grid: (TileGrid) grid to bind
+    :param theme_num: (int) theme of the map
+    """
+    theme = map_theme[theme_num]
+    grid.bind([load_image(theme[tile_def.image_key])[0] for tile_def in TILE_DEFS])
+
+
+def bind_dark_tile_images(grid):
+    """
+    Resolves the dark images of every tile type and binds them to a tile grid, if it has none yet;
+    only needed to draw the map without fog (see renderer.py).
+    :param grid: (TileGrid) grid to bind
+    """
+    if grid.drk_images is None:
+        theme = map_theme[grid.theme_num]
+        grid.drk_images = [load_image(theme[tile_def.drk_image_key])[0] for tile_def in TILE_DEFS]
+
+
+class BaseMap(object):
+    """
+    The objects and enemies of a map, and their indexes; shared by both kinds of map (TheMap and
+    StreamingMap), which lay out and bind them each their own way.
+    """
+
+    def __init__(self, enemy_prob=0):
         self.map_objects = {"other": Group(), "stairs": Group(), "keys": Group()}
+        # blocking objects, indexed by the 32px cells they overlap
+        self.obstacles = SpatialHash()
         self.enemies_lst = Group()
-        self.probability_enemy_appears = 0
-        self.initialize()
-
-    def create_room(self, room):
-        """
-        Creates a room, given some coordinates and dimensions.
-        :param room: (room object) holds x-y coordinates, height, and width of the room
-        """
-        # go through the tiles in the rectangle and make them passable
-        x1 = room.dimension.x >> 5
-        x2 = (room.dimension.x + room.dimension.width) >> 5
-        y1 = room.dimension.y >> 5
-        y2 = (room.dimension.y + room.dimension.height) >> 5
-        for x in range(x1, x2):
-            for y in range(y1, y2):
-                self.landscape[y][x] = Floor(x << 5, y << 5, self.theme_num)
-        # light up the walls containing this room
-        for x in range(x1, x2):
-            self.landscape[y1 - 1][x].block_sight = False
-            self.landscape[y2][x].block_sight = False
-        for y in range(y1, y2):
-            self.landscape[y][x1 - 1].block_sight = False
-            self.landscape[y][x2].block_sight = False
-
-    def add_stairs(self, room):
-        """
-        Places staircase in some room on the map.
-        :param room: (room object) holds x-y coordinates, height, and width of the room
-        """
-        (x, y) = get_valid_room_coords(room)
-        stairs = Stairs(x, y, is_up=random.randint(0, 1), theme_num=self.theme_num)
-        self.map_objects["stairs"].add(stairs)
-
-    def add_keys(self, room):
-        """
-        Places keys in some room on the map.
-        :param room: (room object) holds x-y coordinates, height, and width of the room
-        """
-        (x, y) = get_valid_room_coords(room)
-        keys = Key(x, y)
-        self.map_objects["keys"].add(keys)
-
-    def add_aesthetic_obj(self, room):
-        """
-        Places objects in some room on the map.
-        :param room: (room object) holds x-y coordinates, height, and width of the room
-        """
-        (x, y) = get_valid_room_coords(room)
-        obj = AestheticObject(x, y, self.theme_num)
-        self.map_objects["other"].add(obj)
-
-    def add_enemies(self, room):
-        """
-        Places enemy in some room on the map that contains a key.
-        :param room: (room object) holds x-y coordinates, height, and width of the room
-        """
-        (x, y) = get_valid_room_coords(room)
-        enemy = Enemy(x, y)
-        self.enemies_lst.add(enemy)
-
-    def generate_rooms_around_map(self, rooms):
-        """
-        Generates a bunch of rooms and places them on the map if they do not
-        collide with each other.
-        :param rooms: (list) will hold the rooms generated
-        """
-        room_tries = len(self.landscape) * len(self.landscape[0]) >> 6  # times to try to create room: area / 64
-        max_room_dimension = max(5, room_tries >> 2)  # max-room-dimension: max(5, area / 256)
-        if max_room_dimension > 14:  # bound of room dimension: 14
-            max_room_dimension = 14
-        for n in range(room_tries):
-            failed = False
-            w = random.randint(4, max_room_dimension)
-            h = random.randint(4, max_room_dimension)
-            x = random.randint(1, self.width - w - 1)
-            y = random.randint(1, self.height - h - 1)
-            current_room = Room(x, y, w, h)
-            for other_room in rooms:
-                current_room_adjusted = Room(x - 1, y - 1, w + 1, h + 1)
-                if current_room_adjusted.dimension.colliderect(other_room.dimension):
-                    failed = True
-                    break
-            if not failed:
-                self.create_room(current_room)
-                (curr_cent_x, curr_cent_y) = current_room.dimension.center
-                room_count = len(rooms)
-                if room_count == 0:
-                    # set the player's start location
-                    self.player_start_loc = (curr_cent_x, curr_cent_y)
-                elif room_count > 0:
-                    # create halls between rooms
-                    (prev_cent_x, prev_cent_y) = rooms[room_count - 1].dimension.center
-                    prev_cent_x >>= 5  # divide by 32 -> cell-representation
-                    prev_cent_y >>= 5
-                    curr_cent_y >>= 5
-                    curr_cent_x >>= 5
-                    # randomly decide whether to draw halls vert-first or horz-first
-                    if random.randint(0, 1) == 0:
-                        self.create_h_hall(prev_cent_x, curr_cent_x, prev_cent_y)
-                        self.create_v_hall(prev_cent_y, curr_cent_y, curr_cent_x)
-                    else:
-                        self.create_v_hall(prev_cent_y, curr_cent_y, prev_cent_x)
-                        self.create_h_hall(prev_cent_x, curr_cent_x, curr_cent_y)
-                rooms.append(current_room)
-                # place some aesthetic in the room
-                if random.randint(0, 2) == 1:
-                    self.add_aesthetic_obj(current_room)
-
-    def initialize(self):
-        """
-        Initializes the map:
-            - places a random configuration of rooms on the map.
-            - places a spot for the player to start from
-            - places the keys on the map
-            - probably places a guard near the key; depends on probability
-        """
-        rooms = list()
-        self.generate_rooms_around_map(rooms)
-        # place the exit randomly
-        indx = random.randrange(len(rooms))
-        some_room = rooms.pop(indx)
-        self.add_stairs(some_room)
-        # put nothing where player begins
-        rooms.pop(0)
-        # how many keys to place: try 4 or more, else: however many rooms exist
-        if len(rooms) > 3:
-            placeable_keys = random.randint(4, 8)
-        else:
-            placeable_keys = len(rooms)
-        # place keys in rooms, around map
-        for x in range(0, placeable_keys):
-            indx = random.randrange(len(rooms))
-            some_room = rooms.pop(indx)
-            self.add_keys(some_room)
-            # add a guard
-            if random.randint(0, 20 - self.probability_enemy_appears) < 5:  # init: 20% probability
-                self.add_enemies(some_room)
-
-    def create_h_hall(self, pcx, ncx, pcy):
-        """
-        Creates the horizontal hallway from room-A to room-B. Also, makes the
-        hall's walls illuminable.
-        :param pcx: (int) previous room's x-center coordinate
-        :param ncx: (int) new room's x-center coordinate
-        :param pcy: (int) previous room's y-center coordinate
-        """
-        for x in range(min(pcx, ncx), max(pcx, ncx) + 1):
-            self.landscape[pcy][x] = Floor(x << 5, pcy << 5, self.theme_num)
-            # allow walls to be illuminated
-            self.landscape[pcy - 1][x].block_sight = False
-            self.landscape[pcy + 1][x].block_sight = False
-
-    def create_v_hall(self, pcy, ncy, pcx):
-        """
-        Creates the vertical hallway from room-A to room-B.  Also, makes the
-        hall's walls illuminable.
-        :param pcy: (int) previous room's y-center coordinate
-        :param ncy: (int) new room's x-center coordinate
-        :param pcx: (int) previous room's x-center coordinate
-        """
-        for y in range(min(pcy, ncy), max(pcy, ncy) + 1):
-            self.landscape[y][pcx] = Floor(pcx << 5, y << 5, self.theme_num)
-            # allow walls to be illuminated
-            self.landscape[y][pcx + 1].block_sight = False
-            self.landscape[y][pcx - 1].block_sight = False
-
-
-def get_valid_room_coords(room):
-    """
-    Creates valid coordinates within the dimensions of some room
-    :param room: (room object) holds x-y coordinates, height, and width of the room
-    :return: (tuple) x-y coordinates from a random spot in the room
-    """
-    x1 = (room.dimension.x + 32) >> 5
-    x2 = (room.dimension.x + room.dimension.width - 32) >> 5
-    y1 = (room.dimension.y + 32) >> 5
-    y2 = (room.dimension.y + room.dimension.height - 32) >> 5
-    x = random.randint(x1, x2)
-    y = random.randint(y1, y2)
-    return x << 5, y << 5
\ No newline at end of file
+        # every object and enemy, indexed by region; only those on screen are drawn
+        self.objects_index = SpatialHash(VIEW_CELL_SHIFT)
+        self.enemy_index = SpatialHash(VIEW_CELL_SHIFT)
+        self.probability_enemy_appears = enemy_prob
+
+    def clear_objects(self):
+        """
+        Drops every object (stairs, keys and others) and empties the objects and obstacle indexes.
+        """
+        for group in self.map_objects.values():
+            group.empty()
+        self.obstacles = SpatialHash()
+        self.objects_index = SpatialHash(VIEW_CELL_SHIFT)
+
+    def index_enemies(self):
+        """
+        (Re)builds the enemy index from the enemies of the map.
+        """
+        self.enemy_index = SpatialHash(VIEW_CELL_SHIFT)
+        for enemy in self.enemies_lst:
+            self.enemy_index.add(enemy)
+
+    def add_object(self, name, obj):
+        """
+        Adds an object to some group, keeping the objects index up to date.
+        :param name: (string) group: "other", "stairs" or "keys"
+        :param obj: (Sprite) object to add
+        """
+        self.map_objects[name].add(obj)
+        self.objects_index.add(obj)
+
+    def add_obstacle(self, obj):
+        """
+        Adds an object that cannot be traversed through, keeping the obstacle index up to date.
+        :param obj: (Tile) object to add: tombstones/rocks/desks/etc.
+        """
+        self.add_object("other", obj)
+        self.obstacles.add(obj)
+
+    def remove_obstacle(self, obj):
+        """
+        Removes an object that cannot be traversed through, keeping the obstacle index up to date.
+        :param obj: (Tile) object to remove: tombstones/rocks/desks/etc.
+        """
+        self.map_objects["other"].remove(obj)
+        self.obstacles.remove(obj)
+        self.objects_index.remove(obj)
+
+    def objects_in(self, rect):
+        """
+        :param rect: (Rect) area of the map, in pixels; e.g. the camera's view (Camera.view_rect)
+        :return: (list) of the stairs, keys and other objects overlapping the area
+        """
+        return query_alive(self.objects_index, rect)
+
+    def enemies_in(self, rect):
+        """
+        :param rect: (Rect) area of the map, in pixels; e.g. the camera's view (Camera.view_rect)
+        :return: (list) of the enemies overlapping the area
+        """
+        return query_alive(self.enemy_index, rect)
+
+
+class TheMap(BaseMap):
+    """
+    This class holds the landscape of the map and other relevant information.
+    Building a map happens in two steps:
+        - generation: lays out the rooms, halls, and where every object goes (see layout.py). This
+          is plain data, so it may run in a worker thread or come from a serialized layout.
+        - binding (bind): creates the sprites and resolves the images; done on the main thread.
+    """
+
+    def __init__(self, width=40, height=40, enemy_prob=0, bind=True, seed=None, layout=None):
+        if layout is None:
+            layout = generate_layout(width, height, enemy_prob, seed)
+        self.layout = layout
+        self.theme_num = layout.theme_num
+        self.landscape = layout.grid
+        self.width = layout.width
+        self.height = layout.height
+        self.player_start_loc = layout.player_start
+        super(TheMap, self).__init__(layout.enemy_prob)
+        self.is_bound = False
+        if bind:
+            self.bind()
+
+    def bind(self):
+        """
+        Creates the sprites of the objects in the layout and resolves the tile images.
+        """
+        if self.is_bound:
+            return
+        bind_tile_images(self.landscape, self.theme_num)
+        for (x, y, is_up) in self.layout.stairs:
+            self.add_object("stairs", Stairs(x, y, is_up=is_up, theme_num=self.theme_num))
+        for (x, y) in self.layout.keys:
+            self.add_object("keys", Key(x, y))
+        for (x, y, image) in self.layout.objects:
+            self.add_obstacle(AestheticObject(x, y, self.theme_num, image))
+        for (x, y) in self.layout.enemies:
+            self.enemies_lst.add(Enemy(x, y))
+        self.index_enemies()
+        # a map picked up from a save may have been explored already
+        for group in self.map_objects.values():
+            mark_visited(group, self.landscape)
+        self.is_bound = True
+
+    def keys_remaining(self):
+        """
+        :return: (int) keys left to collect
+        """
+        return len(self.map_objects["keys"])
+
+    def stream(self, player):
+        """
+        The whole map is in memory: nothing to stream.
+        :param player: (Player) the player
+        :return: (bool) False: nothing moved
+        """
+        return False
+
+
+class StreamingMap(BaseMap):
+    """
+    A map too big to build up front (see world.py): only the window of chunks around the player is
+    generated and bound. Offers the same interface as TheMap, but coordinates are relative to the
+    window; when the player nears its edge, the window moves (stream) and so do the player and every
+    sprite. Enemies are dropped with the chunk they are in, and come back where they started when the
+    chunk is generated again; keys collected stay collected.
+    """
+
+    def __init__(self, width=STREAMING_SIZE, height=STREAMING_SIZE, enemy_prob=0, bind=True, seed=None):
+        self.world = ChunkedWorld(width, height, enemy_prob, seed)
+        self.theme_num = self.world.theme_num
+        self.landscape = self.world.grid
+        self.width = width
+        self.height = height
+        self.player_start_loc = self.world.player_start
+        super(StreamingMap, self).__init__(enemy_prob)
+        # key sprite -> chunk it belongs to
+        self.key_chunks = dict()
+        # where to put the enemies when bound; where the chunks say if None
+        self.enemy_spots = None
+        self.is_bound = False
+        if bind:
+            self.bind()
+
+    def bind(self):
+        """
+        Resolves the tile images and creates the sprites of the window's chunks.
+        """
+        if self.is_bound:
+            return
+        bind_tile_images(self.landscape, self.theme_num)
+        self.bind_objects()
+        if self.enemy_spots is None:
+            self.enemy_spots = [spot for _, spot in self.world.items("enemies")]
+        for (x, y) in self.enemy_spots:
+            self.enemies_lst.add(Enemy(x, y))
+        self.index_enemies()
+        self.is_bound = True
+
+    def bind_objects(self):
+        """
+        (Re)creates the sprites of the stairs, keys and objects in the window's chunks; those the
+        player has seen start out shadowed.
+        """
+        self.clear_objects()
+        self.key_chunks = dict()
+        sprites = list()
+        for _, (x, y, is_up) in self.world.items("stairs"):
+            sprites.append(Stairs(x, y, is_up=is_up, theme_num=self.theme_num))
+            self.add_object("stairs", sprites[-1])
+        for chunk, (x, y) in self.world.items("keys"):
+            if chunk not in self.world.collected:
+                sprites.append(Key(x, y))
+                self.add_object("keys", sprites[-1])
+                self.key_chunks[sprites[-1]] = chunk
+        for _, (x, y, image) in self.world.items("objects"):
+            sprites.append(AestheticObject(x, y, self.theme_num, image))
+            self.add_obstacle(sprites[-1])
+        mark_visited(sprites, self.landscape)
+
+    def collect_keys(self):
+        """
+        Records the keys that were picked up (removed from their group) as collected.
+        """
+        for key, chunk in self.key_chunks.items():
+            if not key.alive():
+                self.world.collected.add(chunk)
+                del self.key_chunks[key]
+
+    def keys_remaining(self):
+        """
+        :return: (int) keys left to collect, in the whole world
+        """
+        self.collect_keys()
+        return len(self.world.key_chunks) - len(self.world.collected)
+
+    def stream(self, player):
+        """
+        Moves the window if the player nears its edge; the player and every sprite move with it.
+        :param player: (Player) the player
+        :return: (bool) True if the window moved; whatever holds window coordinates must be reset
+        """
+        shift = self.world.focus(player.rect.centerx >> 5, player.rect.centery >> 5)
+        if shift is None:
+            return False
+        self.collect_keys()
+        dx = shift[0] << 5
+        dy = shift[1] << 5
+        player.rect.move_ip(dx, dy)
+        bounds = (0, 0, self.landscape.width << 5, self.landscape.height << 5)
+        for enemy in self.enemies_lst.sprites():
+            enemy.rect.move_ip(dx, dy)
+            if not enemy.rect.colliderect(bounds):
+                enemy.kill()
+        for _, (x, y) in self.world.items("enemies", self.world.new_chunks):
+            self.enemies_lst.add(Enemy(x, y))
+        self.index_enemies()
+        self.bind_objects()
+        return True
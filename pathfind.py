@@ -0,0 +1,111 @@
+"""
+Author: Hector Lovo
+Created on: 5/3/2015
+
+This dungeon generator was created as a demo for WillowTreeApps.
+"""
+from collections import deque
+from entities import PLAYER_FOV_DIST, ENEMY_FOV_DIST
+from landscape import BLOCKED
+from pygame import Rect
+
+UNREACHED = 255  # distance of the cells the field did not reach
+# the field reaches as far as an enemy may wake up from, with room for paths to wind around walls
+FIELD_DIST = (PLAYER_FOV_DIST + ENEMY_FOV_DIST) << 1
+
+# neighbours of a cell, in the order they are tried: right, left, down, up
+STEPS = ((1, 0), (-1, 0), (0, 1), (0, -1))
+
+
+class DistanceField(object):
+    """
+    Breadth-first distances, in steps, from the player's cell to every walkable cell within
+    max_dist steps; walls and the cells taken by objects are not walkable. One field is shared by
+    every enemy and only recomputed when the player moves into another cell; an enemy finds its way
+    to the player by stepping into a neighbour one step closer (next_step), in constant time.
+    """
+
+    def __init__(self, grid, max_dist=FIELD_DIST):
+        self.grid = grid
+        self.max_dist = max_dist
+        self.dist = bytearray(chr(UNREACHED) * (grid.width * grid.height))
+        self.reached = list()
+        self.origin = None
+
+    def update(self, x, y, obstacles=None):
+        """
+        Recomputes the field if the origin moved to another cell.
+        :param x: (int) origin cell column
+        :param y: (int) origin cell row
+        :param obstacles: (SpatialHash) objects that cannot be traversed through
+        :return: (bool) True if the field was recomputed
+        """
+        if (x, y) == self.origin:
+            return False
+        self.compute(x, y, obstacles)
+        return True
+
+    def compute(self, x, y, obstacles=None):
+        """
+        Computes the field from some cell.
+        :param x: (int) origin cell column
+        :param y: (int) origin cell row
+        :param obstacles: (SpatialHash) objects that cannot be traversed through
+        """
+        grid = self.grid
+        width = grid.width
+        dist = self.dist
+        for i in self.reached:
+            dist[i] = UNREACHED
+        self.reached = list()
+        self.origin = (x, y)
+        if not (0 <= x < width and 0 <= y < grid.height):
+            return
+        # the cells taken by objects, around the origin
+        taken = set()
+        if obstacles is not None:
+            reach = (self.max_dist << 5) + 32
+            for obj in obstacles.query(Rect((x << 5) - reach, (y << 5) - reach, reach << 1, reach << 1)):
+                taken.add((obj.rect.centery >> 5) * width + (obj.rect.centerx >> 5))
+        flags = grid.flags
+        start = y * width + x
+        dist[start] = 0
+        self.reached.append(start)
+        queue = deque([start])
+        while queue:
+            i = queue.popleft()
+            d = dist[i] + 1
+            if d > self.max_dist:
+                continue
+            cx = i % width
+            for n, inside in ((i + 1, cx + 1 < width), (i - 1, cx > 0), (i + width, i + width < len(dist)),
+                              (i - width, i >= width)):
+                if inside and dist[n] == UNREACHED and not flags[n] & BLOCKED and n not in taken:
+                    dist[n] = d
+                    self.reached.append(n)
+                    queue.append(n)
+
+    def distance(self, x, y):
+        """
+        :param x: (int) cell column
+        :param y: (int) cell row
+        :return: (int) steps from the origin to the cell; UNREACHED if it is out of the field
+        """
+        if 0 <= x < self.grid.width and 0 <= y < self.grid.height:
+            return self.dist[y * self.grid.width + x]
+        return UNREACHED
+
+    def next_step(self, x, y):
+        """
+        :param x: (int) cell column
+        :param y: (int) cell row
+        :return: (tuple) x-y of a neighbour one step closer to the origin; None if the cell is the
+                 origin or out of the field
+        """
+        d = self.distance(x, y)
+        if d == 0 or d == UNREACHED:
+            return None
+        for dx, dy in STEPS:
+            if self.distance(x + dx, y + dy) == d - 1:
+                return x + dx, y + dy
+        return None
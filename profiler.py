@@ -0,0 +1,117 @@
+"""
+Author: Hector Lovo
+Created on: 5/3/2015
+
+This dungeon generator was created as a demo for WillowTreeApps.
+"""
+from collections import deque
+from timeit import default_timer
+import csv
+import json
+
+# phases of a frame, in the order they run
+PHASES = ("controller", "enemies", "walls_floors", "objects", "text", "present")
+PROFILE_WINDOW = 300  # frames the rolling percentiles are computed over: 5 seconds at 60 fps
+
+
+def percentile(sorted_samples, pct):
+    """
+    :param sorted_samples: (list) samples, sorted
+    :param pct: (int) percentile to take: 0-100
+    :return: (float) the nearest-rank percentile; 0 if there are no samples
+    """
+    if not sorted_samples:
+        return 0.0
+    rank = int(round(pct / 100.0 * (len(sorted_samples) - 1)))
+    return sorted_samples[rank]
+
+
+class FrameProfiler(object):
+    """
+    Times every phase of a frame, keeps the timings of the last frames to compute rolling
+    percentiles, and (if recording) keeps every frame to dump to CSV/JSON for offline analysis.
+    Usage, each frame:
+        begin_frame(); start(phase); ... stop(phase); ...; end_frame()
+    """
+
+    def __init__(self, window=PROFILE_WINDOW, record=False):
+        self.samples = dict((phase, deque(maxlen=window)) for phase in PHASES + ("frame",))
+        self.record = record
+        self.frames = list()
+        # phases timed outside a frame (e.g. drawing called on its own) are dropped at the next one
+        self.current = dict.fromkeys(PHASES, 0.0)
+        self.started = dict()
+        self.frame_start = None
+
+    def begin_frame(self):
+        """
+        Starts timing a new frame.
+        """
+        self.current = dict.fromkeys(PHASES, 0.0)
+        self.frame_start = default_timer()
+
+    def start(self, phase):
+        """
+        Starts timing some phase of the frame.
+        :param phase: (string) one of PHASES
+        """
+        self.started[phase] = default_timer()
+
+    def stop(self, phase):
+        """
+        Stops timing some phase of the frame; a phase may be timed several times per frame.
+        :param phase: (string) one of PHASES
+        """
+        self.current[phase] += (default_timer() - self.started.pop(phase)) * 1000.0
+
+    def end_frame(self):
+        """
+        Stops timing the frame and stores its timings, in ms.
+        """
+        if self.frame_start is None:
+            return
+        self.current["frame"] = (default_timer() - self.frame_start) * 1000.0
+        for phase, elapsed in self.current.items():
+            self.samples[phase].append(elapsed)
+        if self.record:
+            self.frames.append(self.current)
+        self.frame_start = None
+
+    def percentiles(self, phase):
+        """
+        :param phase: (string) one of PHASES, or "frame" for the whole frame
+        :return: (tuple) rolling p50, p95 and p99 of the phase, in ms
+        """
+        samples = sorted(self.samples[phase])
+        return percentile(samples, 50), percentile(samples, 95), percentile(samples, 99)
+
+    def overlay_lines(self):
+        """
+        :return: (list) of strings summarizing every phase; for the on-screen overlay
+        """
+        lines = ["%-12s  p50    p95    p99 (ms)" % "phase"]
+        for phase in PHASES + ("frame",):
+            lines.append("%-12s %5.2f  %5.2f  %5.2f" % ((phase,) + self.percentiles(phase)))
+        return lines
+
+    def dump(self, path):
+        """
+        Writes every recorded frame to a file: CSV if the path ends in .csv, JSON otherwise. The JSON
+        dump also holds the percentiles of every phase.
+        :param path: (string) file to write
+        """
+        columns = ("frame",) + PHASES
+        if path.endswith('.csv'):
+            with open(path, 'wb') as out:
+                writer = csv.writer(out)
+                writer.writerow(("index",) + columns)
+                for n, frame in enumerate(self.frames):
+                    writer.writerow([n] + ["%.3f" % frame[column] for column in columns])
+        else:
+            summary = dict()
+            for column in columns:
+                samples = sorted(frame[column] for frame in self.frames)
+                summary[column] = {"p50": percentile(samples, 50), "p95": percentile(samples, 95),
+                                   "p99": percentile(samples, 99)}
+            with open(path, 'w') as out:
+                json.dump({"phases": columns, "summary": summary, "frames": self.frames}, out)
@@ -0,0 +1,291 @@
+"""
+Author: Hector Lovo
+Created on: 5/3/2015
+
+This dungeon generator was created as a demo for WillowTreeApps.
+"""
+from collections import OrderedDict
+from landscape import VISITED
+from pygame import Rect
+import pygame
+
+# cell states, as composited onto the map layer
+HIDDEN = 0
+DARK = 1
+LIT = 2
+
+# fog mode: opacity of the black fog over the cells in each state
+FOG_ALPHA = (255, 160, 0)
+
+CHUNK_SIZE = 16  # tiles per side of a chunk
+CHUNK_PIXELS = CHUNK_SIZE << 5
+
+# maps a cell's flags to the state it starts out in: the cells already explored are shadowed
+EXPLORED_STATES = ''.join(chr(DARK if flags & VISITED else HIDDEN) for flags in range(256))
+
+# Surface.blits (pygame 1.9.4+) draws a whole batch in one call
+HAS_BLITS = hasattr(pygame.Surface, 'blits')
+
+
+def blit_all(target, batch):
+    """
+    Draws a batch of images; in a single call where pygame supports it. Batches drawn from the
+    texture atlases (see atlas.py) come from two source surfaces: the theme's atlas and the common one.
+    :param target: (Surface) surface to draw on
+    :param batch: (list) of (image, position) tuples
+    """
+    if HAS_BLITS:
+        target.blits(batch, False)
+    else:
+        for image, pos in batch:
+            target.blit(image, pos)
+
+
+def chunks_across(length):
+    """
+    :param length: (int) length of the window, in pixels
+    :return: (int) chunks a window that long overlaps, at most, wherever it is placed
+    """
+    return (length + 2 * CHUNK_PIXELS - 2) // CHUNK_PIXELS
+
+
+class Chunk(object):
+    """
+    A square block of the map, baked into a single surface: each cell is drawn from its tile's lit
+    or dark image, or black where the map is still hidden; a cell whose state changes is redrawn
+    from the tile image, so no lit and dark copies of the chunk are kept.
+    In fog mode, only the lit tiles are baked; what is shown is the lit layer with the fog mask on
+    top: black, with a per-cell opacity that tells hidden, explored and visible cells apart.
+    """
+
+    def __init__(self, grid, states, cx, cy, fog=False):
+        self.grid = grid
+        self.x1 = cx * CHUNK_SIZE
+        self.y1 = cy * CHUNK_SIZE
+        self.x2 = min(self.x1 + CHUNK_SIZE, grid.width)
+        self.y2 = min(self.y1 + CHUNK_SIZE, grid.height)
+        self.world_rect = Rect(self.x1 << 5, self.y1 << 5, (self.x2 - self.x1) << 5, (self.y2 - self.y1) << 5)
+        size = self.world_rect.size
+        self.lit = None
+        self.composite = None
+        self.mask = None
+        if fog:
+            # noinspection PyArgumentList
+            self.lit = pygame.Surface(size).convert()
+            # 32-bit with per-pixel alpha, whatever the display's depth: neither convert_alpha() nor the
+            # display's default depth work on a display without alpha (e.g. SDL's 8-bit dummy driver, headless)
+            # noinspection PyArgumentList
+            self.mask = pygame.Surface(size, pygame.SRCALPHA, 32)
+            self.mask.fill((0, 0, 0, FOG_ALPHA[HIDDEN]))
+        else:
+            # noinspection PyArgumentList
+            self.composite = pygame.Surface(size).convert()
+            self.composite.fill((0, 0, 0))
+        batch = list()
+        for y in range(self.y1, self.y2):
+            for x in range(self.x1, self.x2):
+                i = y * grid.width + x
+                pos = ((x - self.x1) << 5, (y - self.y1) << 5)
+                if fog:
+                    batch.append((grid.images[grid.types[i]], pos))
+                    if states[i] != HIDDEN:
+                        self.composite_cell(x, y, states[i])
+                elif states[i] == LIT:
+                    batch.append((grid.images[grid.types[i]], pos))
+                elif states[i] == DARK:
+                    batch.append((grid.drk_images[grid.types[i]], pos))
+        blit_all(self.lit if fog else self.composite, batch)
+
+    def composite_cell(self, x, y, state):
+        """
+        Redraws one cell from its tile's lit or dark image, or blacks it out; in fog mode, sets the
+        cell's opacity on the fog mask instead.
+        :param x: (int) cell column
+        :param y: (int) cell row
+        :param state: (int) HIDDEN, DARK or LIT
+        """
+        area = Rect((x - self.x1) << 5, (y - self.y1) << 5, 32, 32)
+        if self.mask is not None:
+            self.mask.fill((0, 0, 0, FOG_ALPHA[state]), area)
+            return
+        tile_type = self.grid.types[y * self.grid.width + x]
+        if state == LIT:
+            self.composite.blit(self.grid.images[tile_type], area)
+        elif state == DARK:
+            self.composite.blit(self.grid.drk_images[tile_type], area)
+        else:
+            self.composite.fill((0, 0, 0), area)
+
+
+class MapRenderer(object):
+    """
+    Draws the landscape from pre-rendered chunks and only pushes the parts of the screen that
+    changed since the last frame. Every frame, the caller:
+        - sets the state of the cells around the player (set_cell)
+        - queues the sprites and text to draw on top of the map (draw)
+        - presents the frame (present)
+    When the camera did not move, only changed cells and moved/changed sprites are redrawn and
+    sent to the display through pygame.display.update(rects).
+    In fog mode, the dark tile images are not needed: the lit map is drawn, then the sprites queued
+    under the fog (fogged), then the fog mask, and then the other sprites; an explored area is
+    shadowed by a single blit of the mask, whatever the number of tiles in it.
+    """
+
+    def __init__(self, grid, win_width, win_height, fog=False):
+        self.grid = grid
+        self.fog = fog
+        self.win_width = win_width
+        self.win_height = win_height
+        self.states = grid.flags.translate(EXPLORED_STATES)
+        self.chunks = OrderedDict()
+        # chunks kept baked at once, the least recently used ones are dropped: those a window can
+        # overlap, plus one more row and column for the camera to move back onto
+        self.max_chunks = (chunks_across(win_width) + 1) * (chunks_across(win_height) + 1)
+        self.offset = (0, 0)
+        self.prev_offset = None
+        self.items = list()
+        self.prev_items = list()
+        self.dirty_cells = None
+        # statistics of the last presented frame
+        self.blits = 0
+        self.dirty_rects = 0
+
+    def invalidate(self):
+        """
+        Forces the next frame to be redrawn in full; e.g. after something else drew on the screen.
+        """
+        self.prev_offset = None
+
+    def get_chunk(self, cx, cy):
+        """
+        Returns the chunk at some chunk-coordinate, baking it if needed.
+        :param cx: (int) chunk column
+        :param cy: (int) chunk row
+        :return: (Chunk) baked chunk
+        """
+        key = (cx, cy)
+        chunk = self.chunks.pop(key, None)
+        if chunk is None:
+            chunk = Chunk(self.grid, self.states, cx, cy, self.fog)
+            if len(self.chunks) >= self.max_chunks:
+                self.chunks.popitem(last=False)
+        self.chunks[key] = chunk
+        return chunk
+
+    def begin_frame(self, offset):
+        """
+        Starts a new frame.
+        :param offset: (tuple) camera offset: x-y coordinates of the map's top-left on the screen
+        """
+        self.offset = offset
+        self.items = list()
+
+    def set_cell(self, x, y, state):
+        """
+        Sets how some cell should appear; the chunk is only re-composited if the state changed.
+        :param x: (int) cell column
+        :param y: (int) cell row
+        :param state: (int) HIDDEN, DARK or LIT
+        """
+        i = y * self.grid.width + x
+        if self.states[i] == state:
+            return
+        self.states[i] = state
+        chunk = self.chunks.get((x // CHUNK_SIZE, y // CHUNK_SIZE))
+        if chunk is not None:
+            chunk.composite_cell(x, y, state)
+        cell_rect = Rect(x << 5, y << 5, 32, 32)
+        if self.dirty_cells is None:
+            self.dirty_cells = cell_rect
+        else:
+            self.dirty_cells.union_ip(cell_rect)
+
+    def draw(self, image, pos, fogged=False):
+        """
+        Queues an image to be drawn on top of the map this frame.
+        :param image: (Surface) image to draw
+        :param pos: (Rect) or (tuple) screen position
+        :param fogged: (bool) in fog mode, draw the image under the fog, so it is shadowed with the
+                       cells it stands on
+        """
+        rect = Rect(pos, image.get_size()) if len(pos) == 2 else Rect(pos)
+        self.items.append((image, rect, fogged and self.fog))
+
+    def blit_map(self, screen, rect, layer='composite'):
+        """
+        Draws the map layer inside some screen rectangle.
+        :param screen: (Surface) display surface
+        :param rect: (Rect) area of the screen to draw
+        :param layer: (string) chunk surface to draw: "composite"; in fog mode, "lit" or "mask"
+        """
+        off_x, off_y = self.offset
+        world = rect.move(-off_x, -off_y)
+        cx1 = max(0, world.left >> 5) // CHUNK_SIZE
+        cy1 = max(0, world.top >> 5) // CHUNK_SIZE
+        cx2 = min(self.grid.width - 1, (world.right - 1) >> 5) // CHUNK_SIZE
+        cy2 = min(self.grid.height - 1, (world.bottom - 1) >> 5) // CHUNK_SIZE
+        for cy in range(cy1, cy2 + 1):
+            for cx in range(cx1, cx2 + 1):
+                chunk = self.get_chunk(cx, cy)
+                area = world.clip(chunk.world_rect)
+                if area.width and area.height:
+                    screen.blit(getattr(chunk, layer), (area.x + off_x, area.y + off_y),
+                                area.move(-chunk.world_rect.x, -chunk.world_rect.y))
+                    self.blits += 1
+
+    def blit_items(self, screen, rect, fogged):
+        """
+        Draws the queued images that overlap some screen rectangle.
+        :param screen: (Surface) display surface
+        :param rect: (Rect) area of the screen to draw
+        :param fogged: (bool) draw the images queued under the fog, or the others
+        """
+        batch = [(image, item_rect) for image, item_rect, under_fog in self.items
+                 if under_fog == fogged and item_rect.colliderect(rect)]
+        blit_all(screen, batch)
+        self.blits += len(batch)
+
+    def present(self, screen):
+        """
+        Composites the frame and pushes it to the display. Redraws everything if the camera moved;
+        otherwise, only the changed parts of the screen are redrawn and updated.
+        :param screen: (Surface) display surface
+        """
+        self.blits = 0
+        if self.offset != self.prev_offset:
+            dirty = [screen.get_rect()]
+        else:
+            dirty = list()
+            if self.dirty_cells is not None:
+                dirty.append(self.dirty_cells.move(self.offset))
+            current = set((id(image), tuple(rect)) for image, rect, _ in self.items)
+            previous = set((id(image), tuple(rect)) for image, rect, _ in self.prev_items)
+            for image, rect, _ in self.items:
+                if (id(image), tuple(rect)) not in previous:
+                    dirty.append(rect)
+            for image, rect, _ in self.prev_items:
+                if (id(image), tuple(rect)) not in current:
+                    dirty.append(rect)
+        if dirty:
+            screen_rect = screen.get_rect()
+            dirty = [rect.clip(screen_rect) for rect in dirty]
+            for rect in dirty:
+                screen.set_clip(rect)
+                screen.fill((0, 0, 0), rect)
+                if self.fog:
+                    self.blit_map(screen, rect, 'lit')
+                    self.blit_items(screen, rect, True)
+                    self.blit_map(screen, rect, 'mask')
+                else:
+                    self.blit_map(screen, rect)
+                self.blit_items(screen, rect, False)
+            screen.set_clip(None)
+            if self.offset != self.prev_offset:
+                pygame.display.flip()
+            else:
+                pygame.display.update(dirty)
+        self.dirty_rects = len(dirty)
+        self.dirty_cells = None
+        self.prev_offset = self.offset
+        # keeping the previous surfaces alive also keeps their ids from being reused
+        self.prev_items = self.items
@@ -0,0 +1,137 @@
+"""
+Author: Hector Lovo
+Created on: 5/3/2015
+
+This dungeon generator was created as a demo for WillowTreeApps.
+
+Input recording and replay. A recording holds the game's seed and every key press (and release),
+stamped with the frame (or simulation tick) it was handled in and the time, in ms since the start of
+the simulation (so the same, whenever and in whichever process the recording is replayed).
+Since the maps only depend on the seed, and the game only moves on frames and key presses, replaying
+a recording plays the exact same game, as fast as the machine allows.
+Soak tests are driven by random input instead (RandomInput), from a seed.
+"""
+from pygame.constants import KEYDOWN, KEYUP, QUIT, K_RIGHT, K_LEFT, K_UP, K_DOWN, K_SPACE, K_d, K_s
+import json
+import pygame
+import random
+
+RECORDING_VERSION = 2  # 1 stamped the events with pygame's absolute ticks
+ARROW_KEYS = (K_RIGHT, K_LEFT, K_UP, K_DOWN)
+SOAK_LEVEL_TICKS = 3600  # a soak test skips to the next level this often: a minute, at 60 ticks per second
+SOAK_DEBUG_TICK = 60  # tick a soak test enters debug mode on; the game ignores the key for its first 250ms
+
+
+class InputRecorder(object):
+    """
+    Records the input events handled by the game, frame by frame.
+    """
+
+    def __init__(self, path, seed, win_width, win_height, tick_rate=None):
+        self.path = path
+        self.seed = seed
+        self.win_width = win_width
+        self.win_height = win_height
+        # simulation ticks per second; None if the game ran a tick per frame
+        self.tick_rate = tick_rate
+        self.events = list()
+
+    def record(self, frame, ticks, events):
+        """
+        Records the events handled in some frame; only key presses and releases, and quitting, matter
+        to the game.
+        :param frame: (int) frame (or simulation tick) number
+        :param ticks: (int) ms since the start of the simulation
+        :param events: (list) pygame events
+        """
+        for e in events:
+            if e.type == KEYDOWN or e.type == KEYUP:
+                self.events.append((frame, ticks, e.type, e.key))
+            elif e.type == QUIT:
+                self.events.append((frame, ticks, QUIT, 0))
+
+    def save(self, frames):
+        """
+        Writes the recording to its file.
+        :param frames: (int) frames played in total
+        """
+        with open(self.path, 'w') as out:
+            json.dump({"version": RECORDING_VERSION, "seed": self.seed, "window": [self.win_width, self.win_height],
+                       "tick_rate": self.tick_rate, "frames": frames, "events": self.events}, out)
+
+
+class InputPlayer(object):
+    """
+    Plays a recording back: hands out the events of every frame, as pygame events.
+    """
+
+    def __init__(self, path):
+        with open(path) as recording_file:
+            recording = json.load(recording_file)
+        if recording.get("version") != RECORDING_VERSION:
+            raise ValueError("unsupported recording: %s" % path)
+        self.seed = recording["seed"]
+        self.win_width, self.win_height = recording["window"]
+        self.tick_rate = recording.get("tick_rate")
+        self.frames = recording["frames"]
+        self.events = recording["events"]
+        self.next_event = 0
+        # ms since the start of the simulation, of the last event handed out
+        self.ticks = 0
+
+    def finished(self, frame):
+        """
+        :param frame: (int) frame number
+        :return: (bool) True once every recorded frame was played
+        """
+        return frame >= self.frames
+
+    def events_at(self, frame):
+        """
+        Returns the events recorded for some frame; frames must be asked for in order.
+        :param frame: (int) frame number
+        :return: (list) pygame events
+        """
+        events = list()
+        while self.next_event < len(self.events) and self.events[self.next_event][0] <= frame:
+            _, self.ticks, event_type, key = self.events[self.next_event]
+            if event_type == KEYDOWN or event_type == KEYUP:
+                events.append(pygame.event.Event(event_type, key=key))
+            else:
+                events.append(pygame.event.Event(event_type))
+            self.next_event += 1
+        return events
+
+
+class RandomInput(object):
+    """
+    Random input, for soak tests: the player wanders around, holding an arrow key for a while and
+    pressing the space bar whenever it turns; every level_ticks ticks, the level is skipped (the game
+    is put in debug mode early on). The same seed gives the same input.
+    """
+
+    def __init__(self, seed, level_ticks=SOAK_LEVEL_TICKS):
+        self.rng = random.Random(seed)
+        self.level_ticks = level_ticks
+        self.key = None
+        self.turn_at = 0
+
+    def events_at(self, tick):
+        """
+        Returns the events of some simulation tick; ticks must be asked for in order.
+        :param tick: (int) tick number
+        :return: (list) pygame events
+        """
+        events = list()
+        if tick == SOAK_DEBUG_TICK:
+            events.append(pygame.event.Event(KEYDOWN, key=K_d))
+        if tick >= self.turn_at:
+            if self.key is not None:
+                events.append(pygame.event.Event(KEYUP, key=self.key))
+            self.key = self.rng.choice(ARROW_KEYS)
+            events.append(pygame.event.Event(KEYDOWN, key=self.key))
+            events.append(pygame.event.Event(KEYDOWN, key=K_SPACE))
+            self.turn_at = tick + self.rng.randint(5, 60)
+        if tick and self.level_ticks and tick % self.level_ticks == 0:
+            events.append(pygame.event.Event(KEYDOWN, key=K_s))
+        return events
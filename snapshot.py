@@ -0,0 +1,280 @@
+"""
+Author: Hector Lovo
+Created on: 5/3/2015
+
+This dungeon generator was created as a demo for WillowTreeApps.
+
+Saved games. A snapshot holds what cannot be told from the game's seed: the map, what was explored
+of it, the keys left, where the enemies and the player stand, the level and the enemy probability.
+Binary format: a small header, then the zlib-compressed body:
+    - the game: seed, level, enemy probability, player position
+    - a map built up front: its size, theme and seed, then one bit-plane per cell property (floor,
+      blocks sight, explored), then the stairs, keys, objects and enemies; each list is sorted by
+      position and stored as varint deltas from the previous position
+    - a streamed map: its size, seed and window, the collected keys, and the explored cells of every
+      chunk, bit-packed; the chunks themselves come back from the seed
+"""
+from landscape import TILE_DEFS, FLOOR, BLOCKED, BLOCK_SIGHT, VISITED, pack_flag, unpack_flag
+from layout import Layout
+from map import TheMap, StreamingMap
+from themes import map_theme
+from world import WORLD_CHUNK
+import struct
+import zlib
+
+SNAPSHOT_MAGIC = 'DGS1'
+SNAPSHOT_VERSION = 1
+HEADER = struct.Struct('<4sBB')  # magic, version, kind of map
+GAME = struct.Struct('<IHBii')  # game seed, level, enemy probability, player x-y: in pixels
+MAP = struct.Struct('<HHBIBii')  # width, height, theme, seed, enemy probability, player start x-y
+WORLD = struct.Struct('<HHBIHH')  # width, height, enemy probability, seed, window's top-left chunk
+
+# kinds of map
+KIND_MAP = 0
+KIND_STREAMING = 1
+
+# BLOCKED flag of each tile type; the other flags are stored as bit-planes
+BLOCKED_TABLE = ''.join(chr(TILE_DEFS[code].flags & BLOCKED if code < len(TILE_DEFS) else 0) for code in range(256))
+
+
+class Snapshot(object):
+    """
+    A saved game: the map (TheMap or StreamingMap), the game's seed and level, the enemy
+    probability, and the player's position.
+    """
+
+    def __init__(self, the_map, seed, level, enemy_prob, player_pos):
+        self.map = the_map
+        self.seed = seed
+        self.level = level
+        self.enemy_prob = enemy_prob
+        self.player_pos = player_pos
+
+    def to_bytes(self):
+        """
+        Serializes the snapshot into its compact binary format.
+        :return: (str) serialized snapshot
+        """
+        body = bytearray(GAME.pack(self.seed, self.level, self.enemy_prob, self.player_pos[0], self.player_pos[1]))
+        if isinstance(self.map, StreamingMap):
+            kind = KIND_STREAMING
+            dump_world(body, self.map)
+        else:
+            kind = KIND_MAP
+            dump_map(body, self.map)
+        return HEADER.pack(SNAPSHOT_MAGIC, SNAPSHOT_VERSION, kind) + zlib.compress(str(body))
+
+    @staticmethod
+    def from_bytes(data):
+        """
+        Rebuilds a snapshot from its binary format; the map is not bound.
+        :param data: (str) serialized snapshot
+        :return: (Snapshot) the snapshot
+        """
+        magic, version, kind = HEADER.unpack_from(data)
+        if magic != SNAPSHOT_MAGIC or version != SNAPSHOT_VERSION:
+            raise ValueError("not a saved game: magic %r, version %s" % (magic, version))
+        body = zlib.decompress(data[HEADER.size:])
+        seed, level, enemy_prob, player_x, player_y = GAME.unpack_from(body)
+        if kind == KIND_STREAMING:
+            the_map = load_world(body, GAME.size)
+        else:
+            the_map = load_map(body, GAME.size)
+        return Snapshot(the_map, seed, level, enemy_prob, (player_x, player_y))
+
+
+def save_snapshot(path, snapshot):
+    """
+    Writes a snapshot to some file.
+    :param path: (string) file to write
+    :param snapshot: (Snapshot) snapshot to save
+    """
+    with open(path, 'wb') as out:
+        out.write(snapshot.to_bytes())
+
+
+def load_snapshot(path):
+    """
+    Reads a snapshot from some file.
+    :param path: (string) file to read
+    :return: (Snapshot) the snapshot; its map is not bound
+    """
+    with open(path, 'rb') as saved:
+        return Snapshot.from_bytes(saved.read())
+
+
+def write_varint(out, value):
+    """
+    Appends an unsigned integer, 7 bits per byte; small values take a single byte.
+    :param out: (bytearray) buffer to append to
+    :param value: (int) value to write
+    """
+    while value > 0x7f:
+        out.append(value & 0x7f | 0x80)
+        value >>= 7
+    out.append(value)
+
+
+def read_varint(data, offset):
+    """
+    :param data: (str) buffer to read from
+    :param offset: (int) where the value starts
+    :return: (tuple) the value, and where the next one starts
+    """
+    value = 0
+    shift = 0
+    while True:
+        byte = ord(data[offset])
+        offset += 1
+        value |= (byte & 0x7f) << shift
+        if byte < 0x80:
+            return value, offset
+        shift += 7
+
+
+def write_spots(out, spots, width):
+    """
+    Appends a list of positions, sorted, as varint deltas from the previous one; each may carry an
+    extra byte.
+    :param out: (bytearray) buffer to append to
+    :param spots: (list) of (x, y) or (x, y, extra) tuples
+    :param width: (int) positions are numbered row-major, on rows this wide
+    """
+    spots = sorted(spots, key=lambda spot: (spot[1], spot[0]))
+    write_varint(out, len(spots))
+    previous = 0
+    for spot in spots:
+        index = spot[1] * width + spot[0]
+        write_varint(out, index - previous)
+        previous = index
+        if len(spot) > 2:
+            out.append(spot[2])
+
+
+def read_spots(data, offset, width, extra=False):
+    """
+    Reads a list of positions written by write_spots.
+    :param data: (str) buffer to read from
+    :param offset: (int) where the list starts
+    :param width: (int) positions are numbered row-major, on rows this wide
+    :param extra: (bool) whether every position carries an extra byte
+    :return: (tuple) the list of (x, y) or (x, y, extra) tuples, and where the next thing starts
+    """
+    count, offset = read_varint(data, offset)
+    spots = list()
+    index = 0
+    for _ in range(count):
+        delta, offset = read_varint(data, offset)
+        index += delta
+        if extra:
+            spots.append((index % width, index // width, ord(data[offset])))
+            offset += 1
+        else:
+            spots.append((index % width, index // width))
+    return spots, offset
+
+
+def pack_plane(values, flag):
+    """
+    :param values: (bytearray) one byte per cell
+    :param flag: (int) bit to keep of every byte
+    :return: (str) the bit of every cell, packed
+    """
+    return pack_flag(values, flag) or '\x00' * ((len(values) + 7) >> 3)
+
+
+def dump_map(out, the_map):
+    """
+    Appends a map built up front: its grid as bit-planes, then its objects as delta-coded lists.
+    :param out: (bytearray) buffer to append to
+    :param the_map: (TheMap) map to save
+    """
+    layout = the_map.layout
+    grid = layout.grid
+    out += MAP.pack(layout.width, layout.height, layout.theme_num, layout.seed, layout.enemy_prob,
+                    layout.player_start[0], layout.player_start[1])
+    # tile types are WALL (0) or FLOOR (1): one bit per cell
+    out += pack_plane(grid.types, FLOOR)
+    out += pack_plane(grid.flags, BLOCK_SIGHT)
+    out += pack_plane(grid.flags, VISITED)
+    lst_image = map_theme[layout.theme_num]["lst_image"]
+    write_spots(out, [(x >> 5, y >> 5, is_up) for (x, y, is_up) in layout.stairs], grid.width)
+    write_spots(out, [(key.rect.left >> 5, key.rect.top >> 5) for key in the_map.map_objects["keys"]], grid.width)
+    write_spots(out, [(x >> 5, y >> 5, lst_image.index(image)) for (x, y, image) in layout.objects], grid.width)
+    # enemies move a pixel at a time
+    write_spots(out, [enemy.rect.topleft for enemy in the_map.enemies_lst], grid.width << 5)
+
+
+def load_map(data, offset):
+    """
+    Rebuilds a map built up front from a snapshot, as it was saved; nothing is generated again.
+    :param data: (str) snapshot body
+    :param offset: (int) where the map starts
+    :return: (TheMap) the map, not bound
+    """
+    width, height, theme_num, seed, enemy_prob, start_x, start_y = MAP.unpack_from(data, offset)
+    offset += MAP.size
+    layout = Layout(width, height, theme_num, seed, enemy_prob)
+    layout.player_start = (start_x, start_y)
+    grid = layout.grid
+    cells = grid.width * grid.height
+    plane = (cells + 7) >> 3
+    types = bytearray(cells)
+    unpack_flag(data[offset:offset + plane], types, FLOOR)
+    flags = types.translate(BLOCKED_TABLE)
+    unpack_flag(data[offset + plane:offset + 2 * plane], flags, BLOCK_SIGHT)
+    unpack_flag(data[offset + 2 * plane:offset + 3 * plane], flags, VISITED)
+    grid.types = types
+    grid.flags = flags
+    offset += 3 * plane
+    stairs, offset = read_spots(data, offset, grid.width, extra=True)
+    layout.stairs = [(x << 5, y << 5, is_up) for (x, y, is_up) in stairs]
+    keys, offset = read_spots(data, offset, grid.width)
+    layout.keys = [(x << 5, y << 5) for (x, y) in keys]
+    objects, offset = read_spots(data, offset, grid.width, extra=True)
+    lst_image = map_theme[theme_num]["lst_image"]
+    layout.objects = [(x << 5, y << 5, lst_image[image]) for (x, y, image) in objects]
+    layout.enemies, offset = read_spots(data, offset, grid.width << 5)
+    return TheMap(layout=layout, bind=False)
+
+
+def dump_world(out, the_map):
+    """
+    Appends a streamed map: its seed and window, the keys collected, the explored cells of every
+    chunk, and the enemies in the window.
+    :param out: (bytearray) buffer to append to
+    :param the_map: (StreamingMap) map to save
+    """
+    world = the_map.world
+    the_map.collect_keys()
+    world.save_window()
+    out += WORLD.pack(the_map.width, the_map.height, world.enemy_prob, world.seed, world.origin[0], world.origin[1])
+    write_spots(out, list(world.collected), world.chunks_x)
+    write_spots(out, world.explored.keys(), world.chunks_x)
+    for chunk in sorted(world.explored, key=lambda spot: (spot[1], spot[0])):
+        out += world.explored[chunk]
+    write_spots(out, [enemy.rect.topleft for enemy in the_map.enemies_lst], world.grid.width << 5)
+
+
+def load_world(data, offset):
+    """
+    Rebuilds a streamed map from a snapshot: the chunks in the window are generated again from the
+    seed, and what was explored, collected, and where the enemies were is put back.
+    :param data: (str) snapshot body
+    :param offset: (int) where the map starts
+    :return: (StreamingMap) the map, not bound
+    """
+    width, height, enemy_prob, seed, origin_x, origin_y = WORLD.unpack_from(data, offset)
+    offset += WORLD.size
+    the_map = StreamingMap(width, height, enemy_prob, bind=False, seed=seed)
+    world = the_map.world
+    collected, offset = read_spots(data, offset, world.chunks_x)
+    chunks, offset = read_spots(data, offset, world.chunks_x)
+    plane = (WORLD_CHUNK * WORLD_CHUNK + 7) >> 3
+    explored = dict()
+    for chunk in chunks:
+        explored[chunk] = data[offset:offset + plane]
+        offset += plane
+    world.restore((origin_x, origin_y), explored, set(collected))
+    the_map.enemy_spots, offset = read_spots(data, offset, world.grid.width << 5)
+    return the_map
@@ -0,0 +1,108 @@
+"""
+Author: Hector Lovo
+Created on: 5/3/2015
+
+This dungeon generator was created as a demo for WillowTreeApps.
+"""
+
+
+class SpatialHash(object):
+    """
+    Uniform grid of buckets holding sprites by the cells their rect overlaps. Looking for
+    collisions only checks the sprites in the few buckets that some probe rect overlaps, instead
+    of every sprite on the map.
+    """
+
+    def __init__(self, cell_shift=5):
+        # cells are (1 << cell_shift) pixels wide: 32px by default, the size of a tile
+        self.cell_shift = cell_shift
+        self.buckets = dict()
+        self.count = 0
+
+    def __len__(self):
+        return self.count
+
+    def cells(self, rect):
+        """
+        Lists the cells overlapped by some rectangle.
+        :param rect: (Rect) area in pixels
+        :return: (list) of (x, y) cell coordinates
+        """
+        shift = self.cell_shift
+        x1 = rect.left >> shift
+        y1 = rect.top >> shift
+        x2 = (rect.left + max(rect.width, 1) - 1) >> shift
+        y2 = (rect.top + max(rect.height, 1) - 1) >> shift
+        return [(x, y) for y in range(y1, y2 + 1) for x in range(x1, x2 + 1)]
+
+    def add(self, sprite):
+        """
+        Indexes a sprite by its current rect.
+        :param sprite: (Sprite) sprite to index
+        """
+        for cell in self.cells(sprite.rect):
+            self.buckets.setdefault(cell, list()).append(sprite)
+        self.count += 1
+
+    def remove(self, sprite):
+        """
+        Drops a sprite from the index; its rect must not have changed since it was added. Sprites
+        that were never added are ignored.
+        :param sprite: (Sprite) sprite to drop
+        """
+        removed = False
+        for cell in self.cells(sprite.rect):
+            bucket = self.buckets.get(cell)
+            if bucket is not None and sprite in bucket:
+                bucket.remove(sprite)
+                removed = True
+                if not bucket:
+                    del self.buckets[cell]
+        if removed:
+            self.count -= 1
+
+    def move(self, sprite, old_rect):
+        """
+        Re-indexes a sprite whose rect moved.
+        :param sprite: (Sprite) sprite that moved
+        :param old_rect: (Rect) the sprite's rect before it moved
+        """
+        old_cells = self.cells(old_rect)
+        new_cells = self.cells(sprite.rect)
+        if old_cells == new_cells:
+            return
+        for cell in old_cells:
+            bucket = self.buckets.get(cell)
+            if bucket is not None and sprite in bucket:
+                bucket.remove(sprite)
+                if not bucket:
+                    del self.buckets[cell]
+        for cell in new_cells:
+            self.buckets.setdefault(cell, list()).append(sprite)
+
+    def query(self, rect):
+        """
+        Finds the sprites whose buckets some rectangle overlaps; they may not collide with it.
+        :param rect: (Rect) area in pixels
+        :return: (list) of candidate sprites, without duplicates
+        """
+        found = list()
+        seen = set()
+        for cell in self.cells(rect):
+            for sprite in self.buckets.get(cell, ()):
+                if sprite not in seen:
+                    seen.add(sprite)
+                    found.append(sprite)
+        return found
+
+    def collide(self, rect):
+        """
+        Finds a sprite colliding with some rectangle.
+        :param rect: (Rect) area in pixels
+        :return: (Sprite) the first colliding sprite, or None
+        """
+        for cell in self.cells(rect):
+            for sprite in self.buckets.get(cell, ()):
+                if sprite.rect.colliderect(rect):
+                    return sprite
+        return None
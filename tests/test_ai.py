@@ -0,0 +1,85 @@
+"""
+Author: Hector Lovo
+Created on: 5/3/2015
+
+This dungeon generator was created as a demo for WillowTreeApps.
+
+Tests of the enemy scheduler (ai.py): the per-tick budget of moves, and who gets to move.
+"""
+import os
+import sys
+import unittest
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+try:
+    import pygame
+except ImportError:
+    pygame = None
+
+
+class Walker(object):
+    """
+    Stands in for an enemy: steps a pixel right, then back, so it is never stuck, nor goes anywhere.
+    """
+
+    def __init__(self, x, y):
+        self.rect = pygame.Rect(x, y, 32, 32)
+        self.stuck = False
+        self.moves = 0
+
+    def move_towards_player(self, landscape, player_rect, obstacles, paths):
+        self.rect.x += 1 if self.moves % 2 == 0 else -1
+        self.moves += 1
+
+
+class Stand(object):
+    """
+    Stands in for the player and the map: the scheduler only looks at their rects and obstacles.
+    """
+
+    def __init__(self, x, y):
+        self.rect = pygame.Rect(x, y, 32, 32)
+        self.radius = 6 << 5
+        self.landscape = None
+        self.obstacles = None
+
+
+@unittest.skipIf(pygame is None, "pygame is not installed")
+class EnemySchedulerTest(unittest.TestCase):
+
+    def setUp(self):
+        # ten enemies around the player, all within reach
+        self.player = Stand(320, 320)
+        self.enemies = [Walker(320 + (n % 5) * 32 - 64, 320 + (n // 5) * 64 - 32) for n in range(10)]
+
+    def test_budget_of_moves(self):
+        from ai import EnemyScheduler
+        scheduler = EnemyScheduler(self.enemies, max_moves=3)
+        for _ in range(5):
+            scheduler.update(self.player, self.player)
+            self.assertEqual((scheduler.due, scheduler.moved, scheduler.deferred), (10, 3, 7))
+
+    def test_round_robin(self):
+        from ai import EnemyScheduler
+        scheduler = EnemyScheduler(self.enemies, max_moves=3)
+        # the ones that waited the longest go first: every enemy moves once in four ticks
+        for _ in range(4):
+            scheduler.update(self.player, self.player)
+        self.assertTrue(all(enemy.moves >= 1 for enemy in self.enemies))
+        # and, over time, as often as the others
+        for _ in range(6):
+            scheduler.update(self.player, self.player)
+        self.assertEqual([enemy.moves for enemy in self.enemies], [3] * 10)
+
+    def test_far_enemies_sleep(self):
+        from ai import EnemyScheduler
+        far = Walker(320 + 2000, 320)
+        scheduler = EnemyScheduler(self.enemies + [far], max_moves=100)
+        scheduler.update(self.player, self.player)
+        self.assertEqual(scheduler.moved, 10)
+        self.assertEqual(far.moves, 0)
+
+
+if __name__ == "__main__":
+    unittest.main()
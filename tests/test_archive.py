@@ -0,0 +1,81 @@
+"""
+Author: Hector Lovo
+Created on: 5/3/2015
+
+This dungeon generator was created as a demo for WillowTreeApps.
+
+Round trips of the level-pack format (archive.py): layouts written with ArchiveWriter and read back,
+in any order, through MapArchive; no display needed.
+"""
+import os
+import shutil
+import sys
+import tempfile
+import unittest
+import zlib
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from archive import ArchiveWriter, MapArchive
+from layout import generate_layout
+
+SIZES = [20, 30, 40, 25, 50]
+
+
+class MapArchiveTest(unittest.TestCase):
+
+    def setUp(self):
+        self.directory = tempfile.mkdtemp()
+        self.path = os.path.join(self.directory, 'levels.dga')
+        self.layouts = [generate_layout(size, size, 5, seed) for seed, size in enumerate(SIZES)]
+
+    def tearDown(self):
+        shutil.rmtree(self.directory)
+
+    def write(self):
+        writer = ArchiveWriter(self.path, len(self.layouts))
+        for n, layout in enumerate(self.layouts):
+            data = layout.to_bytes()
+            # compressed layouts, as batch.py writes them, are stored decompressed
+            writer.add(zlib.compress(data) if n % 2 else data)
+        writer.close()
+
+    def test_round_trip(self):
+        self.write()
+        pack = MapArchive(self.path)
+        try:
+            self.assertEqual(len(pack), len(self.layouts))
+            # random access, last level first
+            for k in reversed(range(len(self.layouts))):
+                layout = pack.layout(k)
+                original = self.layouts[k]
+                self.assertEqual((layout.width, layout.height, layout.seed), (original.width, original.height,
+                                                                               original.seed))
+                self.assertEqual(layout.grid.types, original.grid.types)
+                self.assertEqual(layout.grid.flags, original.grid.flags)
+                self.assertEqual(layout.to_bytes(), original.to_bytes())
+                self.assertEqual(pack.entry(k)[1], len(original.to_bytes()))
+            self.assertRaises(IndexError, pack.layout, len(self.layouts))
+            self.assertRaises(IndexError, pack.layout, -1)
+        finally:
+            pack.close()
+
+    def test_writer_checks_the_count(self):
+        writer = ArchiveWriter(self.path, 1)
+        writer.add(self.layouts[0].to_bytes())
+        self.assertRaises(ValueError, writer.add, self.layouts[1].to_bytes())
+        writer.close()
+        writer = ArchiveWriter(self.path, 2)
+        writer.add(self.layouts[0].to_bytes())
+        self.assertRaises(ValueError, writer.close)
+        writer.out.close()
+
+    def test_bad_magic(self):
+        self.write()
+        with open(self.path, 'r+b') as pack:
+            pack.write('XXXX')
+        self.assertRaises(ValueError, MapArchive, self.path)
+
+
+if __name__ == "__main__":
+    unittest.main()
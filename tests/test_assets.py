@@ -0,0 +1,80 @@
+"""
+Author: Hector Lovo
+Created on: 5/3/2015
+
+This dungeon generator was created as a demo for WillowTreeApps.
+
+Tests of the process-wide image cache (assets.py), on SDL's dummy video driver.
+"""
+import os
+import shutil
+import sys
+import tempfile
+import unittest
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+try:
+    import pygame
+except ImportError:
+    pygame = None
+
+
+@unittest.skipIf(pygame is None, "pygame is not installed")
+class ImageCacheTest(unittest.TestCase):
+
+    @classmethod
+    def setUpClass(cls):
+        os.environ.setdefault('SDL_VIDEODRIVER', 'dummy')
+        pygame.init()
+        pygame.display.set_mode((1, 1), 0, 32)
+
+    @classmethod
+    def tearDownClass(cls):
+        pygame.quit()
+
+    def setUp(self):
+        from assets import ImageCache
+        self.directory = tempfile.mkdtemp()
+        # noinspection PyArgumentList
+        image = pygame.Surface((32, 32))
+        image.fill((200, 40, 40))
+        pygame.image.save(image, os.path.join(self.directory, 'tile.png'))
+        self.cache = ImageCache(self.directory)
+
+    def tearDown(self):
+        shutil.rmtree(self.directory)
+
+    def test_same_surface(self):
+        first = self.cache.get('tile.png')
+        self.assertIs(self.cache.get('tile.png'), first)
+        self.assertEqual((self.cache.misses, self.cache.hits), (1, 1))
+        self.assertEqual(first.get_at((5, 5))[:3], (200, 40, 40))
+
+    def test_colorkey_is_part_of_the_key(self):
+        plain = self.cache.get('tile.png')
+        keyed = self.cache.get('tile.png', -1)
+        self.assertIsNot(plain, keyed)
+        self.assertIsNone(plain.get_colorkey())
+        self.assertEqual(keyed.get_colorkey()[:3], (200, 40, 40))
+        self.assertIs(self.cache.get('tile.png', -1), keyed)
+
+    def test_invalidate(self):
+        first = self.cache.get('tile.png')
+        self.cache.invalidate('tile.png')
+        self.assertIsNot(self.cache.get('tile.png'), first)
+        self.cache.invalidate()
+        self.assertEqual(self.cache.images, dict())
+
+    def test_preload_async(self):
+        preload = self.cache.preload_async([('tile.png', None), ('tile.png', -1)], workers=2)
+        preload.wait()
+        self.assertEqual(preload.progress(), 1.0)
+        self.cache.reset_stats()
+        self.cache.get('tile.png')
+        self.cache.get('tile.png', -1)
+        self.assertEqual((self.cache.misses, self.cache.hits), (0, 2))
+
+
+if __name__ == "__main__":
+    unittest.main()
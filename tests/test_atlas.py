@@ -0,0 +1,43 @@
+"""
+Author: Hector Lovo
+Created on: 5/3/2015
+
+This dungeon generator was created as a demo for WillowTreeApps.
+
+Tests of how the images are split between the texture atlases; no display needed.
+"""
+import os
+import sys
+import unittest
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+try:
+    import pygame
+except ImportError:
+    pygame = None
+
+
+@unittest.skipIf(pygame is None, "pygame is not installed")
+class AtlasImagesTest(unittest.TestCase):
+
+    def test_every_image_in_one_atlas(self):
+        from atlas import atlas_images
+        from entities import theme_images
+        from themes import map_theme
+        packed = list()
+        for theme_num in [None] + list(map_theme):
+            packed += atlas_images(theme_num)
+        self.assertEqual(len(packed), len(set(packed)))
+        for theme_num in map_theme:
+            self.assertTrue(set(theme_images(theme_num)) <= set(packed))
+
+    def test_shared_images_in_common_atlas(self):
+        from atlas import atlas_images
+        common = atlas_images(None)
+        self.assertIn(('key.png', -1), common)
+        self.assertIn(('tomb.png', -1), common)
+
+
+if __name__ == "__main__":
+    unittest.main()
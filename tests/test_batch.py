@@ -0,0 +1,50 @@
+"""
+Author: Hector Lovo
+Created on: 5/3/2015
+
+This dungeon generator was created as a demo for WillowTreeApps.
+
+Tests of batch mode's command line (batch.py); no display needed.
+"""
+import os
+import shutil
+import sys
+import tempfile
+import unittest
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from batch import main, read_layouts
+
+
+class BatchSeedTest(unittest.TestCase):
+
+    def setUp(self):
+        self.directory = tempfile.mkdtemp()
+        self.output = os.path.join(self.directory, 'levels.dgb')
+
+    def tearDown(self):
+        shutil.rmtree(self.directory)
+
+    def run_batch(self, *args):
+        return main(list(args) + ['-j', '1', '-o', self.output])
+
+    def test_rejects_bad_seeds(self):
+        for seed in ('-1', str(1 << 32), 'x'):
+            self.assertRaises(SystemExit, self.run_batch, '-n', '2', '--seed', seed)
+
+    def test_rejects_seeds_past_the_last(self):
+        self.assertRaises(SystemExit, self.run_batch, '-n', '2', '--seed', str((1 << 32) - 1))
+
+    def test_last_seeds(self):
+        self.run_batch('-n', '2', '--seed', str((1 << 32) - 2), '--size', '20x20')
+        seeds = [layout.seed for layout in read_layouts(self.output)]
+        self.assertEqual(seeds, [(1 << 32) - 2, (1 << 32) - 1])
+
+    def test_compressed(self):
+        self.run_batch('-n', '3', '--seed', '7', '--size', '20x20', '--compress')
+        self.assertEqual([layout.seed for layout in read_layouts(self.output)], [7, 8, 9])
+
+
+if __name__ == "__main__":
+    unittest.main()
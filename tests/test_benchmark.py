@@ -0,0 +1,70 @@
+"""
+Author: Hector Lovo
+Created on: 5/3/2015
+
+This dungeon generator was created as a demo for WillowTreeApps.
+
+Smoke run of the headless benchmarks (benchmark.py --quick), and of the frame profiler they rely on.
+"""
+import json
+import os
+import shutil
+import sys
+import tempfile
+import unittest
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from profiler import FrameProfiler, PHASES
+
+try:
+    import pygame
+except ImportError:
+    pygame = None
+
+
+class FrameProfilerTest(unittest.TestCase):
+
+    def test_phase_outside_frame(self):
+        profiler = FrameProfiler()
+        profiler.start("objects")
+        profiler.stop("objects")
+        profiler.begin_frame()
+        profiler.end_frame()
+        self.assertEqual(profiler.percentiles("objects")[0], 0.0)
+
+    def test_frame(self):
+        profiler = FrameProfiler(record=True)
+        profiler.begin_frame()
+        for phase in PHASES:
+            profiler.start(phase)
+            profiler.stop(phase)
+        profiler.end_frame()
+        self.assertEqual(len(profiler.frames), 1)
+        self.assertEqual(sorted(profiler.frames[0]), sorted(PHASES + ("frame",)))
+
+
+@unittest.skipIf(pygame is None, "pygame is not installed")
+class BenchmarkSmokeTest(unittest.TestCase):
+
+    def setUp(self):
+        self.directory = tempfile.mkdtemp()
+        self.cwd = os.getcwd()
+        # the game loads its images from data/, relative to the repository
+        os.chdir(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+    def tearDown(self):
+        os.chdir(self.cwd)
+        shutil.rmtree(self.directory)
+
+    def test_quick(self):
+        import benchmark
+        output = os.path.join(self.directory, 'bench.json')
+        self.assertEqual(benchmark.main(['--quick', '-o', output]), 0)
+        with open(output) as results_file:
+            results = json.load(results_file)["results"]
+        self.assertIn("view_frame", results)
+
+
+if __name__ == "__main__":
+    unittest.main()
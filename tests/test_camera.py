@@ -0,0 +1,46 @@
+"""
+Author: Hector Lovo
+Created on: 5/3/2015
+
+This dungeon generator was created as a demo for WillowTreeApps.
+
+Tests of the camera (camera.py), on maps bigger and smaller than the window.
+"""
+import os
+import sys
+import unittest
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+try:
+    import pygame
+except ImportError:
+    pygame = None
+
+
+@unittest.skipIf(pygame is None, "pygame is not installed")
+class TileWindowTest(unittest.TestCase):
+
+    def window(self, grid_size, player_pos):
+        from camera import Camera, complex_camera
+        # as the game sets it up: the grid's last row and column are walls, the camera stops short of them
+        camera = Camera(complex_camera, (grid_size - 1) << 5, (grid_size - 1) << 5, 1000, 600)
+        camera.follow(pygame.Rect(player_pos[0], player_pos[1], 32, 32))
+        return camera.tile_window(grid_size, grid_size)
+
+    def test_big_map(self):
+        x1, y1, x2, y2 = self.window(100, (1600, 1600))
+        self.assertTrue(0 <= x1 < x2 <= 100 and 0 <= y1 < y2 <= 100)
+        self.assertTrue(x2 - x1 >= 1000 >> 5 and y2 - y1 >= 600 >> 5)
+
+    def test_map_smaller_than_window(self):
+        # 20 tiles (640px) are narrower than the window; the camera spans 19 of them (608px), pushed to the
+        # window's right edge, so column 19 would be drawn at x=1000, just outside the window
+        for pos in ((32, 32), (320, 320), (576, 576)):
+            x1, y1, x2, y2 = self.window(20, pos)
+            self.assertEqual((x1, x2), (0, 19))
+            self.assertTrue(0 <= y1 < y2 <= 20)
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,73 @@
+"""
+Author: Hector Lovo
+Created on: 5/3/2015
+
+This dungeon generator was created as a demo for WillowTreeApps.
+
+Tests of the shadowcasting field of view (fov.py): walls cast shadows, and the light stops at the radius.
+"""
+import os
+import sys
+import unittest
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+try:
+    import pygame
+except ImportError:
+    pygame = None
+
+from landscape import TileGrid, WALL, FLOOR
+
+
+@unittest.skipIf(pygame is None, "pygame is not installed")
+class FieldOfViewTest(unittest.TestCase):
+
+    def setUp(self):
+        # a 21x21 room, walled in
+        self.grid = TileGrid(23, 23, 0)
+        self.grid.fill_rect(1, 1, 22, 22, FLOOR)
+
+    def field(self, radius=8):
+        from fov import FieldOfView
+        return FieldOfView(self.grid, radius)
+
+    def test_open_room(self):
+        fov = self.field()
+        fov.compute(11, 11)
+        self.assertTrue(fov.is_visible(11, 11))
+        self.assertTrue(fov.is_visible(15, 11) and fov.is_visible(11, 4))
+        # seen floor is explored
+        self.assertTrue(self.grid[11][15].visited)
+
+    def test_radius(self):
+        fov = self.field(4)
+        fov.compute(11, 11)
+        self.assertTrue(fov.is_visible(15, 11))
+        self.assertFalse(fov.is_visible(16, 11))
+        self.assertFalse(fov.is_visible(15, 15))
+        self.assertFalse(self.grid[11][16].visited)
+
+    def test_wall_casts_a_shadow(self):
+        # a pillar east of the player: the wall is lit, what is behind it is not
+        self.grid.set_type(13, 11, WALL)
+        fov = self.field()
+        fov.compute(11, 11)
+        self.assertTrue(fov.is_visible(13, 11))
+        self.assertFalse(fov.is_visible(14, 11))
+        self.assertFalse(fov.is_visible(16, 11))
+        self.assertFalse(self.grid[11][16].visited)
+        # out of its shadow, the same distance away
+        self.assertTrue(fov.is_visible(11, 16))
+
+    def test_update_only_on_a_new_tile(self):
+        fov = self.field()
+        self.assertTrue(fov.update(11, 11))
+        self.assertFalse(fov.update(11, 11))
+        self.assertTrue(fov.update(12, 11))
+        # what was only visible from the old tile is cleared
+        self.assertEqual(sum(fov.visible), len(fov.visible_cells))
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,73 @@
+"""
+Author: Hector Lovo
+Created on: 5/3/2015
+
+This dungeon generator was created as a demo for WillowTreeApps.
+
+Tests of the compact tile grid (landscape.py): cell views, carving and flag slices; no display needed.
+"""
+import os
+import sys
+import unittest
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from landscape import TileGrid, WALL, FLOOR, BLOCKED, BLOCK_SIGHT, VISITED, pack_flag, unpack_flag
+
+
+class TileGridTest(unittest.TestCase):
+
+    def setUp(self):
+        self.grid = TileGrid(8, 6, 0)
+
+    def test_starts_as_walls(self):
+        self.assertEqual(len(self.grid), 6)
+        self.assertEqual(len(self.grid[0]), 8)
+        self.assertEqual(self.grid[5][7].code, WALL)
+        self.assertTrue(self.grid[0][0].blocked and self.grid[0][0].block_sight)
+        self.assertFalse(self.grid[0][0].visited)
+
+    def test_views_write_through(self):
+        cell = self.grid[2][3]
+        cell.visited = True
+        cell.blocked = False
+        self.assertEqual(self.grid.flags[2 * 8 + 3], BLOCK_SIGHT | VISITED)
+        self.assertFalse(self.grid.is_blocked(3, 2))
+        self.assertTrue(self.grid[-4][-5].visited)
+        self.assertRaises(IndexError, lambda: self.grid[6])
+        self.assertRaises(IndexError, lambda: self.grid[0][8])
+
+    def test_fill_rect(self):
+        self.grid.fill_rect(1, 1, 4, 3, FLOOR)
+        floor = [(x, y) for y in range(6) for x in range(8) if self.grid[y][x].code == FLOOR]
+        self.assertEqual(floor, [(x, y) for y in (1, 2) for x in (1, 2, 3)])
+        self.assertFalse(self.grid[1][1].blocked or self.grid[1][1].block_sight)
+        self.assertTrue(self.grid[1][4].blocked)
+
+    def test_fill_column(self):
+        self.grid.fill_column(5, 1, 5, FLOOR)
+        self.assertEqual([self.grid[y][5].code for y in range(6)], [WALL, FLOOR, FLOOR, FLOOR, FLOOR, WALL])
+        self.assertEqual([self.grid[2][x].code for x in range(8)].count(FLOOR), 1)
+
+    def test_clear_flag_slices(self):
+        self.grid.clear_flag_row(2, 6, 1, BLOCKED)
+        self.assertEqual([self.grid[1][x].blocked for x in range(8)], [True] * 2 + [False] * 4 + [True] * 2)
+        # the other flags are left alone
+        self.assertTrue(all(self.grid[1][x].block_sight for x in range(8)))
+        self.grid.clear_flag_column(0, 0, 3, BLOCK_SIGHT)
+        self.assertEqual([self.grid[y][0].block_sight for y in range(6)], [False] * 3 + [True] * 3)
+        self.assertTrue(all(self.grid[y][0].blocked for y in range(6)))
+
+    def test_pack_flag(self):
+        self.assertIsNone(pack_flag(self.grid.flags, VISITED))
+        for x, y in ((0, 0), (7, 2), (3, 5)):
+            self.grid[y][x].visited = True
+        packed = pack_flag(self.grid.flags, VISITED)
+        self.assertEqual(len(packed), 6)
+        copy = TileGrid(8, 6, 0)
+        unpack_flag(packed, copy.flags, VISITED)
+        self.assertEqual(copy.flags, self.grid.flags)
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,58 @@
+"""
+Author: Hector Lovo
+Created on: 5/3/2015
+
+This dungeon generator was created as a demo for WillowTreeApps.
+
+Tests of the layout generator, down to the smallest maps batch.py accepts; no display needed.
+    python -m unittest discover -s tests
+"""
+import os
+import sys
+import unittest
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from batch import MIN_MAP_SIZE
+from layout import generate_layout, Layout, LAYOUT_VERSION, PLACEMENT_BSP, PLACEMENT_GRID, PLACEMENT_SCAN
+
+SIZES = range(MIN_MAP_SIZE, MIN_MAP_SIZE + 5) + [30, 40]
+SEEDS = range(200)
+
+
+class SmallMapsTest(unittest.TestCase):
+
+    def sweep(self, placement):
+        for size in SIZES:
+            for seed in SEEDS:
+                layout = generate_layout(size, size, 5, seed, placement)
+                self.assertEqual(layout.validate(), [], "%sx%s, seed %s" % (size, size, seed))
+
+    def test_bsp(self):
+        self.sweep(PLACEMENT_BSP)
+
+    def test_grid(self):
+        self.sweep(PLACEMENT_GRID)
+
+    def test_scan(self):
+        self.sweep(PLACEMENT_SCAN)
+
+
+class FormatTest(unittest.TestCase):
+
+    def test_round_trip(self):
+        layout = generate_layout(30, 30, 5, 2015)
+        copy = Layout.from_bytes(layout.to_bytes())
+        self.assertEqual(copy.to_bytes(), layout.to_bytes())
+
+    def test_other_version(self):
+        data = bytearray(generate_layout(30, 30, 5, 2015).to_bytes())
+        data[4] = LAYOUT_VERSION + 1
+        with self.assertRaises(ValueError) as raised:
+            Layout.from_bytes(str(data))
+        # the version read, not the one expected
+        self.assertIn("version %s" % (LAYOUT_VERSION + 1), str(raised.exception))
+
+
+if __name__ == "__main__":
+    unittest.main()
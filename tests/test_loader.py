@@ -0,0 +1,38 @@
+"""
+Author: Hector Lovo
+Created on: 5/3/2015
+
+This dungeon generator was created as a demo for WillowTreeApps.
+
+Tests of the background map loader (loader.py); the maps are generated, not bound.
+"""
+import os
+import sys
+import unittest
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+try:
+    import pygame
+except ImportError:
+    pygame = None
+
+
+@unittest.skipIf(pygame is None, "pygame is not installed")
+class MapLoaderTest(unittest.TestCase):
+
+    def test_pending_only_for_the_prefetched_map(self):
+        from loader import MapLoader
+        loader = MapLoader()
+        self.assertFalse(loader.pending(40, 40, 0, 7))
+        loader.prefetch(40, 40, 0, 7)
+        # another size, enemy probability or seed would be discarded by take(): nothing to wait for
+        self.assertFalse(loader.pending(38, 38, 0, 7))
+        self.assertFalse(loader.pending(40, 40, 1, 7))
+        self.assertFalse(loader.pending(40, 40, 0, 8))
+        loader.thread.join()
+        self.assertFalse(loader.pending(40, 40, 0, 7))
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,82 @@
+"""
+Author: Hector Lovo
+Created on: 5/3/2015
+
+This dungeon generator was created as a demo for WillowTreeApps.
+
+Tests of the distance field the enemies follow to the player (pathfind.py).
+"""
+import os
+import sys
+import unittest
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+try:
+    import pygame
+except ImportError:
+    pygame = None
+
+from landscape import TileGrid, WALL, FLOOR
+
+
+@unittest.skipIf(pygame is None, "pygame is not installed")
+class DistanceFieldTest(unittest.TestCase):
+
+    def setUp(self):
+        # a 9x9 room, walled in, with a wall down its middle column but for a gap at the bottom
+        self.grid = TileGrid(11, 11, 0)
+        self.grid.fill_rect(1, 1, 10, 10, FLOOR)
+        self.grid.fill_column(5, 1, 9, WALL)
+
+    def walk(self, field, x, y):
+        path = [(x, y)]
+        while field.next_step(x, y) is not None:
+            x, y = field.next_step(x, y)
+            path.append((x, y))
+        return path
+
+    def test_around_a_wall(self):
+        from pathfind import DistanceField
+        field = DistanceField(self.grid)
+        field.compute(3, 2)
+        # down and across to the gap, then up and across to the other side: 9 + 9 steps
+        self.assertEqual(field.distance(7, 2), 18)
+        path = self.walk(field, 7, 2)
+        self.assertEqual(path[-1], (3, 2))
+        self.assertEqual(len(path) - 1, 18)
+        self.assertIn((5, 9), path)
+        for x, y in path:
+            self.assertFalse(self.grid.is_blocked(x, y))
+        for (x1, y1), (x2, y2) in zip(path, path[1:]):
+            self.assertEqual(abs(x1 - x2) + abs(y1 - y2), 1)
+
+    def test_out_of_the_field(self):
+        from pathfind import DistanceField, UNREACHED
+        field = DistanceField(self.grid, max_dist=4)
+        field.compute(3, 2)
+        self.assertEqual(field.distance(7, 2), UNREACHED)
+        self.assertIsNone(field.next_step(7, 2))
+        self.assertIsNone(field.next_step(3, 2))
+        self.assertEqual(field.distance(5, 2), UNREACHED)
+
+    def test_objects_block_the_gap(self):
+        from pathfind import DistanceField, UNREACHED
+        from spatial import SpatialHash
+
+        class Crate(object):
+            rect = pygame.Rect(5 << 5, 9 << 5, 32, 32)
+
+        obstacles = SpatialHash()
+        obstacles.add(Crate())
+        field = DistanceField(self.grid)
+        field.compute(3, 2, obstacles)
+        self.assertEqual(field.distance(7, 2), UNREACHED)
+        # moving the origin clears what was reached before
+        self.assertTrue(field.update(7, 2, obstacles))
+        self.assertEqual(field.distance(3, 2), UNREACHED)
+        self.assertEqual(field.distance(7, 3), 1)
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,117 @@
+"""
+Author: Hector Lovo
+Created on: 5/3/2015
+
+This dungeon generator was created as a demo for WillowTreeApps.
+
+Tests of the chunked map renderer (renderer.py), on SDL's dummy video driver: what is redrawn from
+frame to frame, and how many chunks are kept baked.
+"""
+import os
+import sys
+import unittest
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+try:
+    import pygame
+except ImportError:
+    pygame = None
+
+from landscape import TileGrid, FLOOR
+
+LIT_COLOR = (200, 200, 200)
+DARK_COLOR = (60, 60, 60)
+
+
+@unittest.skipIf(pygame is None, "pygame is not installed")
+class MapRendererTest(unittest.TestCase):
+
+    @classmethod
+    def setUpClass(cls):
+        os.environ.setdefault('SDL_VIDEODRIVER', 'dummy')
+        pygame.init()
+        cls.screen = pygame.display.set_mode((320, 320), 0, 32)
+
+    @classmethod
+    def tearDownClass(cls):
+        pygame.quit()
+
+    def tile(self, color):
+        # noinspection PyArgumentList
+        image = pygame.Surface((32, 32)).convert()
+        image.fill(color)
+        return image
+
+    def renderer(self, size, win_width=320, win_height=320):
+        from renderer import MapRenderer
+        grid = TileGrid(size, size, 0)
+        grid.fill_rect(1, 1, size - 1, size - 1, FLOOR)
+        grid.bind([self.tile(LIT_COLOR)] * 2, [self.tile(DARK_COLOR)] * 2)
+        return MapRenderer(grid, win_width, win_height)
+
+    def frame(self, renderer, items=()):
+        renderer.begin_frame((0, 0))
+        for image, pos in items:
+            renderer.draw(image, pos)
+        renderer.present(self.screen)
+
+    def test_only_changes_are_redrawn(self):
+        from renderer import LIT, DARK
+        renderer = self.renderer(10)
+        # first frame: the whole screen, all black
+        self.frame(renderer)
+        self.assertEqual(renderer.dirty_rects, 1)
+        self.assertEqual(self.screen.get_at((80, 80))[:3], (0, 0, 0))
+        # nothing changed: nothing is drawn
+        self.frame(renderer)
+        self.assertEqual((renderer.dirty_rects, renderer.blits), (0, 0))
+        # one cell lit: only that cell
+        renderer.begin_frame((0, 0))
+        renderer.set_cell(2, 3, LIT)
+        renderer.present(self.screen)
+        self.assertEqual(renderer.dirty_rects, 1)
+        self.assertEqual(self.screen.get_at((2 * 32 + 5, 3 * 32 + 5))[:3], LIT_COLOR)
+        self.assertEqual(self.screen.get_at((3 * 32 + 5, 3 * 32 + 5))[:3], (0, 0, 0))
+        renderer.begin_frame((0, 0))
+        renderer.set_cell(2, 3, DARK)
+        renderer.present(self.screen)
+        self.assertEqual(self.screen.get_at((2 * 32 + 5, 3 * 32 + 5))[:3], DARK_COLOR)
+
+    def test_moved_sprites_are_redrawn(self):
+        renderer = self.renderer(10)
+        sprite = self.tile((255, 0, 0))
+        self.frame(renderer, [(sprite, (64, 64))])
+        self.frame(renderer, [(sprite, (64, 64))])
+        self.assertEqual(renderer.dirty_rects, 0)
+        # where it was, and where it is
+        self.frame(renderer, [(sprite, (128, 64))])
+        self.assertEqual(renderer.dirty_rects, 2)
+        self.assertEqual(self.screen.get_at((140, 70))[:3], (255, 0, 0))
+        self.assertEqual(self.screen.get_at((70, 70))[:3], (0, 0, 0))
+
+    def test_camera_move_redraws_everything(self):
+        renderer = self.renderer(20)
+        self.frame(renderer)
+        renderer.begin_frame((-32, 0))
+        renderer.present(self.screen)
+        self.assertEqual(renderer.dirty_rects, 1)
+
+    def test_least_recently_used_chunks_are_dropped(self):
+        from renderer import CHUNK_SIZE
+        # a 100px window overlaps up to 2x2 chunks: 3x3 are kept
+        renderer = self.renderer(CHUNK_SIZE * 4, 100, 100)
+        self.assertEqual(renderer.max_chunks, 9)
+        first = renderer.get_chunk(0, 0)
+        self.assertIs(renderer.get_chunk(0, 0), first)
+        for cy in range(4):
+            for cx in range(4):
+                renderer.get_chunk(cx, cy)
+        self.assertEqual(len(renderer.chunks), 9)
+        self.assertEqual(list(renderer.chunks)[-1], (3, 3))
+        self.assertNotIn((0, 0), renderer.chunks)
+        self.assertIsNot(renderer.get_chunk(0, 0), first)
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,61 @@
+"""
+Author: Hector Lovo
+Created on: 5/3/2015
+
+This dungeon generator was created as a demo for WillowTreeApps.
+
+Tests of input recording and replay (replay.py), in process, on SDL's dummy video driver: a recorded
+game ends with ESC, and its replay must stop there, where the game did.
+"""
+import os
+import shutil
+import sys
+import tempfile
+import unittest
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, ROOT)
+
+try:
+    import pygame
+except ImportError:
+    pygame = None
+
+
+@unittest.skipIf(pygame is None, "pygame is not installed")
+class ReplayTest(unittest.TestCase):
+
+    def setUp(self):
+        os.environ['SDL_VIDEODRIVER'] = 'dummy'
+        os.environ['SDL_AUDIODRIVER'] = 'dummy'
+        self.directory = tempfile.mkdtemp()
+        self.cwd = os.getcwd()
+        # the game loads its images from data/, relative to the repository
+        os.chdir(ROOT)
+
+    def tearDown(self):
+        os.chdir(self.cwd)
+        shutil.rmtree(self.directory)
+
+    def test_replay_ends_on_escape(self):
+        from main import DunGen, SIM_TICK_RATE
+        from replay import InputPlayer, RandomInput
+        recording = os.path.join(self.directory, 'game.json')
+        game = DunGen(loading_wait=0, seed=2015, record=recording, tick_rate=SIM_TICK_RATE)
+        game.soak_loop(300, RandomInput(2015))
+        recorded = game.end_state()
+        # the game quits: the recording is saved, and the process would exit
+        self.assertRaises(SystemExit, game.controller, [pygame.event.Event(pygame.KEYDOWN, key=pygame.K_ESCAPE)],
+                          game.tick_time())
+        input_player = InputPlayer(recording)
+        self.assertEqual(input_player.frames, 301)
+        replay = DunGen(input_player.win_width, input_player.win_height, loading_wait=0, seed=input_player.seed,
+                        tick_rate=input_player.tick_rate, deterministic=True)
+        frames, _ = replay.replay_loop(input_player, render=False)
+        self.assertEqual(frames, 301)
+        self.assertFalse(replay.replaying)
+        self.assertEqual(replay.end_state(), recorded)
+
+
+if __name__ == "__main__":
+    unittest.main()
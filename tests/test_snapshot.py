@@ -0,0 +1,94 @@
+"""
+Author: Hector Lovo
+Created on: 5/3/2015
+
+This dungeon generator was created as a demo for WillowTreeApps.
+
+Save/load round trips of the saved-game format (snapshot.py), on SDL's dummy video driver.
+"""
+import os
+import sys
+import unittest
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, ROOT)
+
+try:
+    import pygame
+except ImportError:
+    pygame = None
+
+
+@unittest.skipIf(pygame is None, "pygame is not installed")
+class SnapshotTest(unittest.TestCase):
+
+    @classmethod
+    def setUpClass(cls):
+        os.environ.setdefault('SDL_VIDEODRIVER', 'dummy')
+        cls.cwd = os.getcwd()
+        # the maps load their images from data/, relative to the repository
+        os.chdir(ROOT)
+        pygame.init()
+        pygame.display.set_mode((1, 1), 0, 32)
+
+    @classmethod
+    def tearDownClass(cls):
+        pygame.quit()
+        os.chdir(cls.cwd)
+
+    def round_trip(self, snapshot):
+        from snapshot import Snapshot
+        loaded = Snapshot.from_bytes(snapshot.to_bytes())
+        self.assertEqual((loaded.seed, loaded.level, loaded.enemy_prob, loaded.player_pos),
+                         (snapshot.seed, snapshot.level, snapshot.enemy_prob, snapshot.player_pos))
+        loaded.map.bind()
+        return loaded.map
+
+    def test_map(self):
+        from landscape import VISITED
+        from map import TheMap
+        from snapshot import Snapshot
+        the_map = TheMap(40, 40, enemy_prob=5, seed=7)
+        # the player explored a corner and picked up a key
+        for y in range(10):
+            for x in range(10):
+                the_map.landscape.set_flag(x, y, VISITED, True)
+        the_map.map_objects["keys"].sprites()[0].kill()
+        loaded = self.round_trip(Snapshot(the_map, (1 << 32) - 1, 3, 5, (64, 96)))
+        layout = the_map.layout
+        self.assertEqual((loaded.width, loaded.height, loaded.theme_num, loaded.layout.seed),
+                         (layout.width, layout.height, layout.theme_num, layout.seed))
+        self.assertEqual(str(loaded.landscape.types), str(the_map.landscape.types))
+        self.assertEqual(str(loaded.landscape.flags), str(the_map.landscape.flags))
+        self.assertEqual(sorted(loaded.layout.stairs), sorted(layout.stairs))
+        self.assertEqual(sorted(loaded.layout.objects), sorted(layout.objects))
+        self.assertEqual(sorted(key.rect.topleft for key in loaded.map_objects["keys"]),
+                         sorted(key.rect.topleft for key in the_map.map_objects["keys"]))
+        self.assertEqual(sorted(enemy.rect.topleft for enemy in loaded.enemies_lst),
+                         sorted(enemy.rect.topleft for enemy in the_map.enemies_lst))
+
+    def test_streaming_map(self):
+        from map import StreamingMap
+        from snapshot import Snapshot
+        the_map = StreamingMap(300, 300, enemy_prob=5, seed=7)
+        loaded = self.round_trip(Snapshot(the_map, 0, 0, 5, the_map.player_start_loc))
+        self.assertEqual((loaded.width, loaded.height, loaded.world.seed, loaded.world.origin),
+                         (the_map.width, the_map.height, the_map.world.seed, the_map.world.origin))
+        self.assertEqual(loaded.world.explored, the_map.world.explored)
+        self.assertEqual(loaded.keys_remaining(), the_map.keys_remaining())
+        self.assertEqual(sorted(enemy.rect.topleft for enemy in loaded.enemies_lst),
+                         sorted(enemy.rect.topleft for enemy in the_map.enemies_lst))
+
+    def test_other_version(self):
+        from map import TheMap
+        from snapshot import Snapshot, SNAPSHOT_VERSION
+        data = bytearray(Snapshot(TheMap(40, 40, seed=7), 0, 0, 0, (64, 96)).to_bytes())
+        data[4] = SNAPSHOT_VERSION + 1
+        with self.assertRaises(ValueError) as raised:
+            Snapshot.from_bytes(str(data))
+        # the version read, not the one expected
+        self.assertIn("version %s" % (SNAPSHOT_VERSION + 1), str(raised.exception))
+
+
+if __name__ == "__main__":
+    unittest.main()
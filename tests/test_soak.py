@@ -0,0 +1,79 @@
+"""
+Author: Hector Lovo
+Created on: 5/3/2015
+
+This dungeon generator was created as a demo for WillowTreeApps.
+
+Smoke runs of soak mode (main.py --soak): headless, on SDL's dummy video driver, drawing every tick.
+"""
+import os
+import shutil
+import subprocess
+import sys
+import tempfile
+import unittest
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+try:
+    import pygame
+except ImportError:
+    pygame = None
+
+
+@unittest.skipIf(pygame is None, "pygame is not installed")
+class SoakSmokeTest(unittest.TestCase):
+
+    def run_game(self, *args):
+        process = subprocess.Popen([sys.executable, 'main.py'] + list(args), cwd=ROOT, stdout=subprocess.PIPE,
+                                   stderr=subprocess.STDOUT)
+        output = process.communicate()[0]
+        self.assertEqual(process.returncode, 0, output)
+        return output
+
+    def soak(self, *options):
+        output = self.run_game('--soak', '300', '--seed', '2015', *options)
+        self.assertIn('Soaked 300 ticks', output)
+        return output
+
+    def end_state(self, output):
+        lines = [line for line in output.splitlines() if line.startswith('Ended on ')]
+        self.assertEqual(len(lines), 1, output)
+        return lines[0]
+
+    def test_render(self):
+        self.soak()
+
+    def test_fog_render(self):
+        self.soak('--fog')
+
+    def test_replay(self):
+        directory = tempfile.mkdtemp()
+        try:
+            recording = os.path.join(directory, 'soak.json')
+            soaked = self.soak('--no-render', '--record', recording)
+            replayed = self.run_game('--replay', recording, '--headless', '--no-render')
+            self.assertIn('Replayed 300 frames', replayed)
+            # same level, same spot, same keys left
+            self.assertEqual(self.end_state(replayed), self.end_state(soaked))
+        finally:
+            shutil.rmtree(directory)
+
+    def test_loading_wait(self):
+        self.soak('--no-render', '--loading-wait', '10')
+        process = subprocess.Popen([sys.executable, 'main.py', '--loading-wait', '-1'], cwd=ROOT,
+                                   stdout=subprocess.PIPE, stderr=subprocess.STDOUT)
+        output = process.communicate()[0]
+        self.assertEqual(process.returncode, 2, output)
+        self.assertIn("can't be negative", output)
+
+    def test_record_needs_a_fresh_game(self):
+        process = subprocess.Popen([sys.executable, 'main.py', '--record', 'game.json', '--pack', 'levels.pack'],
+                                   cwd=ROOT, stdout=subprocess.PIPE, stderr=subprocess.STDOUT)
+        output = process.communicate()[0]
+        self.assertEqual(process.returncode, 2, output)
+        self.assertIn("--record can't be combined", output)
+
+
+if __name__ == "__main__":
+    unittest.main()
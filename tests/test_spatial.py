@@ -0,0 +1,77 @@
+"""
+Author: Hector Lovo
+Created on: 5/3/2015
+
+This dungeon generator was created as a demo for WillowTreeApps.
+
+Tests of the spatial hash that indexes the blocking objects (spatial.py).
+"""
+import os
+import sys
+import unittest
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+try:
+    import pygame
+except ImportError:
+    pygame = None
+
+from spatial import SpatialHash
+
+
+class Thing(object):
+    """
+    Stands in for a sprite: the hash only looks at its rect.
+    """
+
+    def __init__(self, x, y, width=32, height=32):
+        self.rect = pygame.Rect(x, y, width, height)
+
+
+@unittest.skipIf(pygame is None, "pygame is not installed")
+class SpatialHashTest(unittest.TestCase):
+
+    def test_add_and_collide(self):
+        index = SpatialHash()
+        crate = Thing(64, 32)
+        index.add(crate)
+        self.assertEqual(len(index), 1)
+        self.assertIs(index.collide(pygame.Rect(70, 40, 32, 32)), crate)
+        self.assertIsNone(index.collide(pygame.Rect(96, 32, 32, 32)))
+        self.assertIsNone(index.collide(pygame.Rect(0, 0, 32, 32)))
+
+    def test_query_without_duplicates(self):
+        index = SpatialHash()
+        # spans four cells
+        table = Thing(16, 16)
+        index.add(table)
+        self.assertEqual(index.query(pygame.Rect(0, 0, 64, 64)), [table])
+
+    def test_remove(self):
+        index = SpatialHash()
+        crate = Thing(64, 32)
+        index.add(crate)
+        index.remove(crate)
+        self.assertEqual(len(index), 0)
+        self.assertIsNone(index.collide(crate.rect))
+        self.assertEqual(index.buckets, dict())
+        # a sprite that was never added leaves the count alone
+        index.add(crate)
+        index.remove(Thing(0, 0))
+        self.assertEqual(len(index), 1)
+
+    def test_move(self):
+        index = SpatialHash()
+        crate = Thing(64, 32)
+        index.add(crate)
+        old_rect = crate.rect.copy()
+        crate.rect.topleft = (256, 256)
+        index.move(crate, old_rect)
+        self.assertIsNone(index.collide(old_rect))
+        self.assertIs(index.collide(pygame.Rect(256, 256, 32, 32)), crate)
+        self.assertEqual(len(index), 1)
+
+
+if __name__ == "__main__":
+    unittest.main()
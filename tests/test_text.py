@@ -0,0 +1,70 @@
+"""
+Author: Hector Lovo
+Created on: 5/3/2015
+
+This dungeon generator was created as a demo for WillowTreeApps.
+
+Tests of the rendered-text cache (text.py), on SDL's dummy video driver.
+"""
+import os
+import sys
+import unittest
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+try:
+    import pygame
+except ImportError:
+    pygame = None
+
+
+@unittest.skipIf(pygame is None, "pygame is not installed")
+class TextCacheTest(unittest.TestCase):
+
+    @classmethod
+    def setUpClass(cls):
+        os.environ.setdefault('SDL_VIDEODRIVER', 'dummy')
+        pygame.init()
+
+    @classmethod
+    def tearDownClass(cls):
+        pygame.quit()
+
+    def setUp(self):
+        from text import TextCache
+        self.cache = TextCache()
+
+    def test_hit_and_miss(self):
+        text = self.cache.render(20, "Level 1")
+        self.assertIs(self.cache.render(20, "Level 1"), text)
+        self.assertEqual((self.cache.misses, self.cache.hits), (1, 1))
+        # another size, string or color is another text; the font of a size is built once
+        self.assertIsNot(self.cache.render(32, "Level 1"), text)
+        self.assertIsNot(self.cache.render(20, "Level 2"), text)
+        self.assertIsNot(self.cache.render(20, "Level 1", (255, 0, 0)), text)
+        self.assertIs(self.cache.render(20, "Level 1", [255, 255, 255]), text)
+        self.assertEqual((self.cache.misses, self.cache.hits), (4, 2))
+        self.assertEqual(sorted(self.cache.fonts), [20, 32])
+
+    def test_least_recently_used_are_dropped(self):
+        from text import TextCache
+        self.cache = TextCache(max_entries=3)
+        first = self.cache.render(20, "a")
+        self.cache.render(20, "b")
+        self.cache.render(20, "c")
+        # "a" was used last: "b" goes
+        self.assertIs(self.cache.render(20, "a"), first)
+        self.cache.render(20, "d")
+        self.assertEqual(len(self.cache.texts), 3)
+        self.assertEqual([key[1] for key in self.cache.texts], ["c", "a", "d"])
+
+    def test_clear(self):
+        text = self.cache.render(20, "Level 1")
+        self.cache.clear()
+        self.assertEqual((len(self.cache.texts), len(self.cache.fonts)), (0, 0))
+        self.assertIsNot(self.cache.render(20, "Level 1"), text)
+        self.assertEqual(self.cache.misses, 2)
+
+
+if __name__ == "__main__":
+    unittest.main()
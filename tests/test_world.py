@@ -0,0 +1,97 @@
+"""
+Author: Hector Lovo
+Created on: 5/3/2015
+
+This dungeon generator was created as a demo for WillowTreeApps.
+
+Tests of the streaming world (world.py): moving the window of chunks, and keeping what was explored.
+"""
+import os
+import sys
+import unittest
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from landscape import VISITED
+from world import ChunkedWorld, WORLD_CHUNK, ACTIVE_CHUNKS
+
+# 5x5 chunks: the 3x3 window can move both ways
+SIZE = 5 * WORLD_CHUNK
+
+
+class ChunkedWorldTest(unittest.TestCase):
+
+    def setUp(self):
+        self.world = ChunkedWorld(SIZE, SIZE, seed=2015)
+
+    def move_to(self, cx, cy):
+        """
+        Focuses the window on the middle of some chunk, moving it there a chunk at a time.
+        """
+        world = self.world
+        while True:
+            ox, oy = world.origin
+            x = (max(min(cx - ox, world.window_x - 1), 0) * WORLD_CHUNK) + (WORLD_CHUNK >> 1)
+            y = (max(min(cy - oy, world.window_y - 1), 0) * WORLD_CHUNK) + (WORLD_CHUNK >> 1)
+            if world.focus(x, y) is None:
+                return
+
+    def test_window(self):
+        world = self.world
+        self.assertEqual((world.window_x, world.window_y), (ACTIVE_CHUNKS, ACTIVE_CHUNKS))
+        self.assertEqual(world.grid.width, ACTIVE_CHUNKS * WORLD_CHUNK)
+        self.assertEqual(sorted(world.layouts), sorted(world.window_chunks()))
+        ox, oy = world.origin
+        self.assertTrue(0 <= ox <= 5 - ACTIVE_CHUNKS and 0 <= oy <= 5 - ACTIVE_CHUNKS)
+
+    def test_focus(self):
+        world = self.world
+        self.move_to(2, 2)
+        self.assertEqual(world.origin, (1, 1))
+        # the middle chunk of the window: nothing moves
+        self.assertIsNone(world.focus(WORLD_CHUNK + 1, WORLD_CHUNK + 1))
+        # a chunk at the window's edge is moved to its middle, as far as the world allows
+        self.assertEqual(world.focus(0, WORLD_CHUNK + 1), (WORLD_CHUNK, 0))
+        self.assertEqual(world.origin, (0, 1))
+        self.assertEqual(world.focus(1, 1), (0, WORLD_CHUNK))
+        self.assertEqual(world.origin, (0, 0))
+        self.assertEqual(world.focus(0, 0), None)
+        self.assertEqual(sorted(world.layouts), sorted(world.window_chunks()))
+
+    def test_chunks_come_out_the_same(self):
+        world = self.world
+        self.move_to(0, 0)
+        types = world.grid.types[:]
+        self.move_to(4, 4)
+        self.move_to(0, 0)
+        self.assertEqual(world.grid.types, types)
+
+    def test_explored_cells_are_kept(self):
+        world = self.world
+        self.move_to(0, 0)
+        world.grid.set_flag(5, 7, VISITED, True)
+        self.move_to(4, 4)
+        # chunk (0, 0) left the window; what was explored of it was packed away
+        self.assertIn((0, 0), world.explored)
+        self.move_to(0, 0)
+        self.assertTrue(world.grid[7][5].visited)
+        self.assertFalse(world.grid[7][6].visited)
+
+    def test_save_window_and_restore(self):
+        world = self.world
+        self.move_to(4, 0)
+        world.grid.set_flag(WORLD_CHUNK + 3, 4, VISITED, True)
+        world.collected.add((3, 0))
+        world.save_window()
+        # as a saved game is picked up: a new world of the same seed
+        copy = ChunkedWorld(SIZE, SIZE, seed=2015)
+        copy.restore(world.origin, dict(world.explored), set(world.collected))
+        self.assertEqual(copy.origin, world.origin)
+        self.assertEqual(copy.collected, set([(3, 0)]))
+        self.assertEqual(copy.grid.types, world.grid.types)
+        self.assertEqual(copy.grid.flags, world.grid.flags)
+        self.assertTrue(copy.grid[4][WORLD_CHUNK + 3].visited)
+
+
+if __name__ == "__main__":
+    unittest.main()
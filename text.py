@@ -0,0 +1,62 @@
+"""
+Author: Hector Lovo
+Created on: 5/3/2015
+
+This dungeon generator was created as a demo for WillowTreeApps.
+"""
+from collections import OrderedDict
+import pygame
+
+MAX_CACHED_TEXTS = 64  # rendered strings kept around; the least recently used ones are dropped
+
+
+class TextCache(object):
+    """
+    Renders text once and hands out the same Surface until the text changes. Fonts are built once
+    per size, and rendered strings are kept in an LRU cache keyed by (size, string, color).
+    """
+
+    def __init__(self, max_entries=MAX_CACHED_TEXTS):
+        self.max_entries = max_entries
+        self.fonts = dict()
+        self.texts = OrderedDict()
+        self.hits = 0
+        self.misses = 0
+
+    def get_font(self, font_size):
+        """
+        :param font_size: (int) font size
+        :return: (Font) default font of some size
+        """
+        font = self.fonts.get(font_size)
+        if font is None:
+            font = pygame.font.Font(None, font_size)
+            self.fonts[font_size] = font
+        return font
+
+    def render(self, font_size, msg, rgb_color=(255, 255, 255)):
+        """
+        Returns the rendered text, rendering it only if it is not in the cache.
+        :param font_size: (int) font size
+        :param msg: (str) message to render
+        :param rgb_color: (tuple) (r,g,b)
+        :return: (Surface) rendered text
+        """
+        key = (font_size, msg, tuple(rgb_color))
+        text = self.texts.pop(key, None)
+        if text is None:
+            self.misses += 1
+            text = self.get_font(font_size).render(msg, 1, rgb_color)
+            if len(self.texts) >= self.max_entries:
+                self.texts.popitem(last=False)
+        else:
+            self.hits += 1
+        self.texts[key] = text
+        return text
+
+    def clear(self):
+        """
+        Drops every font and rendered text.
+        """
+        self.fonts.clear()
+        self.texts.clear()
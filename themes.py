@@ -0,0 +1,42 @@
+"""
+Author: Hector Lovo
+Created on: 5/3/2015
+
+This dungeon generator was created as a demo for WillowTreeApps.
+"""
+
+map_theme = {
+    0: {
+        "lst_image": ['tomb.png', 'table.png'],
+        "floor": "floor.png",
+        "drk_floor": "drk_floor.png",
+        "wall": "brick_wall.png",
+        "drk_wall": "drk_brick_wall.png",
+        "stairs_down": "stairs_down.png",
+        "drk_stairs_down": "drk_stairs_down.png",
+        "stairs_up": "stairs_up.png",
+        "drk_stairs_up": "drk_stairs_up.png"
+    },
+    1: {
+        "lst_image": ['tomb.png', 'rock.png'],
+        "floor": "grass.png",
+        "drk_floor": "drk_grass.png",
+        "wall": "bush.png",
+        "drk_wall": "drk_bush.png",
+        "stairs_down": "stairs_down.png",
+        "drk_stairs_down": "drk_stairs_down.png",
+        "stairs_up": "stairs_up.png",
+        "drk_stairs_up": "drk_stairs_up.png"
+    },
+    2: {
+        "lst_image": ['tomb.png', 'rock.png'],
+        "floor": "sand.png",
+        "drk_floor": "drk_sand.png",
+        "wall": "cactus.png",
+        "drk_wall": "drk_cactus.png",
+        "stairs_down": "stairs_down.png",
+        "drk_stairs_down": "drk_stairs_down.png",
+        "stairs_up": "stairs_up.png",
+        "drk_stairs_up": "drk_stairs_up.png"
+    }
+}
@@ -0,0 +1,274 @@
+"""
+Author: Hector Lovo
+Created on: 5/3/2015
+
+This dungeon generator was created as a demo for WillowTreeApps.
+
+Streaming worlds, for levels too big to generate up front. The world is split into square chunks,
+and each chunk is generated on its own, from a seed derived from the world's seed and its position;
+so a chunk comes out the same every time it is generated. Only the window of chunks around the
+player is kept in memory, in a single tile grid. When the player walks into a chunk at the edge of
+the window, the window is moved to center on it: the chunks left behind are dropped (what was
+explored of them is kept, bit-packed) and the ones ahead are generated.
+Nothing in here needs pygame or a display.
+"""
+from landscape import TileGrid, VISITED, pack_flag, unpack_flag
+from layout import DungeonGenerator, PLACEMENT_BSP
+from themes import map_theme
+import random
+
+WORLD_CHUNK = 48  # tiles per side of a world chunk
+ACTIVE_CHUNKS = 3  # chunks per side of the window kept in memory
+
+# sides of a chunk that hold a door to the neighbouring chunk
+DOOR_EAST = 0
+DOOR_SOUTH = 1
+
+
+def chunk_seed(seed, cx, cy, salt=0):
+    """
+    Derives the seed of some chunk (or of something else tied to it) from the world's seed.
+    :param seed: (int) world seed
+    :param cx: (int) chunk column
+    :param cy: (int) chunk row
+    :param salt: (int) tells apart seeds tied to the same chunk
+    :return: (int) seed
+    """
+    return (((seed << 20 | cx) << 20 | cy) << 2) | salt
+
+
+class ChunkGenerator(DungeonGenerator):
+    """
+    Generates one chunk of a world. The rooms are laid out by binary space partitioning, so every
+    chunk gets rooms, and connected in order; the first room is then connected to a door on every
+    side of the chunk that has a neighbour. Both chunks agree on where the door between them is, so
+    the halls meet at their common border.
+    Only the exit chunk gets the stairs and only the key chunks get a key; any chunk, but the
+    player's starting one, may get a guard.
+    """
+
+    def __init__(self, world, cx, cy):
+        DungeonGenerator.__init__(self, WORLD_CHUNK - 1, WORLD_CHUNK - 1, world.enemy_prob,
+                                  chunk_seed(world.seed, cx, cy), PLACEMENT_BSP)
+        self.layout.theme_num = world.theme_num
+        self.grid.theme_num = world.theme_num
+        self.world = world
+        self.cx = cx
+        self.cy = cy
+
+    def generate(self):
+        """
+        Generates the chunk.
+        :return: (Layout) the chunk's layout; coordinates are relative to the chunk
+        """
+        rng = self.rng
+        rooms = list()
+        self.generate_rooms_bsp(rooms)
+        world = self.world
+        (pcx, pcy) = rooms[0].center
+        pcx >>= 5
+        pcy >>= 5
+        last = WORLD_CHUNK - 1
+        if self.cx + 1 < world.chunks_x:
+            door = world.door(self.cx, self.cy, DOOR_EAST)
+            self.create_v_hall(pcy, door, pcx)
+            self.create_h_hall(pcx, last, door)
+        if self.cx > 0:
+            door = world.door(self.cx - 1, self.cy, DOOR_EAST)
+            self.create_v_hall(pcy, door, pcx)
+            self.create_h_hall(0, pcx, door)
+        if self.cy + 1 < world.chunks_y:
+            door = world.door(self.cx, self.cy, DOOR_SOUTH)
+            self.create_h_hall(pcx, door, pcy)
+            self.create_v_hall(pcy, last, door)
+        if self.cy > 0:
+            door = world.door(self.cx, self.cy - 1, DOOR_SOUTH)
+            self.create_h_hall(pcx, door, pcy)
+            self.create_v_hall(0, pcy, door)
+        # the first room stays empty: halls from every door run through it
+        others = rooms[1:] or rooms
+        if (self.cx, self.cy) == world.exit_chunk:
+            self.add_stairs(others[rng.randrange(len(others))])
+        if (self.cx, self.cy) in world.key_chunks:
+            self.add_keys(others[rng.randrange(len(others))])
+        if (self.cx, self.cy) != world.start_chunk:
+            if rng.randint(0, 20 - self.layout.enemy_prob) < 5:  # init: 20% probability
+                self.add_enemies(others[rng.randrange(len(others))])
+        return self.layout
+
+
+class ChunkedWorld(object):
+    """
+    A world of chunks, of which only a window is held in memory (grid). Coordinates of cells and
+    objects are relative to the window's top-left; they change whenever the window moves (focus).
+    """
+
+    def __init__(self, width, height, enemy_prob=0, seed=None):
+        if seed is None:
+            seed = random.getrandbits(32)
+        rng = random.Random(seed)
+        self.seed = seed
+        self.enemy_prob = enemy_prob
+        self.theme_num = rng.randint(0, len(map_theme) - 1)
+        self.chunks_x = max(1, (width + WORLD_CHUNK - 1) // WORLD_CHUNK)
+        self.chunks_y = max(1, (height + WORLD_CHUNK - 1) // WORLD_CHUNK)
+        # where the player starts, where the stairs are, and which chunks hold a key
+        start = rng.randrange(self.chunks_x * self.chunks_y)
+        others = [n for n in xrange(self.chunks_x * self.chunks_y) if n != start] or [start]
+        self.start_chunk = self.chunk_at(start)
+        self.exit_chunk = self.chunk_at(rng.choice(others))
+        self.key_chunks = set(self.chunk_at(n) for n in rng.sample(others, min(rng.randint(4, 8), len(others))))
+        # key chunks whose key was collected; the key is not handed out again
+        self.collected = set()
+        # explored cells of the chunks not in the window: bit-packed VISITED flags, per chunk
+        self.explored = dict()
+        # the window
+        self.window_x = min(ACTIVE_CHUNKS, self.chunks_x)
+        self.window_y = min(ACTIVE_CHUNKS, self.chunks_y)
+        self.grid = TileGrid(self.window_x * WORLD_CHUNK, self.window_y * WORLD_CHUNK, self.theme_num)
+        self.origin = (self.clamp_origin(self.start_chunk[0], self.chunks_x, self.window_x),
+                       self.clamp_origin(self.start_chunk[1], self.chunks_y, self.window_y))
+        self.layouts = dict()  # layouts of the chunks in the window
+        self.new_chunks = list()  # chunks that came into the window on its last move
+        self.load_window()
+        start_x, start_y = self.layouts[self.start_chunk].player_start
+        off_x, off_y = self.chunk_offset(self.start_chunk)
+        self.player_start = (start_x + off_x, start_y + off_y)
+
+    def chunk_at(self, n):
+        """
+        :param n: (int) chunk number, row-major
+        :return: (tuple) chunk coordinates
+        """
+        return n % self.chunks_x, n // self.chunks_x
+
+    @staticmethod
+    def clamp_origin(center, chunks, window):
+        """
+        :param center: (int) chunk to center the window on, along some axis
+        :param chunks: (int) chunks in the world, along that axis
+        :param window: (int) chunks in the window, along that axis
+        :return: (int) first chunk of the window, along that axis; the window stays inside the world
+        """
+        return min(max(center - (window >> 1), 0), chunks - window)
+
+    def door(self, cx, cy, side):
+        """
+        :param cx: (int) chunk column
+        :param cy: (int) chunk row
+        :param side: (int) DOOR_EAST or DOOR_SOUTH
+        :return: (int) row (east side) or column (south side) of the door on that side of the chunk
+        """
+        return random.Random(chunk_seed(self.seed, cx, cy, 1 + side)).randint(2, WORLD_CHUNK - 3)
+
+    def window_chunks(self):
+        """
+        :return: (list) chunk coordinates of every chunk in the window
+        """
+        ox, oy = self.origin
+        return [(cx, cy) for cy in range(oy, oy + self.window_y) for cx in range(ox, ox + self.window_x)]
+
+    def chunk_offset(self, chunk):
+        """
+        :param chunk: (tuple) chunk coordinates
+        :return: (tuple) pixel x-y coordinates of the chunk's top-left, in the window
+        """
+        return (chunk[0] - self.origin[0]) * WORLD_CHUNK << 5, (chunk[1] - self.origin[1]) * WORLD_CHUNK << 5
+
+    def load_window(self):
+        """
+        Copies every chunk of the window into the grid, generating the ones that are not in memory
+        and restoring what was explored of them.
+        """
+        grid = self.grid
+        self.new_chunks = list()
+        for chunk in self.window_chunks():
+            layout = self.layouts.get(chunk)
+            if layout is None:
+                layout = ChunkGenerator(self, chunk[0], chunk[1]).generate()
+                self.layouts[chunk] = layout
+                self.new_chunks.append(chunk)
+            flags = layout.grid.flags[:]
+            packed = self.explored.get(chunk)
+            if packed is not None:
+                unpack_flag(packed, flags, VISITED)
+            x = (chunk[0] - self.origin[0]) * WORLD_CHUNK
+            y = (chunk[1] - self.origin[1]) * WORLD_CHUNK
+            for row in range(WORLD_CHUNK):
+                i = (y + row) * grid.width + x
+                j = row * WORLD_CHUNK
+                grid.types[i:i + WORLD_CHUNK] = layout.grid.types[j:j + WORLD_CHUNK]
+                grid.flags[i:i + WORLD_CHUNK] = flags[j:j + WORLD_CHUNK]
+
+    def save_window(self):
+        """
+        Keeps what was explored of every chunk in the window, bit-packed.
+        """
+        grid = self.grid
+        for chunk in self.window_chunks():
+            x = (chunk[0] - self.origin[0]) * WORLD_CHUNK
+            y = (chunk[1] - self.origin[1]) * WORLD_CHUNK
+            flags = bytearray()
+            for row in range(WORLD_CHUNK):
+                i = (y + row) * grid.width + x
+                flags += grid.flags[i:i + WORLD_CHUNK]
+            packed = pack_flag(flags, VISITED)
+            if packed is None:
+                self.explored.pop(chunk, None)
+            else:
+                self.explored[chunk] = packed
+
+    def restore(self, origin, explored, collected):
+        """
+        Puts the window back where it was, as well as what was explored and collected; e.g. when
+        picking up a saved game.
+        :param origin: (tuple) chunk coordinates of the window's top-left chunk
+        :param explored: (dict) bit-packed VISITED flags, per chunk
+        :param collected: (set) key chunks whose key was collected
+        """
+        self.explored = explored
+        self.collected = collected
+        self.origin = origin
+        self.layouts = dict()
+        self.load_window()
+
+    def focus(self, x, y):
+        """
+        Moves the window if some cell is in a chunk at its edge, so that chunk ends up in the middle.
+        :param x: (int) cell column, in the window
+        :param y: (int) cell row, in the window
+        :return: (tuple) how far everything moved, in tiles: x-y; None if the window did not move
+        """
+        ox, oy = self.origin
+        cx = ox + x // WORLD_CHUNK
+        cy = oy + y // WORLD_CHUNK
+        new_ox = ox
+        new_oy = oy
+        if not 0 < cx - ox < self.window_x - 1:
+            new_ox = self.clamp_origin(cx, self.chunks_x, self.window_x)
+        if not 0 < cy - oy < self.window_y - 1:
+            new_oy = self.clamp_origin(cy, self.chunks_y, self.window_y)
+        if (new_ox, new_oy) == self.origin:
+            return None
+        self.save_window()
+        self.origin = (new_ox, new_oy)
+        window = set(self.window_chunks())
+        for chunk in self.layouts.keys():
+            if chunk not in window:
+                del self.layouts[chunk]
+        self.load_window()
+        return (ox - new_ox) * WORLD_CHUNK, (oy - new_oy) * WORLD_CHUNK
+
+    def items(self, name, chunks=None):
+        """
+        Yields the objects of some kind in the window's chunks, in window coordinates.
+        :param name: (string) layout list to go through: "stairs", "keys", "objects" or "enemies"
+        :param chunks: (list) chunks to go through; every chunk in the window if None
+        :return: (generator) of (chunk, item) tuples; item is the layout's tuple, moved
+        """
+        if chunks is None:
+            chunks = self.window_chunks()
+        for chunk in chunks:
+            off_x, off_y = self.chunk_offset(chunk)
+            for item in getattr(self.layouts[chunk], name):
+                yield chunk, (item[0] + off_x, item[1] + off_y) + tuple(item[2:])